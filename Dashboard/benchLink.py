@@ -0,0 +1,101 @@
+# benchLink.py
+# Benchmark izlaznog reda (CommandScheduler + BleTransport) bez robota.
+#
+# FakeClient glumi BleakClient: write s odgovorom traje jedan connection
+# interval, write-without-response dijeli interval s nekoliko paketa.
+# Usporedjuje staro slanje (jedna komanda po pisanju, s odgovorom) s
+# pakiranjem do MTU-a i write-without-response.
+#
+#   python benchLink.py [broj_komandi] [connection_interval_ms]
+
+import asyncio
+import sys
+import time
+
+from link import CommandScheduler
+from transport import BleTransport, DEFAULT_WRITE_SIZE, LINK_BYTES_PER_S, UART_TX_CHAR_UUID
+
+PACKETS_PER_EVENT = 4  # Koliko write-without-response paketa stane u jedan connection event
+
+
+class FakeCharacteristic:
+    def __init__(self, properties, max_wwr):
+        self.properties = properties
+        self.max_write_without_response_size = max_wwr
+
+
+class FakeServices:
+    def __init__(self, char):
+        self.char = char
+
+    def get_characteristic(self, uuid):
+        return self.char
+
+
+class FakeClient:
+    def __init__(self, mtu, wwr, interval):
+        props = ["write", "notify"] + (["write-without-response"] if wwr else [])
+        self.services = FakeServices(FakeCharacteristic(props, mtu - 3))
+        self.mtu_size = mtu
+        self.interval = interval
+        self.received = bytearray()
+        self.writes = 0
+
+    async def write_gatt_char(self, uuid, data, response=True):
+        max_size = self.mtu_size - 3
+        if not response and len(data) > max_size:
+            raise ValueError(f"write-without-response {len(data)} B > {max_size} B")
+        await asyncio.sleep(self.interval if response else self.interval / PACKETS_PER_EVENT)
+        self.received += data
+        self.writes += 1
+
+
+def commands(n):
+    # Mjesavina komandi koje se ne spajaju (idu strogo redom)
+    kinds = ['{"cmd": "straight", "val": 10}', "SAVE_PRESET:3", '{"cmd": "turn", "val": 90}', "LOAD_PRESET:1"]
+    return [kinds[i % len(kinds)] for i in range(n)]
+
+
+async def run_case(name, n, interval, mtu, wwr, batching, bytes_per_s):
+    client = FakeClient(mtu, wwr, interval)
+    transport = BleTransport(client, UART_TX_CHAR_UUID, rx_uuid=None, bytes_per_s=bytes_per_s)
+    await transport.open()
+    if not batching:
+        transport.write_size = max(transport.write_size, DEFAULT_WRITE_SIZE)
+
+    async def write(cmds, urgent):
+        await transport.write("".join(c + "\n" for c in cmds).encode("ascii"), urgent)
+
+    loop = asyncio.get_running_loop()
+    scheduler = CommandScheduler(loop, write, (lambda: transport.write_size) if batching else (lambda: 0))
+    cmds = commands(n)
+    start = time.perf_counter()
+    for cmd in cmds:
+        scheduler.submit(cmd)
+    await asyncio.sleep(0)
+    while scheduler.pending or scheduler.sent < n:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    assert client.received.decode("ascii").splitlines() == cmds, "Redoslijed/sadrzaj ne odgovara"
+    print(f"{name:<34} {n / elapsed:8.1f} cmd/s {client.writes:6d} pisanja {elapsed:7.2f} s")
+    return n / elapsed
+
+
+async def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    interval = (float(sys.argv[2]) if len(sys.argv) > 2 else 30.0) / 1000.0
+    unlimited = 1e9
+    print(f"{n} komandi, connection interval {interval * 1000:.0f} ms")
+    print("-- Samo BLE (bez ogranicenja UART-a iza HC-02) --")
+    base = await run_case("1 komanda/pisanje, s odgovorom", n, interval, 23, False, False, unlimited)
+    await run_case("pakirano, MTU 23, s odgovorom", n, interval, 23, False, True, unlimited)
+    await run_case("pakirano, MTU 185, s odgovorom", n, interval, 185, False, True, unlimited)
+    best = await run_case("pakirano, MTU 185, bez odgovora", n, interval, 185, True, True, unlimited)
+    print(f"Ubrzanje: {best / base:.1f}x")
+    print(f"-- S ogranicenjem UART-a ({LINK_BYTES_PER_S} B/s, HC-02 na 9600 baud) --")
+    await run_case("1 komanda/pisanje, s odgovorom", n, interval, 23, False, False, LINK_BYTES_PER_S)
+    await run_case("pakirano, MTU 185, bez odgovora", n, interval, 185, True, True, LINK_BYTES_PER_S)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
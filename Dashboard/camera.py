@@ -0,0 +1,432 @@
+# camera.py
+# Pipeline za prikaz kamere: prijem -> dekodiranje -> prikaz.
+#
+# Prijem je task na asyncio petlji Dashboarda (mjpeg.stream, BufferedProtocol
+# parsira MJPEG izravno iz socket buffera), dekodiranje radi dretva dekodera,
+# a prikaz Tk dretva. Faze predaju podatke preko slota koji drzi samo
+# NAJNOVIJI frame. Ako sljedeca faza kasni, stari frame se baca i broji kao
+# "drop" - nista se ne slaze u red, pa kasnjenje slike ostaje ograniceno bez
+# obzira koliko je GUI zauzet.
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from io import BytesIO
+
+from PIL import Image
+
+from mjpeg import MJPEGParser, stream
+
+
+class LatestFrameSlot:
+    """Spremnik za jedan frame. Novi frame uvijek pregazi stari (latest wins)."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, item):
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = item
+            self._cond.notify()
+
+    def take(self, timeout=None):
+        """Ceka i vraca najnoviji frame (ili None nakon timeouta / close)."""
+        with self._cond:
+            if self._item is None and not self.closed:
+                self._cond.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+    def poll(self):
+        """Ne blokira - vraca najnoviji frame ili None."""
+        with self._cond:
+            item, self._item = self._item, None
+            return item
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def reopen(self):
+        with self._cond:
+            self.closed = False
+            self._item = None
+
+
+class RateMeter:
+    """Broji dogadjaje i bajtove u kliznom prozoru od `window` sekundi."""
+
+    def __init__(self, window=2.0):
+        self.window = window
+        self.total = 0
+        self._events = deque()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, nbytes=0, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.total += 1
+            self._events.append((now, nbytes))
+            self._bytes += nbytes
+            self._prune(now)
+
+    def rate(self, now=None):
+        """Vraca (dogadjaja/s, bajtova/s)."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._prune(now)
+            return len(self._events) / self.window, self._bytes / self.window
+
+    def _prune(self, now):
+        while self._events and now - self._events[0][0] > self.window:
+            self._bytes -= self._events.popleft()[1]
+
+
+def percentiles(values, points=(50, 95, 99)):
+    """Percentili (nearest-rank) liste vrijednosti, None ako je prazna."""
+    if not values: return {p: None for p in points}
+    ordered = sorted(values)
+    n = len(ordered)
+    return {p: ordered[min(n - 1, max(0, math.ceil(p / 100 * n) - 1))] for p in points}
+
+
+class StreamStats:
+    """Brojaci jednog streama (hub). Prikaz dodaje svoj fps i dropove."""
+
+    def __init__(self):
+        self.rx = RateMeter()
+        self.decode_ms = deque(maxlen=256)
+        self.reconnects = 0
+        self.last_frame = None  # time.monotonic() zadnjeg primljenog framea
+        self.nicla_perf = None  # X-Perf zaglavlje s Nicle (fps i vremena faza)
+
+    def snapshot(self):
+        now = time.monotonic()
+        fps, bps = self.rx.rate(now)
+        p = percentiles(list(self.decode_ms))
+        return {
+            "rx_fps": fps,
+            "bytes_per_s": bps,
+            "frames": self.rx.total,
+            "decode_ms_p50": p[50],
+            "decode_ms_p95": p[95],
+            "decode_ms_p99": p[99],
+            "reconnects": self.reconnects,
+            "since_last_frame": None if self.last_frame is None else now - self.last_frame,
+            "nicla": self.nicla_perf,
+        }
+
+
+def draft_scale(src_size, size):
+    """
+    Najveci JPEG DCT faktor (1, 2, 4, 8) za koji je slika jos barem `size`.
+    Za size=None (puna rezolucija) vraca 1.
+    """
+    if not size: return 1
+    scale = 1
+    while scale < 8 and src_size[0] // (scale * 2) >= size[0] and src_size[1] // (scale * 2) >= size[1]:
+        scale *= 2
+    return scale
+
+
+def decode_jpeg(jpg, size=None, scale=None):
+    """
+    Dekodira JPEG u RGB PIL sliku, opcionalno skaliranu na `size`.
+
+    Umjesto pune dekompresije pa resize-a koristi draft(): libjpeg dekodira
+    izravno u 1/2, 1/4 ili 1/8 velicine (DCT skaliranje), pa se resize radi
+    samo na vec smanjenoj slici. `scale` forsira zadani DCT faktor.
+    """
+    image = Image.open(BytesIO(jpg))
+    if scale and scale > 1:
+        w, h = image.size
+        image.draft("RGB", (w // scale, h // scale))
+    elif size:
+        image.draft("RGB", tuple(size))
+    image = image.convert("RGB")
+    if size and image.size != tuple(size):
+        image = image.resize(size)
+    return image
+
+
+class JPEGDecodeWorker:
+    """Dretva koja uzima najnoviji JPEG iz `source` slota i predaje ga `decode(jpg, timestamp)`."""
+
+    def __init__(self, source, decode, times=None):
+        self.source = source
+        self.decode = decode
+        self.times = times  # deque za trajanje dekodiranja (ms), opcionalno
+        self.running = False
+        self.thread = None
+        self.decoded = 0
+        self.errors = 0
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.source.reopen()
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.source.close()
+
+    def run(self):
+        me = threading.current_thread()
+        while self.running and self.thread is me:  # Stari thread nakon restarta izlazi
+            item = self.source.take(timeout=0.5)
+            if item is None:
+                continue
+            jpg, timestamp = item
+            start = time.perf_counter()
+            try:
+                self.decode(jpg, timestamp)
+            except Exception:
+                self.errors += 1
+                continue
+            if self.times is not None:
+                self.times.append((time.perf_counter() - start) * 1000.0)
+            self.decoded += 1
+
+
+NICLA_PORT = 8080
+RECONNECT_MIN = 0.5   # s, prvi pokusaj ponovnog spajanja
+RECONNECT_MAX = 5.0   # s, najduza pauza izmedju pokusaja
+
+
+class Snapshot:
+    """Jedan frame s vremenom prijema. Slika se dekodira tek kad zatreba."""
+
+    __slots__ = ("jpeg", "timestamp", "_image")
+
+    def __init__(self, jpeg, timestamp, image=None):
+        self.jpeg = jpeg
+        self.timestamp = timestamp
+        self._image = image
+
+    @property
+    def image(self):
+        if self._image is None:
+            self._image = decode_jpeg(self.jpeg)
+        return self._image
+
+    def save(self, path):
+        # JPEG je vec kodiran s Nicle - spremamo bajtove, bez re-encodinga
+        with open(path, "wb") as f:
+            f.write(self.jpeg)
+
+
+def save_burst(snapshots, folder, prefix="snapshot"):
+    """Sprema niz snapshota kao numerirane JPEG datoteke, vraca putanje."""
+    stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(snapshots[0].timestamp)) if snapshots else ""
+    paths = []
+    for i, snap in enumerate(snapshots, 1):
+        path = os.path.join(folder, f"{prefix}_{stamp}_{i:03d}.jpg")
+        snap.save(path)
+        paths.append(path)
+    return paths
+
+
+class FrameSubscriber:
+    """
+    Pretplatnik na CameraHub.
+
+    `size` je velicina slike koju zeli (None = puna rezolucija), slike stizu u
+    `slot` (latest wins). `on_jpeg` se, ako je zadan, poziva s (jpg, timestamp)
+    na asyncio petlji (prijem) za svaki primljeni frame - za snimanje i sl.
+    Mora biti brz i ne smije blokirati.
+    """
+
+    def __init__(self, size=None, on_jpeg=None, wants_images=True):
+        self.size = tuple(size) if size else None
+        self.on_jpeg = on_jpeg
+        self.wants_images = wants_images
+        self.slot = LatestFrameSlot()
+
+
+class CameraHub:
+    """
+    Jedna veza prema jednoj Nicli, dijeljena izmedju svih pretplatnika.
+
+    Nicla posluzuje samo jednog klijenta (listen(1)), pa svi prikazi, snapshot
+    i snimac idu preko istog huba. Frame se dekodira jednom i skalira jednom po
+    trazenoj velicini. Hub se sam pali s prvim i gasi sa zadnjim pretplatnikom.
+
+    Prijem radi kao task na asyncio petlji Dashboarda (`CameraHub.loop`), pa
+    se stream gasi odmah otkazivanjem taska, bez cekanja blokiranog socketa.
+    """
+
+    loop = None  # asyncio petlja Dashboarda, postavlja DashboardApp
+    _hubs = {}
+    _hubs_lock = threading.Lock()
+
+    @classmethod
+    def for_ip(cls, ip, port=NICLA_PORT):
+        url = f"http://{ip}:{port}"
+        with cls._hubs_lock:
+            hub = cls._hubs.get(url)
+            if hub is None:
+                hub = cls._hubs[url] = cls(url)
+            return hub
+
+    def __init__(self, url):
+        self.url = url
+        self.running = False
+        self.status_text = None
+        self.subscribers = ()
+        self._lock = threading.Lock()
+        self._task = None
+        self.latest = None        # (jpg, timestamp) zadnjeg primljenog framea
+        self.latest_image = None  # (image, timestamp) zadnje pune dekodirane slike
+
+        self.stats = StreamStats()
+        self.parser = None
+        self.jpeg_slot = LatestFrameSlot()
+        self.decoder = JPEGDecodeWorker(self.jpeg_slot, self.decode_frame, self.stats.decode_ms)
+
+    def subscribe(self, subscriber):
+        with self._lock:
+            if subscriber not in self.subscribers:
+                self.subscribers = self.subscribers + (subscriber,)
+            subscriber.slot.reopen()
+        self.start()
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self.subscribers = tuple(s for s in self.subscribers if s is not subscriber)
+            empty = not self.subscribers
+        subscriber.slot.close()
+        if empty:
+            self.stop()
+
+    def start(self):
+        with self._lock:
+            if self.running: return
+            self.running = True
+            self.status_text = None
+            self.decoder.start()
+        self.loop.call_soon_threadsafe(self._start_task)
+
+    def stop(self):
+        with self._lock:
+            if not self.running: return
+            self.running = False
+            self.decoder.stop()
+        self.loop.call_soon_threadsafe(self._stop_task)
+
+    def _start_task(self):
+        # Izvrsava se na petlji, redoslijed start/stop poziva je ocuvan
+        if self.running and self._task is None:
+            self._task = self.loop.create_task(self.run())
+
+    def _stop_task(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def snapshot(self, max_age=1.0):
+        """
+        Vraca zadnji primljeni frame iz cachea bez nove veze prema kameri.
+        None ako stream ne radi ili je frame stariji od `max_age` sekundi.
+        Starost se mjeri od objave framea (stats.last_frame, monotonic), ne
+        od `timestamp` - kod ReplayHuba je to snimljeno vrijeme.
+        """
+        latest = self.latest
+        last = self.stats.last_frame
+        if not self.running or latest is None or last is None: return None
+        jpg, timestamp = latest
+        if time.monotonic() - last > max_age: return None
+        image = self.latest_image
+        return Snapshot(jpg, timestamp, image[0] if image and image[1] == timestamp else None)
+
+    def capture_burst(self, count, on_done):
+        """Skuplja sljedecih `count` frameova preko postojece veze i zove on_done(lista)."""
+        frames = []
+
+        def on_jpeg(jpg, timestamp):
+            if len(frames) >= count: return
+            frames.append(Snapshot(jpg, timestamp))
+            if len(frames) == count:
+                self.unsubscribe(sub)
+                on_done(frames)
+
+        sub = FrameSubscriber(on_jpeg=on_jpeg, wants_images=False)
+        self.subscribe(sub)
+        return sub
+
+    async def run(self):
+        print(f"Connecting to {self.url}...")
+        backoff = RECONNECT_MIN
+        while True:
+            parser = self.parser = MJPEGParser(self.on_frame)
+            try:
+                await stream(self.url, parser, timeout=5)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.stats.reconnects += 1
+                if parser.http_status not in (None, 200):
+                    self.status_text = f"Status: {parser.http_status}"
+                else:
+                    self.status_text = "Reconnecting..."
+            if parser.frames:
+                backoff = RECONNECT_MIN  # Veza je radila, probaj odmah
+            await asyncio.sleep(backoff) # Wait before retry
+            backoff = min(backoff * 2, RECONNECT_MAX)
+
+    def on_frame(self, jpg, timestamp=None):
+        # Asyncio petlja (prijem): jedna kopija iz buffera parsera, dekodiranje radi dekoder.
+        # timestamp: vrijeme prijema (ReplayHub daje snimljeno vrijeme) - samo za
+        # oznaku framea; starost i brzine se racunaju iz stats (monotonic, sada)
+        if timestamp is None:
+            timestamp = time.time()
+        jpg = bytes(jpg)
+        self.latest = (jpg, timestamp)
+        self.status_text = None
+        self.stats.rx.add(len(jpg))
+        self.stats.last_frame = time.monotonic()
+        if self.parser is not None:
+            self.stats.nicla_perf = self.parser.perf
+        decode = False
+        for sub in self.subscribers:
+            if sub.on_jpeg:
+                sub.on_jpeg(jpg, timestamp)
+            decode = decode or sub.wants_images
+        if decode:
+            self.jpeg_slot.put((jpg, timestamp))
+
+    def decode_frame(self, jpg, timestamp):
+        # Dekoder dretva: jedan (najjeftiniji) decode po DCT faktoru, pa
+        # jedan resize po trazenoj velicini. Puna rezolucija samo ako je
+        # neki pretplatnik trazi (size=None).
+        subs = [sub for sub in self.subscribers if sub.wants_images]
+        if not subs: return
+        src_size = Image.open(BytesIO(jpg)).size  # Cita samo zaglavlje
+
+        groups = {}
+        for sub in subs:
+            groups.setdefault(draft_scale(src_size, sub.size), []).append(sub)
+
+        for scale, group in groups.items():
+            image = decode_jpeg(jpg, scale=scale)
+            if scale == 1:
+                self.latest_image = (image, timestamp)
+            scaled = {}
+            for sub in group:
+                out = image
+                if sub.size and sub.size != image.size:
+                    out = scaled.get(sub.size)
+                    if out is None:
+                        out = scaled[sub.size] = image.resize(sub.size)
+                sub.slot.put((out, timestamp))
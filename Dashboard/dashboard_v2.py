@@ -3,188 +3,563 @@ import tkinter as tk
 from tkinter import messagebox
 import threading
 import asyncio
-from bleak import BleakScanner, BleakClient
 import time
-import requests
 import json
-from PIL import Image, ImageTk
-from io import BytesIO
+import copy
 import os
 import tkinter.filedialog as filedialog
+import numpy as np
 
-import socket
+
+from mjpeg import fetch_frame
+from camera import CameraHub, FrameSubscriber, RateMeter, Snapshot, save_burst, NICLA_PORT
+from recorder import MJPEGRecorder, ReplayHub, REPLAY_SPEEDS
+from telemetry import decimate_minmax, rates
+from telemetry_log import TelemetryLogger, TelemetryReplay
+from robot import RobotController
+from transport import BleTransport, SerialTransport, TcpTransport, LoopbackTransport, USB_BAUD, SPP_BAUD
+from loopback import LoopbackRobot
+from mission import MissionExecutor, MissionError, compile_mission, PRESET_NAMES
+from mission_model import MissionModel
 
 # Configuration
 DEFAULT_IP = "192.168.0.7"
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
 
-# UUID-ovi za HC-02 (ISSC)
-UART_RX_CHAR_UUID = "49535343-1e4d-4bd9-ba61-23c647249616" # Notify
-UART_TX_CHAR_UUID = "49535343-8841-43f4-a8d4-ecbe34729bb3" # Write
+# Izbor linka: USB kabel na stolu, BLE na terenu. Adresa je COM port ili host:port.
+TRANSPORTS = ["BLE (HC-02)", "USB Serial", "BT Serial (SPP)", "TCP", "Loopback"]
+DEFAULT_ADDRESS = {"BLE (HC-02)": "HC-02", "USB Serial": "COM3", "BT Serial (SPP)": "COM5",
+                   "TCP": "127.0.0.1:2323", "Loopback": ""}
 
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
-class RobotController:
-    def __init__(self, loop):
-        self.loop = loop
-        self.client = None
-        self.connected = False
-        self.on_telemetry_callback = None
-        self.rx_buffer = ""
-
-    async def connect_ble(self):
-        print("Skeniram BLE uređaje...")
-        devices = await BleakScanner.discover()
-        target = None
-        for d in devices:
-            if d.name and "HC-02" in d.name:
-                target = d
-                break
-        
-        if not target:
-            print("HC-02 nije pronađen.")
-            return False
-
-        print(f"Povezivanje na {target.name}...")
-        self.client = BleakClient(target.address)
-        
-        try:
-            await self.client.connect()
-            self.connected = True
-            print("BLE Povezano!")
-            await self.client.start_notify(UART_RX_CHAR_UUID, self.notification_handler)
-            return True
-        except Exception as e:
-            print(f"Greška pri povezivanju: {e}")
-            self.connected = False
-            return False
-
-    async def disconnect_ble(self):
-        if self.client:
-            await self.client.disconnect()
-            self.connected = False
-            print("BLE Odspojeno.")
-
-    def notification_handler(self, sender, data):
-        try:
-            chunk = data.decode('utf-8', errors='ignore')
-            self.rx_buffer += chunk
-            
-            if "\n" in self.rx_buffer:
-                lines = self.rx_buffer.split("\n")
-                
-                for line in lines[:-1]:
-                    line = line.strip()
-                    if line.startswith("STATUS:"):
-                        # STATUS:cm,pL,pR,armIdx,usF,usB,usL,usR,ind
-                        parts = line.split(":")[1].split(",")
-                        if len(parts) >= 9:
-                            data_dict = {
-                                "cm": parts[0], "pL": parts[1], "pR": parts[2],
-                                "arm": parts[3],
-                                "usF": parts[4], "usB": parts[5], "usL": parts[6], "usR": parts[7],
-                                "ind": parts[8]
-                            }
-                            if self.on_telemetry_callback:
-                                self.on_telemetry_callback(data_dict)
-                    elif line and not line.startswith("DEBUG"): 
-                        print(f"RX: {line}")
-                            
-                self.rx_buffer = lines[-1]
-                
-        except Exception as e:
-            print(f"RX Error: {e}")
-
-    def send_command(self, cmd):
-        if self.connected and self.client:
-             asyncio.run_coroutine_threadsafe(self.write_ble(cmd), self.loop)
-
-    async def write_ble(self, cmd):
-        if self.client and self.connected:
-            try:
-                data = (cmd + "\n").encode('utf-8')
-                await self.client.write_gatt_char(UART_TX_CHAR_UUID, data)
-                print(f"TX: {cmd}")
-            except Exception as e:
-                print(f"TX Fail: {e}")
-
 class WiFiStatusChecker:
     def __init__(self, app, ip, interval=2.0):
         self.app = app
         self.ip = ip
         self.interval = interval
         self.running = False
-        self.thread = None
+        self.future = None
 
     def start(self):
         if not self.running:
             self.running = True
-            self.thread = threading.Thread(target=self.loop, daemon=True)
-            self.thread.start()
+            self.future = asyncio.run_coroutine_threadsafe(self.run(), self.app.loop)
 
-    def loop(self):
+    def stop(self):
+        self.running = False
+        if self.future: self.future.cancel()
+
+    async def run(self):
         while self.running:
             status = False
-            try:
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(1.0)
-                result = sock.connect_ex((self.ip, 8080))
-                if result == 0:
+            hub = CameraHub.for_ip(self.ip)
+            last = hub.stats.last_frame
+            if hub.running and last and time.monotonic() - last < self.interval:
+                # Stream vec prima frameove - ne otvaraj dodatnu vezu prema Nicli
+                status = True
+            else:
+                try:
+                    _, writer = await asyncio.wait_for(asyncio.open_connection(self.ip, NICLA_PORT), 1.0)
+                    writer.close()
                     status = True
-                sock.close()
-            except:
-                status = False
+                except Exception:
+                    status = False
             
-            self.app.update_wifi_status(status)
-            time.sleep(self.interval)
+            self.app.after(0, self.app.update_wifi_status, status)  # Tk dretva
+            await asyncio.sleep(self.interval)
 
 class MJPEGViewer(ctk.CTkLabel):
-    def __init__(self, master, url, **kwargs):
+    def __init__(self, master, hub=None, refresh_ms=33, **kwargs):
         super().__init__(master, text="Waiting for Stream...", **kwargs)
-        self.url = url
+        self.hub = hub
         self.running = False
-        self.thread = None
         self.frame_count = 0
+        self.display_size = (kwargs.get("width", 320), kwargs.get("height", 240))
+        self.refresh_ms = refresh_ms
+
+        # Hub (prijem + dekoder) -> [subscriber.slot] -> Tk after()
+        self.subscriber = FrameSubscriber(size=self.display_size)
+        self._shown_status = None
+        self._photo = None
+        self._after_id = None
+
+        # Statistika streama (overlay u kutu prikaza)
+        self.display_meter = RateMeter()
+        self.lbl_stats = ctk.CTkLabel(self, text="", font=("Consolas", 9), fg_color="black",
+                                      text_color="#9f9", corner_radius=0, height=12, justify="left")
+        self.lbl_stats.place(x=2, rely=1.0, y=-2, anchor="sw")
+        self._stats_due = 0
+        self.visible = True
+        self._subscribed = False
+
+    def attach(self, hub):
+        # Promjena IP-a: prebaci se na drugi hub
+        was_running = self.running
+        self.stop()
+        self.hub = hub
+        if was_running: self.start()
         
     def start(self):
-        if not self.running:
+        if not self.running and self.hub:
             self.running = True
-            self.thread = threading.Thread(target=self.update_stream)
-            self.thread.daemon = True
-            self.thread.start()
+            self._shown_status = None
+            self.update_subscription()
+            self._after_id = self.after(self.refresh_ms, self.present)
             
     def stop(self):
         self.running = False
+        self.update_subscription()
+        if self._after_id:
+            self.after_cancel(self._after_id)
+            self._after_id = None
+        self.lbl_stats.configure(text="")
+
+    def set_visible(self, visible):
+        # Skriveni tab ne treba slike: odjava s huba (hub se gasi ako nitko drugi ne gleda)
+        self.visible = visible
+        self.update_subscription()
+
+    def update_subscription(self):
+        want = self.running and self.visible
+        if want and not self._subscribed:
+            self.hub.subscribe(self.subscriber)
+        elif not want and self._subscribed:
+            self.hub.unsubscribe(self.subscriber)
+        self._subscribed = want
+
+    @property
+    def dropped_frames(self):
+        return self.hub.jpeg_slot.dropped + self.subscriber.slot.dropped
+
+    def stats(self):
+        """Statistika streama za ovaj prikaz (hub + prikaz)."""
+        if not self.hub: return {}
+        stats = self.hub.stats.snapshot()
+        stats["display_fps"] = self.display_meter.rate()[0] if self.running else 0.0
+        stats["dropped"] = self.dropped_frames
+        return stats
+
+    def update_overlay(self):
+        st = self.stats()
+        if not st or not self.running:
+            self.lbl_stats.configure(text="")
+            return
+        fmt = lambda v, f="{:.1f}": "-" if v is None else f.format(v)
+        text = (f"RX {st['rx_fps']:.1f} fps  DISP {st['display_fps']:.1f}  {st['bytes_per_s'] / 1024:.0f} kB/s\n"
+                f"dec p50 {fmt(st['decode_ms_p50'])} p95 {fmt(st['decode_ms_p95'])} ms  "
+                f"drop {st['dropped']}  rc {st['reconnects']}  age {fmt(st['since_last_frame'], '{:.2f}')} s")
+        if st["nicla"]:
+            text += f"\nNicla {st['nicla']}"
+        self.lbl_stats.configure(text=text)
+
+    def present(self):
+        # Tk main loop: pokupi najnoviju dekodiranu sliku (ako je ima)
+        self._after_id = None
+        if not self.running: return
+
+        item = self.subscriber.slot.poll()
+        if item:
+            image, timestamp = item
+            self._photo = ctk.CTkImage(image, size=image.size)
+            self.configure(image=self._photo, text="")
+            self.frame_count += 1
+            self.display_meter.add()
+            self._shown_status = None
+        elif self.hub.status_text and self.hub.status_text != self._shown_status:
+            self.configure(text=self.hub.status_text)
+            self._shown_status = self.hub.status_text
+
+        # Overlay dvaput u sekundi je dovoljno
+        now = time.monotonic()
+        if now >= self._stats_due:
+            self._stats_due = now + 0.5
+            self.update_overlay()
+
+        self._after_id = self.after(self.refresh_ms, self.present)
+
+class TelemetryPlot(ctk.CTkFrame):
+    """
+    Grafovi telemetrije iz povijesti (robot.telemetry) na jednom Canvasu.
+    Svaki kanal je jedna linija min/max decimirana na sirinu u pikselima,
+    pa crtanje kosta isto za 10 s i za 10 min prozor.
+    """
+
+    # (naslov, [(kanal, boja), ...]) - vL/vR se racunaju iz enkodera
+    STRIPS = [
+        ("Enkoderi [pulsevi]", [("pL", "#4af"), ("pR", "#fa4")]),
+        ("Brzina kotaca [cm/s]", [("vL", "#4af"), ("vR", "#fa4")]),
+        ("Udaljenost [cm]", [("cm", "#6f6")]),
+        ("Ultrazvuk [cm]", [("usF", "#f66"), ("usB", "#ff6"), ("usL", "#6ff"), ("usR", "#f6f")]),
+    ]
+    WINDOWS = {"10 s": 10.0, "60 s": 60.0, "10 min": 600.0}
+    FIELDS = ("t", "pL", "pR", "cm", "usF", "usB", "usL", "usR")
+
+    def __init__(self, master, ring, pulses_per_cm=None, refresh_ms=66, **kwargs):
+        super().__init__(master, **kwargs)
+        self.ring = ring
+        self.pulses_per_cm = pulses_per_cm or (lambda: 1.0)
+        self.refresh_ms = refresh_ms
+        self.window = self.WINDOWS["10 s"]
+        self.visible = True
+        self._drawn_count = -1
+        self._after_id = None
+
+        top = ctk.CTkFrame(self, fg_color="transparent")
+        top.pack(fill="x")
+        ctk.CTkLabel(top, text="Telemetrija", font=("Arial", 12, "bold")).pack(side="left", padx=5)
+        self.seg_window = ctk.CTkSegmentedButton(top, values=list(self.WINDOWS), command=self.set_window)
+        self.seg_window.set("10 s")
+        self.seg_window.pack(side="right", padx=5)
+
+        self.canvas = tk.Canvas(self, bg="#1a1a1a", highlightthickness=0, height=320)
+        self.canvas.pack(fill="both", expand=True, padx=2, pady=2)
+        self.canvas.bind("<Configure>", lambda e: self.layout())
+
+        # Itemi se stvaraju jednom, crtanje samo mijenja coords()
+        self.items = []
+        for title, channels in self.STRIPS:
+            strip = {
+                "frame": self.canvas.create_rectangle(0, 0, 0, 0, outline="#333"),
+                "title": self.canvas.create_text(0, 0, anchor="nw", fill="#aaa", font=("Consolas", 8), text=title),
+                "range": self.canvas.create_text(0, 0, anchor="ne", fill="#777", font=("Consolas", 8)),
+                "lines": {name: self.canvas.create_line(0, 0, 0, 0, fill=color, state="hidden")
+                          for name, color in channels},
+            }
+            self.items.append(strip)
+        self.layout()
+
+    def layout(self):
+        w = max(self.canvas.winfo_width(), 1)
+        h = max(self.canvas.winfo_height(), 1)
+        strip_h = h / len(self.STRIPS)
+        self.boxes = []
+        for i, strip in enumerate(self.items):
+            x0, y0, x1, y1 = 2, int(i * strip_h) + 2, w - 2, int((i + 1) * strip_h) - 2
+            self.canvas.coords(strip["frame"], x0, y0, x1, y1)
+            self.canvas.coords(strip["title"], x0 + 3, y0 + 1)
+            self.canvas.coords(strip["range"], x1 - 3, y0 + 1)
+            self.boxes.append((x0, y0 + 12, x1, y1))
+        self._drawn_count = -1
+
+    def set_window(self, name):
+        self.window = self.WINDOWS[name]
+        self._drawn_count = -1
+
+    def set_visible(self, visible):
+        self.visible = visible
 
-    def update_stream(self):
-        print(f"Connecting to {self.url}...")
-        while self.running:
-            try:
-                stream = requests.get(self.url, stream=True, timeout=5)
-                if stream.status_code == 200:
-                    print("Stream Connected!")
-                    bytes_data = bytes()
-                    for chunk in stream.iter_content(chunk_size=1024):
-                        if not self.running: break
-                        bytes_data += chunk
-                        a = bytes_data.find(b'\xff\xd8') # JPEG Start
-                        b = bytes_data.find(b'\xff\xd9') # JPEG End
-                        if a != -1 and b != -1:
-                            jpg = bytes_data[a:b+2]
-                            bytes_data = bytes_data[b+2:] 
-                            try:
-                                image = Image.open(BytesIO(jpg))
-                                # Resize to fit label
-                                photo = ctk.CTkImage(image.resize((320, 240)), size=(320, 240))
-                                self.configure(image=photo, text="")
-                            except Exception as e:
-                                pass
-                else:
-                    self.configure(text=f"Status: {stream.status_code}")
-                    time.sleep(1)
-            except Exception as e:
-                self.configure(text=f"Reconnecting...")
-                time.sleep(1) # Wait before retry
+    def start(self):
+        if not self._after_id:
+            self._after_id = self.after(self.refresh_ms, self.redraw)
+
+    def stop(self):
+        if self._after_id:
+            self.after_cancel(self._after_id)
+            self._after_id = None
+
+    def redraw(self):
+        self._after_id = self.after(self.refresh_ms, self.redraw)
+        count = self.ring.count
+        if not self.visible or not count or count == self._drawn_count:
+            return
+        self._drawn_count = count
+
+        # Viewovi u ring buffer (bez kopije), samo zadnjih `window` sekundi
+        columns = dict(zip(self.FIELDS, self.ring.view(self.FIELDS)))
+        t = columns["t"]
+        t1 = t[-1]
+        t0 = t1 - self.window
+        start = int(np.searchsorted(t, t0))
+        t = t[start:]
+        series = {name: (t, col[start:]) for name, col in columns.items() if name != "t"}
+        scale = self.pulses_per_cm() or 1.0
+        for side in ("L", "R"):
+            tv, v = rates(t, series["p" + side][1])
+            series["v" + side] = (tv, v / scale)
+
+        for (title, channels), strip, box in zip(self.STRIPS, self.items, self.boxes):
+            self.draw_strip(strip, box, channels, series, t0, t1)
+
+    def draw_strip(self, strip, box, channels, series, t0, t1):
+        x0, y0, x1, y1 = box
+        width = int(x1 - x0)
+        decimated = {name: decimate_minmax(*series[name], t0, t1, width) for name, _ in channels}
+        lows = [d[1].min() for d in decimated.values() if len(d[0])]
+        if not lows:
+            for item in strip["lines"].values():
+                self.canvas.itemconfigure(item, state="hidden")
+            return
+        lo = float(min(lows))
+        hi = float(max(d[2].max() for d in decimated.values() if len(d[0])))
+        if hi - lo < 1e-6:
+            lo, hi = lo - 1.0, hi + 1.0
+        self.canvas.itemconfigure(strip["range"], text=f"{lo:.0f} .. {hi:.0f}")
+        ky = (y1 - y0 - 2) / (hi - lo)
+
+        for name, (cols, vmin, vmax) in decimated.items():
+            item = strip["lines"][name]
+            if len(cols) < 1:
+                self.canvas.itemconfigure(item, state="hidden")
+                continue
+            # Cik-cak min->max po stupcu piksela: ovojnica svih uzoraka u stupcu
+            pts = np.empty((len(cols) * 2, 2))
+            pts[0::2, 0] = pts[1::2, 0] = x0 + cols
+            pts[0::2, 1] = y1 - 1 - (vmin - lo) * ky
+            pts[1::2, 1] = y1 - 1 - (vmax - lo) * ky
+            self.canvas.coords(item, pts.ravel().tolist())
+            self.canvas.itemconfigure(item, state="normal")
+
+class MissionListView(ctk.CTkFrame):
+    """
+    Lista koraka misije nad MissionModel. Widgeti postoje samo za vidljive
+    redove (fiksni pool), skrolanje i izmjene modela samo mijenjaju tekst
+    tih redova, pa lista od nekoliko tisuca koraka radi jednako kao od deset.
+
+    Klik oznaci, Ctrl+klik dodaje, Shift+klik raspon. Tipke: Delete,
+    Alt+Gore/Dolje (pomak), Ctrl+C/V (JSON linije, kao misija.txt), Ctrl+Z/Y.
+    """
+
+    ROW_H = 34
+    SELECTED = "#1f538d"
+
+    def __init__(self, master, model, title="Redoslijed Izvođenja", **kwargs):
+        super().__init__(master, **kwargs)
+        self.model = model
+        self.title = title
+        self.first = 0              # Indeks koraka u prvom vidljivom redu
+        self.visible_rows = 0
+        self.selected = set()
+        self.anchor = None          # Pocetak Shift raspona
+        self.rows = []
+
+        self.lbl_title = ctk.CTkLabel(self, text=title, font=("Arial", 12, "bold"))
+        self.lbl_title.pack(fill="x")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        # Obicni tk.Frame: moze imati fokus tipkovnice za precace editora
+        self.body = tk.Frame(self, bg=self._apply_appearance_mode(self.cget("fg_color")), takefocus=1)
+        self.body.pack(side="left", fill="both", expand=True)
+        self.body.grid_columnconfigure(0, weight=1)
+        self.body.bind("<Configure>", self.on_resize)
+        self.bind_wheel(self.body)
+        for seq, handler in (("<Delete>", lambda e: self.delete_selected()),
+                             ("<Alt-Up>", lambda e: self.move_selected(-1)),
+                             ("<Alt-Down>", lambda e: self.move_selected(1)),
+                             ("<Up>", lambda e: self.step_selection(-1)),
+                             ("<Down>", lambda e: self.step_selection(1)),
+                             ("<Control-c>", lambda e: self.copy_selected()),
+                             ("<Control-v>", lambda e: self.paste()),
+                             ("<Control-a>", lambda e: self.select_all()),
+                             ("<Control-z>", lambda e: self.undo()),
+                             ("<Control-y>", lambda e: self.redo())):
+            self.body.bind(seq, lambda e, h=handler: (h(e), "break")[1])
+
+        model.listeners.append(self.on_model_changed)
+        self.update_title()
+
+    # --- Pool redova ---
+
+    def make_row(self):
+        pos = len(self.rows)
+        frame = ctk.CTkFrame(self.body, height=self.ROW_H - 4)
+        label = ctk.CTkLabel(frame, text="", anchor="w", font=("Consolas", 12))
+        label.pack(side="left", fill="x", expand=True, padx=5)
+        # Gumbi se vezu na poziciju u poolu, indeks koraka se racuna pri kliku
+        ctk.CTkButton(frame, text="X", width=30, fg_color="red",
+                      command=lambda: self.row_action(pos, self.delete_selected)).pack(side="right", padx=5)
+        ctk.CTkButton(frame, text="▼", width=30,
+                      command=lambda: self.row_action(pos, lambda: self.move_selected(1))).pack(side="right", padx=2)
+        ctk.CTkButton(frame, text="▲", width=30,
+                      command=lambda: self.row_action(pos, lambda: self.move_selected(-1))).pack(side="right", padx=2)
+        for widget in (frame, label):
+            widget.bind("<Button-1>", lambda e: self.on_click(pos, e))
+            self.bind_wheel(widget)
+        row = {"frame": frame, "label": label, "normal": frame.cget("fg_color"),
+               "text": None, "sel": None, "shown": False}
+        self.rows.append(row)
+        return row
+
+    def bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", lambda e: self.scroll_to(self.first - (1 if e.delta > 0 else -1) * 3))
+        widget.bind("<Button-4>", lambda e: self.scroll_to(self.first - 3))
+        widget.bind("<Button-5>", lambda e: self.scroll_to(self.first + 3))
+
+    def on_resize(self, event):
+        count = max(1, event.height // self.ROW_H)
+        if count == self.visible_rows:
+            return
+        while len(self.rows) < count:
+            self.make_row()
+        # Visak redova se samo sakrije (ostaju u poolu za sljedece povecanje)
+        for row in self.rows[count:]:
+            if row["shown"]:
+                row["frame"].grid_remove()
+                row["shown"] = False
+        self.visible_rows = count
+        self.scroll_to(self.first, force=True)
+
+    # --- Crtanje ---
+
+    def render(self, start=0, stop=None):
+        """Osvjezi vidljive redove s indeksima koraka u [start, stop)."""
+        total = len(self.model)
+        for pos, row in enumerate(self.rows[:self.visible_rows]):
+            i = self.first + pos
+            if i < start or (stop is not None and i >= stop):
+                continue
+            if i >= total:
+                if row["shown"]:
+                    row["frame"].grid_remove()
+                    row["shown"] = False
+                continue
+            text = self.describe(i, self.model[i])
+            if text != row["text"]:
+                row["label"].configure(text=text)
+                row["text"] = text
+            sel = i in self.selected
+            if sel != row["sel"]:
+                row["frame"].configure(fg_color=self.SELECTED if sel else row["normal"])
+                row["sel"] = sel
+            if not row["shown"]:
+                row["frame"].grid(row=pos, column=0, sticky="ew", pady=2)
+                row["shown"] = True
+
+    @staticmethod
+    def describe(i, step):
+        params = " ".join(f"{k}={v}" for k, v in step.items() if k != "cmd")
+        return f"{i+1}. {step.get('cmd', '?')} {params}".rstrip()
+
+    def update_title(self):
+        self.lbl_title.configure(text=f"{self.title} ({len(self.model)})")
+
+    def update_scrollbar(self):
+        total = len(self.model)
+        if total <= self.visible_rows:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.first / total, (self.first + self.visible_rows) / total)
+
+    def scroll_to(self, first, force=False):
+        first = max(0, min(int(first), len(self.model) - self.visible_rows))
+        if force or first != self.first:
+            self.first = first
+            self.render()
+        self.update_scrollbar()
+
+    def on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.scroll_to(float(value) * len(self.model))
+        elif action == "scroll":
+            step = self.visible_rows if unit == "pages" else 1
+            self.scroll_to(self.first + int(value) * step)
+
+    def ensure_visible(self, index):
+        if index < self.first:
+            self.scroll_to(index)
+        elif index >= self.first + self.visible_rows:
+            self.scroll_to(index - self.visible_rows + 1)
+
+    def on_model_changed(self, start, stop):
+        if stop is not None:
+            self.render(start, stop)
+            return
+        # Promijenio se broj koraka: pomak prikaza, oznake van liste van
+        total = len(self.model)
+        self.selected = {i for i in self.selected if i < total}
+        first = max(0, min(self.first, total - self.visible_rows))
+        if first != self.first:
+            self.first = first
+            start = 0
+        self.render(start)
+        self.update_scrollbar()
+        self.update_title()
+
+    # --- Oznacavanje ---
+
+    def on_click(self, pos, event):
+        index = self.first + pos
+        if index >= len(self.model):
+            return
+        self.body.focus_set()
+        if event.state & 0x1 and self.anchor is not None:      # Shift
+            lo, hi = sorted((self.anchor, index))
+            self.select(set(range(lo, hi + 1)))
+        elif event.state & 0x4:                                # Ctrl
+            self.anchor = index
+            self.select(self.selected ^ {index})
+        else:
+            self.anchor = index
+            self.select({index})
+
+    def row_action(self, pos, action):
+        # Gumb na oznacenom redu djeluje na cijelu oznaku, inace samo na taj red
+        index = self.first + pos
+        if index not in self.selected:
+            self.select({index})
+        action()
+
+    def select(self, indices):
+        changed = self.selected ^ set(indices)
+        self.selected = set(indices)
+        for i in changed:
+            if self.first <= i < self.first + self.visible_rows:
+                self.render(i, i + 1)
+
+    def select_all(self):
+        self.select(range(len(self.model)))
+
+    def step_selection(self, delta):
+        if not len(self.model):
+            return
+        index = max(self.selected) + delta if self.selected else 0
+        index = max(0, min(index, len(self.model) - 1))
+        self.anchor = index
+        self.select({index})
+        self.ensure_visible(index)
+
+    # --- Izmjene ---
+
+    def delete_selected(self):
+        indices = self.selected
+        self.select(())
+        self.model.delete(indices)
+
+    def move_selected(self, delta):
+        if not self.selected:
+            return
+        moved = self.model.move(self.selected, delta)
+        self.select(moved)
+        self.ensure_visible(moved[0] if delta < 0 else moved[-1])
+
+    def copy_selected(self):
+        steps = self.model.copy(self.selected)
+        if steps:
+            self.clipboard_clear()
+            self.clipboard_append("\n".join(json.dumps(step) for step in steps))
+
+    def paste(self):
+        """Zalijepi JSON linije iz clipboarda iza zadnjeg oznacenog koraka."""
+        try:
+            lines = self.clipboard_get().splitlines()
+            steps = [json.loads(line) for line in lines if line.strip()]
+        except (tk.TclError, ValueError):
+            return
+        if not steps or not all(isinstance(s, dict) and "cmd" in s for s in steps):
+            return
+        index = max(self.selected) + 1 if self.selected else len(self.model)
+        inserted = self.model.insert(index, steps)
+        self.select(inserted)
+        self.ensure_visible(inserted[-1])
+
+    def undo(self):
+        self.select(())
+        self.model.undo()
+
+    def redo(self):
+        self.select(())
+        self.model.redo()
 
 class DashboardApp(ctk.CTk):
     def __init__(self):
@@ -195,6 +570,7 @@ class DashboardApp(ctk.CTk):
         # Async Loop setup
         self.loop = asyncio.new_event_loop()
         threading.Thread(target=self.start_async_loop, daemon=True).start()
+        CameraHub.loop = self.loop
 
         self.robot = RobotController(self.loop)
         
@@ -213,7 +589,12 @@ class DashboardApp(ctk.CTk):
         self.conn_frame = ctk.CTkFrame(self.sidebar)
         self.conn_frame.grid(row=1, column=0, padx=10, pady=10)
         
-        self.btn_connect = ctk.CTkButton(self.conn_frame, text="Connect BLE (HC-02)", command=self.trigger_connect)
+        self.combo_transport = ctk.CTkOptionMenu(self.conn_frame, values=TRANSPORTS, command=self.on_transport_change)
+        self.combo_transport.pack(pady=(5, 0))
+        self.entry_address = ctk.CTkEntry(self.conn_frame, placeholder_text="COM port / host:port")
+        self.entry_address.pack(pady=5)
+        self.on_transport_change(TRANSPORTS[0])
+        self.btn_connect = ctk.CTkButton(self.conn_frame, text="Connect", command=self.trigger_connect)
         self.btn_connect.pack(pady=5)
         
         # IP Address Input
@@ -223,7 +604,7 @@ class DashboardApp(ctk.CTk):
         self.entry_ip.insert(0, DEFAULT_IP)
         
         # Tabs
-        self.tabview = ctk.CTkTabview(self)
+        self.tabview = ctk.CTkTabview(self, command=self.on_tab_change)
         self.tabview.grid(row=0, column=1, padx=20, pady=20, sticky="nsew")
         
         self.tab_calib = self.tabview.add("Kalibracija")
@@ -236,15 +617,26 @@ class DashboardApp(ctk.CTk):
         self.setup_calibration_tab()
         self.setup_manual_tab()
         self.setup_auto_tab()
+        self.on_tab_change()
         
         # WiFi Checker
         self.wifi_checker = WiFiStatusChecker(self, DEFAULT_IP)
         self.wifi_checker.start()
 
         # Hooks
+        self.latest_telemetry = None
+        self.shown_seq = -1
         self.robot.on_telemetry_callback = self.update_telemetry
+        self.robot.on_link_callback = self.on_link_state
         self.ui_updater()
 
+        # Sve sto stigne s robota (i sto mu posaljemo) ide u binarni log
+        os.makedirs(LOG_DIR, exist_ok=True)
+        self.robot.logger = TelemetryLogger(os.path.join(LOG_DIR, time.strftime("telemetry_%Y%m%d_%H%M%S.tlog")))
+        self.robot.logger.start()
+        self.telemetry_replay = None
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+
         # Key bindings for Manual Drive
         self.bind("<KeyPress>", self.on_key_press)
 
@@ -252,32 +644,65 @@ class DashboardApp(ctk.CTk):
         asyncio.set_event_loop(self.loop)
         self.loop.run_forever()
 
+    def on_transport_change(self, choice):
+        self.entry_address.delete(0, "end")
+        self.entry_address.insert(0, DEFAULT_ADDRESS[choice])
+
+    def make_transport(self):
+        choice = self.combo_transport.get()
+        address = self.entry_address.get().strip()
+        if choice == "USB Serial":
+            return SerialTransport(address, USB_BAUD)
+        if choice == "BT Serial (SPP)":
+            return SerialTransport(address, SPP_BAUD)
+        if choice == "TCP":
+            host, _, port = address.rpartition(":")
+            return TcpTransport(host or "127.0.0.1", int(port))
+        if choice == "Loopback":
+            return LoopbackTransport(LoopbackRobot(), latency=0.005)
+        return BleTransport(name=address or "HC-02")
+
     def trigger_connect(self):
-        if not self.robot.connected:
+        if not self.robot.connected and not self.robot.reconnect_task:
+            try:
+                transport = self.make_transport()
+            except ValueError as e:
+                messagebox.showerror("Connect", f"Neispravna adresa: {e}")
+                return
             self.btn_connect.configure(text="Connecting...", state="disabled")
-            asyncio.run_coroutine_threadsafe(self.connect_ble_logic(), self.loop)
+            asyncio.run_coroutine_threadsafe(self.connect_logic(transport), self.loop)
         else:
-            asyncio.run_coroutine_threadsafe(self.disconnect_ble_logic(), self.loop)
+            asyncio.run_coroutine_threadsafe(self.disconnect_logic(), self.loop)
             
-    async def connect_ble_logic(self):
-        success = await self.robot.connect_ble()
-        if success:
-            self.btn_connect.configure(text="Disconnect BLE", fg_color="red", state="normal")
-        else:
-            self.btn_connect.configure(text="Connect BLE (HC-02)", fg_color="blue", state="normal")
+    async def connect_logic(self, transport):
+        success = await self.robot.connect(transport)
+        self.after(0, self.show_link_state, "connected" if success else "disconnected")
             
-    async def disconnect_ble_logic(self):
-        await self.robot.disconnect_ble()
-        self.btn_connect.configure(text="Connect BLE (HC-02)", fg_color="blue", state="normal")
+    async def disconnect_logic(self):
+        await self.robot.disconnect()
+        self.after(0, self.show_link_state, "disconnected")
+
+    def on_link_state(self, state):
+        # Iz asyncio dretve: veza pukla / ponovno spojena bez klika na gumb.
+        # Tk nije thread-safe, widgeti se diraju samo iz Tk dretve.
+        self.after(0, self.show_link_state, state)
+
+    def show_link_state(self, state):
+        if state == "connected":
+            self.btn_connect.configure(text="Disconnect", fg_color="red", state="normal")
+        elif state == "reconnecting":
+            self.btn_connect.configure(text="Reconnecting... (Stop)", fg_color="orange", state="normal")
+        else:
+            self.btn_connect.configure(text="Connect", fg_color="blue", state="normal")
 
-    def show_image_popup(self, jpg_data):
+    def show_image_popup(self, snapshot):
         try:
             top = ctk.CTkToplevel(self)
-            top.title("Snapshot")
+            stamp = time.strftime("%H:%M:%S", time.localtime(snapshot.timestamp))
+            top.title(f"Snapshot {stamp}.{int(snapshot.timestamp * 1000) % 1000:03d}")
             top.geometry("400x300")
             
-            image = Image.open(BytesIO(jpg_data))
-            photo = ctk.CTkImage(image, size=(320, 240))
+            photo = ctk.CTkImage(snapshot.image, size=(320, 240))
             
             lbl = ctk.CTkLabel(top, text="", image=photo)
             lbl.pack(expand=True, fill="both")
@@ -310,6 +735,23 @@ class DashboardApp(ctk.CTk):
         
         ctk.CTkButton(col1, text="Spremi Config (PID/Motor)", command=self.save_config).pack(pady=10)
 
+        # Grafovi telemetrije (za podesavanje PID-a)
+        self.telemetry_plot = TelemetryPlot(col1, self.robot.telemetry, pulses_per_cm=self.plot_pulses_per_cm)
+        self.telemetry_plot.pack(fill="both", expand=True, padx=2, pady=5)
+        self.telemetry_plot.start()
+
+        log_row = ctk.CTkFrame(col1, fg_color="transparent")
+        log_row.pack(pady=2)
+        ctk.CTkButton(log_row, text="Replay Log", width=80, command=self.start_telemetry_replay).pack(side="left", padx=2)
+        self.combo_log_speed = ctk.CTkOptionMenu(log_row, width=70, values=list(REPLAY_SPEEDS), command=self.set_telemetry_replay_speed)
+        self.combo_log_speed.pack(side="left", padx=2)
+        ctk.CTkButton(log_row, text="Stop", width=50, command=self.stop_telemetry_replay).pack(side="left", padx=2)
+
+        # Latencija komandi (ms): link ukupno + po tipu komande
+        self.lbl_link = ctk.CTkLabel(col1, text="Link: -", font=("Consolas", 10), justify="left", anchor="w")
+        self.lbl_link.pack(fill="x", padx=5, pady=2)
+        self._link_due = 0
+
         # --- COLUMN 2: VIZIJA ---
         ctk.CTkLabel(col2, text="Kamera & Boje", font=("Arial", 16, "bold")).pack(pady=5)
         
@@ -322,13 +764,36 @@ class DashboardApp(ctk.CTk):
         self.lbl_wifi_text.pack(side="left", padx=2)
 
         # Video Stream 
-        self.video_viewer = MJPEGViewer(col2, "", width=320, height=240, fg_color="black")
+        self.video_viewer = MJPEGViewer(col2, CameraHub.for_ip(DEFAULT_IP), width=320, height=240, fg_color="black")
         self.video_viewer.pack(pady=5)
         # Button Row for Stream
         btn_row_calib = ctk.CTkFrame(col2, fg_color="transparent")
         btn_row_calib.pack(pady=5)
         ctk.CTkButton(btn_row_calib, text="Start Stream", command=self.start_video_stream).pack(side="left", padx=2)
         ctk.CTkButton(btn_row_calib, text="Prekini Stream", fg_color="red", command=self.stop_calibration_stream).pack(side="left", padx=2)
+
+        # Snapshot Row
+        snap_row = ctk.CTkFrame(col2, fg_color="transparent")
+        snap_row.pack(pady=2)
+        ctk.CTkButton(snap_row, text="Snapshot", width=80, command=self.take_snapshot).pack(side="left", padx=2)
+        ctk.CTkButton(snap_row, text="Burst", width=60, command=self.take_burst).pack(side="left", padx=2)
+        self.entry_burst = ctk.CTkEntry(snap_row, width=40)
+        self.entry_burst.pack(side="left", padx=2)
+        self.entry_burst.insert(0, "10")
+        self.lbl_snapshot_status = ctk.CTkLabel(snap_row, text="", width=60)
+        self.lbl_snapshot_status.pack(side="left", padx=2)
+
+        # Snimanje & Replay Row
+        rec_row = ctk.CTkFrame(col2, fg_color="transparent")
+        rec_row.pack(pady=2)
+        self.btn_record = ctk.CTkButton(rec_row, text="● Snimaj", width=70, fg_color="darkred", command=self.toggle_recording)
+        self.btn_record.pack(side="left", padx=2)
+        ctk.CTkButton(rec_row, text="Replay", width=60, command=self.start_replay).pack(side="left", padx=2)
+        self.combo_replay_speed = ctk.CTkOptionMenu(rec_row, width=70, values=list(REPLAY_SPEEDS), command=self.set_replay_speed)
+        self.combo_replay_speed.pack(side="left", padx=2)
+        ctk.CTkButton(rec_row, text="Korak ▶", width=60, command=self.replay_step).pack(side="left", padx=2)
+        self.recorder = None
+        self.replay_hub = None
         
         # Color Sliders
         ctk.CTkLabel(col2, text="Kalibracija Boja").pack()
@@ -357,12 +822,7 @@ class DashboardApp(ctk.CTk):
         ctk.CTkLabel(col3, text="Manipulator", font=("Arial", 16, "bold")).pack(pady=5)
         
         # Presets
-        self.preset_names = [
-            "Parkiraj", "Voznja", "Uzmi_Boca", "Uzmi_Limenka", "Uzmi_Spuzva",
-            "Spremi_1", "Spremi_2", "Spremi_3",
-            "Iz_Sprem_1", "Iz_Sprem_2", "Iz_Sprem_3",
-            "Dostava_1", "Dostava_2", "Dostava_3", "Extra"
-        ]
+        self.preset_names = list(PRESET_NAMES)
         self.combo_preset = ctk.CTkComboBox(col3, values=self.preset_names)
         self.combo_preset.pack(pady=5)
         
@@ -426,6 +886,7 @@ class DashboardApp(ctk.CTk):
                 vals.append(self.lab_vars[l].get())
             cmd = f"SET:{obj},{','.join(vals)}"
             print(f"Sending Color Config: {cmd}")
+            self.robot.remember(f"color:{obj}", cmd)  # Ponovno nakon reconnecta
             self.robot.send_command(cmd)
         except Exception as e:
             messagebox.showerror("Error", f"Invalid Values: {e}")
@@ -434,11 +895,85 @@ class DashboardApp(ctk.CTk):
         ip = self.entry_ip.get()
         # Update Wifi Checker IP just in case
         self.wifi_checker.ip = ip 
-        # Ensure URL is set (in case IP changed)
-        self.video_viewer.url = f"http://{ip}:8080"
-        self.video_viewer.stop()
+        # Ensure hub matches IP (in case IP changed)
+        self.video_viewer.attach(CameraHub.for_ip(ip))
         self.video_viewer.start()
 
+    def toggle_recording(self):
+        if self.recorder:
+            self.recorder.stop()
+            self.recorder = None
+            self.btn_record.configure(text="● Snimaj")
+            return
+        filename = filedialog.asksaveasfilename(defaultextension=".mjpeg", initialfile=time.strftime("run_%Y%m%d_%H%M%S.mjpeg"),
+                                                filetypes=[("MJPEG snimka", "*.mjpeg")])
+        if not filename: return
+        self.recorder = MJPEGRecorder(filename)
+        self.recorder.start(CameraHub.for_ip(self.entry_ip.get()))
+        self.btn_record.configure(text="■ Stop")
+
+    def start_replay(self):
+        filename = filedialog.askopenfilename(filetypes=[("MJPEG snimka", "*.mjpeg"), ("All Files", "*.*")])
+        if not filename: return
+        try:
+            hub = ReplayHub(filename, REPLAY_SPEEDS[self.combo_replay_speed.get()])
+        except Exception as e:
+            messagebox.showerror("Error", f"Ne mogu otvoriti snimku: {e}")
+            return
+        self.replay_hub = hub
+        # Oba prikaza na snimku, "Start Stream" ih vraca na kameru
+        for viewer in (self.video_viewer, self.stream_viewer):
+            viewer.attach(hub)
+            viewer.start()
+
+    def set_replay_speed(self, choice):
+        if self.replay_hub: self.replay_hub.set_speed(REPLAY_SPEEDS[choice])
+
+    def replay_step(self):
+        if self.replay_hub: self.replay_hub.step()
+
+    def start_telemetry_replay(self):
+        filename = filedialog.askopenfilename(initialdir=LOG_DIR, filetypes=[("Log telemetrije", "*.tlog"), ("All Files", "*.*")])
+        if not filename: return
+        self.stop_telemetry_replay()
+        try:
+            self.telemetry_replay = TelemetryReplay(filename, self.robot, REPLAY_SPEEDS[self.combo_log_speed.get()])
+        except Exception as e:
+            messagebox.showerror("Error", f"Ne mogu otvoriti log: {e}")
+            return
+        self.telemetry_replay.start(self.loop)
+
+    def set_telemetry_replay_speed(self, choice):
+        if self.telemetry_replay: self.telemetry_replay.set_speed(REPLAY_SPEEDS[choice])
+
+    def stop_telemetry_replay(self):
+        if self.telemetry_replay:
+            self.telemetry_replay.stop()
+            self.telemetry_replay = None
+
+    def on_closing(self):
+        self.stop_telemetry_replay()
+        if self.robot.logger:
+            self.robot.logger.stop()
+        self.destroy()
+
+    def on_tab_change(self):
+        # Slike dekodiramo samo za prikaz koji se vidi
+        tab = self.tabview.get()
+        self.video_viewer.set_visible(tab == "Kalibracija")
+        self.stream_viewer.set_visible(tab == "Autonomno")
+        self.telemetry_plot.set_visible(tab == "Kalibracija")
+
+    def plot_pulses_per_cm(self):
+        try:
+            return float(self.entry_pulses.get())
+        except ValueError:
+            return 1.0
+
+    def camera_stats(self):
+        """Statistika oba prikaza kamere (za debug / logiranje)."""
+        return {"Kalibracija": self.video_viewer.stats(), "Autonomno": self.stream_viewer.stats()}
+
     def stop_calibration_stream(self):
         self.video_viewer.stop()
         self.video_viewer.configure(image=None, text="Stream Stopped")
@@ -506,17 +1041,19 @@ class DashboardApp(ctk.CTk):
         
         ctk.CTkLabel(self.frame_editor, text="EDITOR MISIJE", font=("Arial", 16, "bold")).pack(pady=10)
         
-        self.scroll_editor = ctk.CTkScrollableFrame(self.frame_editor, label_text="Redoslijed Izvođenja")
-        self.scroll_editor.pack(fill="both", expand=True, padx=5, pady=5)
+        # Initialize Mission Steps
+        self.misija_koraci = MissionModel()
+
+        self.mission_list = MissionListView(self.frame_editor, self.misija_koraci)
+        self.mission_list.pack(fill="both", expand=True, padx=5, pady=5)
         
         frame_ed_ctrl = ctk.CTkFrame(self.frame_editor)
         frame_ed_ctrl.pack(fill="x", padx=5, pady=5)
         
         ctk.CTkButton(frame_ed_ctrl, text="EKSPORTIRAJ (misija.txt)", command=self.save_mission, fg_color="green").pack(side="left", fill="x", expand=True, padx=2)
         ctk.CTkButton(frame_ed_ctrl, text="OČISTI SVE", command=self.clear_mission, fg_color="red").pack(side="right", padx=2)
-
-        # Initialize Mission Steps
-        self.misija_koraci = []
+        ctk.CTkButton(frame_ed_ctrl, text="Ponovi", width=60, command=self.mission_list.redo).pack(side="right", padx=2)
+        ctk.CTkButton(frame_ed_ctrl, text="Poništi", width=60, command=self.mission_list.undo).pack(side="right", padx=2)
         
     def load_inspector(self, cmd_type):
         for widget in self.inspector_content.winfo_children():
@@ -577,55 +1114,47 @@ class DashboardApp(ctk.CTk):
         self.robot.send_command(json_str) # Send JSON
         
         self.misija_koraci.append(payload)
-        self.refresh_editor()
-
-    def refresh_editor(self):
-        for w in self.scroll_editor.winfo_children():
-            w.destroy()
-        for i, step in enumerate(self.misija_koraci):
-            f = ctk.CTkFrame(self.scroll_editor)
-            f.pack(fill="x", pady=2)
-            lbl = ctk.CTkLabel(f, text=f"{i+1}. {step['cmd']}", anchor="w", font=("Consolas", 12))
-            lbl.pack(side="left", padx=5)
-            ctk.CTkButton(f, text="X", width=30, fg_color="red", command=lambda idx=i: self.delete_step(idx)).pack(side="right", padx=5)
-            if i > 0: ctk.CTkButton(f, text="▲", width=30, command=lambda idx=i: self.move_step(idx, -1)).pack(side="right", padx=2)
-            if i < len(self.misija_koraci)-1: ctk.CTkButton(f, text="▼", width=30, command=lambda idx=i: self.move_step(idx, 1)).pack(side="right", padx=2)
-
-    def delete_step(self, index):
-        if 0 <= index < len(self.misija_koraci):
-            self.misija_koraci.pop(index)
-            self.refresh_editor()
-
-    def move_step(self, index, direction):
-        new_idx = index + direction
-        if 0 <= new_idx < len(self.misija_koraci):
-            self.misija_koraci[index], self.misija_koraci[new_idx] = self.misija_koraci[new_idx], self.misija_koraci[index]
-            self.refresh_editor()
-            
+        self.mission_list.ensure_visible(len(self.misija_koraci) - 1)
+
     def clear_mission(self):
-        self.misija_koraci = []
-        self.refresh_editor()
+        self.misija_koraci.clear()
 
-    def update_telemetry(self, data):
-        self.latest_telemetry = data
+    def update_telemetry(self, sample):
+        self.latest_telemetry = sample
 
     def ui_updater(self):
-        if hasattr(self, 'latest_telemetry') and self.latest_telemetry:
-            d = self.latest_telemetry
+        d = self.robot.telemetry.last
+        if d is not None and d.seq != self.shown_seq:
+            self.shown_seq = d.seq
             # Update Labels
-            self.lbl_dist.configure(text=f"Distance: {d['cm']} cm")
-            self.lbl_enc.configure(text=f"Enc: L={d['pL']} R={d['pR']}")
-            self.lbl_arm.configure(text=f"Arm Preset: {d['arm']}")
-            self.lbl_us_fb.configure(text=f"Front: {d['usF']} | Back: {d['usB']}")
-            self.lbl_us_lr.configure(text=f"Left: {d['usL']} | Right: {d['usR']}")
+            if hasattr(self, 'lbl_dist'):
+                self.lbl_dist.configure(text=f"Distance: {d.cm:.2f} cm")
+                self.lbl_enc.configure(text=f"Enc: L={d.pL} R={d.pR}")
+                self.lbl_arm.configure(text=f"Arm Preset: {d.arm}")
+                self.lbl_us_fb.configure(text=f"Front: {d.usF} | Back: {d.usB}")
+                self.lbl_us_lr.configure(text=f"Left: {d.usL} | Right: {d.usR}")
             
             # Auto Tab Updates
             if hasattr(self, 'lbl_auto_dist'):
-                self.lbl_auto_dist.configure(text=f"Distance: {d['cm']} cm | Enc: {d['pL']}/{d['pR']}")
-                self.lbl_auto_sensors.configure(text=f"US: F={d['usF']} B={d['usB']} L={d['usL']} R={d['usR']} | I={d['ind']}")
+                self.lbl_auto_dist.configure(text=f"Distance: {d.cm:.2f} cm | Enc: {d.pL}/{d.pR}")
+                self.lbl_auto_sensors.configure(text=f"US: F={d.usF} B={d.usB} L={d.usL} R={d.usR} | I={d.ind}")
+
+        now = time.monotonic()
+        if now >= self._link_due:
+            self._link_due = now + 1.0
+            self.update_link_stats()
             
         self.after(100, self.ui_updater)
 
+    def update_link_stats(self):
+        st = self.robot.link.snapshot()
+        fmt = lambda v: "-" if v is None else f"{v:.0f}"
+        row = lambda name, h: f"{name:<10} p50 {fmt(h['p50']):>4} p95 {fmt(h['p95']):>4} p99 {fmt(h['p99']):>4} max {fmt(h['max']):>4}  n={h['n']}"
+        lines = [row("Link", st["link"]) + f"  lost={st['lost']}  coalesced={self.robot.scheduler.coalesced}"]
+        busiest = sorted(st["commands"].items(), key=lambda kv: -kv[1]["n"])[:5]
+        lines += [row(kind, h) for kind, h in busiest]
+        self.lbl_link.configure(text="\n".join(lines))
+
     def exec_record_arm(self):
         preset = self.man_preset_combo.get()
         # 1. Execute
@@ -637,31 +1166,51 @@ class DashboardApp(ctk.CTk):
         except: pass
 
     def take_snapshot(self):
-        # Fetch single frame
         ip = self.entry_ip.get()
-        url = f"http://{ip}:8080" # Root returns MJPEG stream usually...
-        # Nicla script sends MJPEG. We can just open, read one frame, close.
-        threading.Thread(target=self._snapshot_thread, args=(url,), daemon=True).start()
+        # Ako stream vec radi, snapshot je zadnji primljeni frame iz huba
+        snapshot = CameraHub.for_ip(ip).snapshot()
+        if snapshot:
+            self.show_snapshot(snapshot)
+            return
+        # Fallback: nema aktivnog streama, otvori vezu i procitaj jedan frame
+        url = f"http://{ip}:{NICLA_PORT}"
+        asyncio.run_coroutine_threadsafe(self.fetch_snapshot(url), self.loop)
         
-    def _snapshot_thread(self, url):
+    async def fetch_snapshot(self, url):
+        # Na asyncio petlji: popup i labela idu u Tk dretvu preko after()
         try:
-            self.lbl_snapshot_status.configure(text="Fetching...")
-            stream = requests.get(url, stream=True, timeout=2)
-            if stream.status_code == 200:
-                bytes_data = bytes()
-                for chunk in stream.iter_content(chunk_size=1024):
-                    bytes_data += chunk
-                    a = bytes_data.find(b'\xff\xd8')
-                    b = bytes_data.find(b'\xff\xd9')
-                    if a != -1 and b != -1:
-                        jpg = bytes_data[a:b+2]
-                        # Show in popup
-                        self.show_image_popup(jpg)
-                        break
-            self.lbl_snapshot_status.configure(text="Done")
+            self.after(0, lambda: self.lbl_snapshot_status.configure(text="Fetching..."))
+            snapshot = Snapshot(await fetch_frame(url, timeout=2), time.time())
+            self.after(0, self.show_snapshot, snapshot)
         except Exception as e:
-            self.lbl_snapshot_status.configure(text="Error")
+            self.after(0, lambda: self.lbl_snapshot_status.configure(text="Error"))
             print(e)
+
+    def show_snapshot(self, snapshot):
+        self.show_image_popup(snapshot)
+        self.lbl_snapshot_status.configure(text="Done")
+
+    def take_burst(self):
+        try:
+            count = int(self.entry_burst.get())
+        except ValueError:
+            messagebox.showerror("Error", "Broj frameova mora biti cijeli broj")
+            return
+        folder = filedialog.askdirectory(title="Mapa za burst snapshot")
+        if not folder: return
+
+        def save(frames):
+            # Radna dretva executora: labela se osvjezava iz Tk dretve
+            paths = save_burst(frames, folder)
+            print(f"Burst: spremljeno {len(paths)} frameova u {folder}")
+            self.after(0, lambda: self.lbl_snapshot_status.configure(text=f"Saved {len(paths)}"))
+
+        def on_done(frames):
+            # Poziva se na asyncio petlji - disk ide u executor
+            self.loop.run_in_executor(None, save, frames)
+
+        self.lbl_snapshot_status.configure(text="Burst...")
+        CameraHub.for_ip(self.entry_ip.get()).capture_burst(count, on_done)
             
     def log_mission_step(self, text):
         self.waypoints_list.configure(state="normal")
@@ -694,7 +1243,7 @@ class DashboardApp(ctk.CTk):
         self.lbl_auto_wifi_text.pack(side="left", padx=2)
 
         # MJPEG Viewer
-        self.stream_viewer = MJPEGViewer(left_col, url=f"http://{DEFAULT_IP}:8080", width=400, height=300)
+        self.stream_viewer = MJPEGViewer(left_col, CameraHub.for_ip(DEFAULT_IP), width=400, height=300)
         self.stream_viewer.pack(pady=5)
         
         # Auto Stream Buttons
@@ -723,75 +1272,91 @@ class DashboardApp(ctk.CTk):
         ctk.CTkButton(btn_row, text="Učitaj (misija.txt)", command=self.load_mission).pack(side="left", padx=5)
         ctk.CTkButton(btn_row, text="POKRENI MISIJU", fg_color="green", command=self.start_mission).pack(side="left", padx=5)
         ctk.CTkButton(btn_row, text="STOP", fg_color="red", command=self.stop_mission).pack(side="left", padx=5)
+        # Autonomna misija iz firmwarea (Smart Start) - robot iz mirovanja krece samo na {"cmd": "start"}
+        ctk.CTkButton(btn_row, text="SMART START", fg_color="#8a5a00", command=self.smart_start).pack(side="left", padx=5)
+        # Na robotu: misija se posalje odjednom u red koraka, robot je vrti bez cekanja na link
+        self.chk_onboard = ctk.CTkCheckBox(right_col, text="Izvrsi na robotu (upload)")
+        self.chk_onboard.pack(pady=2)
 
-        self.mission_running = False
+        self.mission = MissionExecutor(self.robot, self.on_mission_step, self.on_mission_finish)
+        self.mission_source = None   # Tekst iz kojeg su prevedeni mission_steps
+        self.mission_steps = []
 
     def refresh_stream(self):
          ip = self.entry_ip.get()
-         self.stream_viewer.url = f"http://{ip}:8080"
-         self.stream_viewer.stop()
+         self.stream_viewer.attach(CameraHub.for_ip(ip))
          self.stream_viewer.start()
 
     def start_mission(self):
-        if self.mission_running: return
-        self.mission_running = True
-        threading.Thread(target=self.run_mission_thread, daemon=True).start()
+        if self.mission.running: return
+        steps = self.compile_loaded_mission()
+        if steps is None:
+            return
+        if not self.robot.connected:
+            messagebox.showerror("Misija", "Robot nije spojen")
+            return
+        self.lbl_auto_status.configure(text="STATUS: RUNNING", text_color="green")
+        self.mission.start(steps, onboard=bool(self.chk_onboard.get()))
+
+    def compile_loaded_mission(self):
+        # Prevodi se samo ako se tekst promijenio od zadnjeg puta (load_mission ili rucna izmjena)
+        source = self.log_box.get("1.0", "end")
+        if source != self.mission_source:
+            try:
+                self.mission_steps = compile_mission(source.splitlines(), self.preset_names)
+            except MissionError as e:
+                messagebox.showerror("Misija", str(e))
+                return None
+            self.mission_source = source
+        return self.mission_steps
 
     def stop_mission(self):
-        self.mission_running = False
-        self.robot.send_command("MAN:STOP") # or STANI
+        if self.mission.running:
+            self.mission.stop()  # Executor salje stop kad se task prekine
+        else:
+            self.robot.send_command(json.dumps({"cmd": "stop"}))
         self.lbl_auto_status.configure(text="STATUS: STOPPED", text_color="red")
 
-    def run_mission_thread(self):
-        self.lbl_auto_status.configure(text="STATUS: RUNNING", text_color="green")
-        lines = self.log_box.get("1.0", "end").splitlines()
-        
-        for i, line in enumerate(lines):
-            if not self.mission_running: break
-            line = line.strip()
-            if not line or line.startswith("---") or line.startswith("#"): continue
-            
-            print(f"Executing: {line}")
-            # Use 'after' if we want detailed UI update, but thread safe way often required
-            # For status label, we risk it or queue it. CTK usually handles text config okay from threads.
-            self.lbl_auto_status.configure(text=f"Exec: {line}")
-            
-            parts = line.split(":") 
-            cmd_type = parts[0]
-            
-            if cmd_type == "MOVE":
-                target = int(float(parts[1]))
-                cmd = f"MOVE:{target}" 
-                self.robot.send_command(cmd)
-                
-                # Wait logic
-                time.sleep(0.5) 
-                start_time = time.time()
-                while self.mission_running:
-                    if time.time() - start_time > 10: break 
-                    try:
-                        curr = float(self.latest_telemetry.get('cm', 0))
-                        if abs(curr) >= abs(target) - 2:
-                            break
-                    except: pass
-                    time.sleep(0.1)
-                time.sleep(0.5) 
-
-            elif cmd_type == "ARM":
-                preset_name = parts[1]
-                try:
-                    idx = self.preset_names.index(preset_name)
-                    self.robot.send_command(f"LOAD_PRESET:{idx}")
-                    time.sleep(2.0)
-                except:
-                    print(f"Unknown Preset: {preset_name}")
-            
-            elif cmd_type == "WAIT":
-                ms = int(parts[1])
-                time.sleep(ms / 1000.0)
+    def smart_start(self):
+        if self.mission.running: return
+        future = self.robot.send_request({"cmd": "start"})
+        future.add_done_callback(lambda f: self.after(0, self.report_start, f))
 
-        self.mission_running = False
-        self.lbl_auto_status.configure(text="STATUS: DONE", text_color="blue")
+    def report_start(self, future):
+        try:
+            status = future.result().get("status")
+        except Exception as e:
+            self.lbl_auto_status.configure(text="START: nema odgovora", text_color="red")
+            messagebox.showerror("Start", str(e) or "Robot ne odgovara")
+            return
+        # STARTED = krenuo Smart Start, BUSY = robot vec vozi (prvo STOP)
+        color = "green" if status == "STARTED" else "orange"
+        self.lbl_auto_status.configure(text=f"STATUS: {status}", text_color=color)
+
+    def on_mission_step(self, index, step):
+        print(f"Executing: {step.text}")
+        self.after(0, lambda: self.lbl_auto_status.configure(text=f"Exec: {step.text}"))
+
+    def on_mission_finish(self, status, message):
+        profile = self.mission.profile
+        if profile and profile.steps:
+            # Na asyncio petlji (BLE, kamera): pisanje na disk ide u executor, s kopijom
+            # profila (kasni DONE iz otkazanog koraka ga ne mijenja dok se pise)
+            self.loop.run_in_executor(None, self.save_mission_profile, copy.deepcopy(profile))
+        colors = {"done": "blue", "stopped": "red", "error": "red"}
+        text = "STATUS: DONE" if status == "done" else f"STATUS: {status.upper()}"
+        self.after(0, lambda: self.lbl_auto_status.configure(text=text, text_color=colors[status]))
+        if status == "error":
+            self.after(0, lambda: messagebox.showerror("Misija", message))
+
+    def save_mission_profile(self, profile):
+        # Profil svakog pokretanja ide u logs/ - usporedba s profileMission.py
+        print(profile.table())
+        os.makedirs(LOG_DIR, exist_ok=True)
+        base = os.path.join(LOG_DIR, time.strftime("mission_%Y%m%d_%H%M%S"))
+        profile.save_json(base + ".json")
+        profile.save_html(base + ".html")
+        print(f"Profil misije: {base}.json")
 
     def create_input(self, parent, label):
         f = ctk.CTkFrame(parent, fg_color="transparent")
@@ -802,17 +1367,28 @@ class DashboardApp(ctk.CTk):
         return e
 
     def save_config(self):
-        # 1. PID
-        kp = self.entry_kp.get()
-        ki = self.entry_ki.get()
-        kd = self.entry_kd.get()
-        self.robot.send_command(f"PID:{kp},{ki},{kd}")
-        time.sleep(0.1)
-        
-        # 2. Motor
-        puls = self.entry_pulses.get()
-        spd = self.entry_speed.get()
-        self.robot.send_command(f"SET_MOTOR:{puls},{spd}")
+        try:
+            pid = {"cmd": "set_pid", "p": float(self.entry_kp.get()), "i": float(self.entry_ki.get()), "d": float(self.entry_kd.get())}
+            motor = {"cmd": "set_motor", "ppc": float(self.entry_pulses.get()), "spd": int(self.entry_speed.get())}
+        except ValueError:
+            messagebox.showerror("Error", "Greska u brojevima!")
+            return
+
+        self.robot.remember("pid", pid)
+        self.robot.remember("motor", motor)
+
+        # Obje komande u letu odjednom, potvrda kad robot odgovori na obje
+        async def save():
+            return await asyncio.gather(self.robot.request(pid), self.robot.request(motor), return_exceptions=True)
+        future = asyncio.run_coroutine_threadsafe(save(), self.loop)
+        future.add_done_callback(lambda f: self.after(0, self.report_config, f.result()))
+
+    def report_config(self, replies):
+        errors = [str(r) for r in replies if isinstance(r, Exception)]
+        if errors:
+            messagebox.showerror("Error", "Config nije spremljen:\n" + "\n".join(errors))
+        else:
+            print(f"Config spremljen: {', '.join(r['status'] for r in replies)}")
 
     def save_preset(self):
         name = self.combo_preset.get()
@@ -873,6 +1449,9 @@ class DashboardApp(ctk.CTk):
             
             # Optional: Display loaded filename in label if exists, or just log it
             print(f"Loaded mission from {filename}")
+            steps = self.compile_loaded_mission()
+            if steps is not None:
+                print(f"Misija prevedena: {len(steps)} koraka")
             
         except Exception as e:
             messagebox.showerror("Error", f"Could not load: {e}")
@@ -0,0 +1,347 @@
+# link.py
+# Komandni kanal prema robotu: id-evi komandi i mjerenje latencije.
+#
+# Svaka JSON komanda dobije "id" prije slanja, a firmware ga vraca u odgovoru
+# ({"status": "OK", "id": 17}). Vrijeme od slanja do odgovora ide u histogram
+# po tipu komande i u zajednicki histogram linka. Ping u pozadini
+# ({"cmd": "ping"} -> PONG) uzorkuje link i kad nitko nista ne salje.
+#
+# RobotController.request() salje komandu i vraca odgovor s istim id-em (ili
+# TimeoutError); do REQUEST_WINDOW komandi ceka odgovor istovremeno, a
+# idempotentne se ponavljaju kad se odgovor izgubi.
+#
+# CommandScheduler je izlazni red: spaja komande servo/rucne voznje (salje se
+# samo najnovija), ostalo salje strogo redom, a stop preskace red. Sto se
+# skupi dok link pise ide zajedno u sljedece pisanje (transport.py).
+
+import asyncio
+import collections
+import itertools
+import json
+import time
+
+SUB_BITS = 7               # 64 pod-bucketa po oktavi -> greska < 2%
+SUB_COUNT = 1 << SUB_BITS
+HALF_COUNT = SUB_COUNT // 2
+MAX_VALUE_US = 1 << 32     # ~71 minuta, sve iznad se reze
+
+PING_INTERVAL = 1.0        # s
+REPLY_TIMEOUT = 10.0       # s, nakon toga se komanda broji kao izgubljena
+
+REQUEST_TIMEOUT = 1.5      # s po pokusaju
+REQUEST_RETRIES = 2        # Samo za idempotentne komande
+REQUEST_WINDOW = 4         # Koliko komandi smije cekati odgovor istovremeno
+
+# Ponoviti ih je bezopasno (isti rezultat ako ih robot primi dvaput)
+IDEMPOTENT = {"set_pid", "set_motor", "save_eeprom", "stop", "ping", "get_pose", "telemetry", "cal_imu"}
+
+# Sto stop izbacuje iz reda (JSON komande i tekstualne po prefiksu)
+MOTION_COMMANDS = {"straight", "turn", "pivot", "move_dual", "manual", "arm", "preset", "start", "mission_run"}
+MOTION_PREFIXES = ("MAN:", "SERVO:", "LOAD_PRESET:")
+
+ID_RESERVE = len(', "id": 999999')  # Mjesto za id u take_batch()
+QUIET = {"ping"}  # Ne ispisuju se kao TX (ping svake sekunde)
+
+
+def _bucket(v):
+    if v < SUB_COUNT:
+        return v
+    e = v.bit_length() - SUB_BITS
+    return SUB_COUNT + (e - 1) * HALF_COUNT + (v >> e) - HALF_COUNT
+
+
+def _bucket_high(i):
+    # Najveca vrijednost koja pada u bucket i
+    if i < SUB_COUNT:
+        return i
+    e = (i - SUB_COUNT) // HALF_COUNT + 1
+    m = (i - SUB_COUNT) % HALF_COUNT + HALF_COUNT
+    return ((m + 1) << e) - 1
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram latencija u mikrosekundama: logaritamske oktave s
+    linearnim pod-bucketima, fiksna memorija, relativna greska ispod 2%.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (_bucket(MAX_VALUE_US - 1) + 1)
+        self.count = 0
+        self.max_us = 0
+
+    def record(self, seconds):
+        us = min(max(int(seconds * 1e6), 0), MAX_VALUE_US - 1)
+        self.counts[_bucket(us)] += 1
+        self.count += 1
+        if us > self.max_us:
+            self.max_us = us
+
+    def percentile(self, q):
+        """Latencija (ms) ispod koje je q posto uzoraka."""
+        if not self.count:
+            return None
+        rank = max(1, -(-self.count * q // 100))  # ceil, nearest-rank kao camera.percentiles
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return min(_bucket_high(i), self.max_us) / 1000.0
+        return self.max_us / 1000.0
+
+    def snapshot(self):
+        return {"n": self.count,
+                "p50": self.percentile(50), "p95": self.percentile(95), "p99": self.percentile(99),
+                "max": self.max_us / 1000.0 if self.count else None}
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.max_us = 0
+
+
+class LinkMonitor:
+    """
+    Dodjeljuje id-eve JSON komandama i spaja ih s odgovorima robota.
+    tag() se zove neposredno prije pisanja na link, on_reply() za svaki
+    primljeni JSON - obje iz asyncio dretve. Tko ceka odgovor (request)
+    registrira future u `waiters` pod id-em iz prepare().
+    """
+
+    def __init__(self):
+        self.ids = itertools.count(1)
+        self.pending = {}           # id -> (tip komande, vrijeme slanja)
+        self.by_command = {}        # tip -> LatencyHistogram
+        self.link = LatencyHistogram()
+        self.sent = 0
+        self.lost = 0
+        self.last_rtt = None
+        self.waiters = {}           # id -> asyncio.Future za odgovor
+
+    def tag(self, cmd):
+        """Dodaje "id" JSON komandi i biljezi vrijeme slanja. Ostalo vraca nepromijenjeno."""
+        if not cmd.startswith("{"):
+            return cmd
+        try:
+            msg = json.loads(cmd)
+        except ValueError:
+            return cmd
+        if not isinstance(msg, dict) or "cmd" not in msg:
+            return cmd
+        # Ponovljeni pokusaj zadrzava id (kasni odgovor na prvi i dalje vrijedi)
+        cmd_id = msg.get("id") or next(self.ids)
+        msg["id"] = cmd_id
+        self.pending[cmd_id] = (msg["cmd"], time.perf_counter())
+        self.sent += 1
+        return json.dumps(msg)
+
+    def prepare(self, cmd):
+        """Dodjeljuje id unaprijed (za request). Vraca (id, tekst komande)."""
+        msg = json.loads(cmd) if isinstance(cmd, str) else dict(cmd)
+        if not isinstance(msg, dict) or "cmd" not in msg:
+            raise ValueError(f"Odgovor se moze cekati samo na JSON komandu: {cmd}")
+        msg["id"] = cmd_id = next(self.ids)
+        return cmd_id, json.dumps(msg)
+
+    def on_reply(self, msg, t=None):
+        """Vraca (tip, rtt u s) ako je msg odgovor na nasu komandu, inace None."""
+        cmd_id = msg.get("id") if isinstance(msg, dict) else None
+        waiter = self.waiters.get(cmd_id)
+        if waiter and not waiter.done():
+            waiter.set_result(msg)
+        entry = self.pending.pop(cmd_id, None)
+        if entry is None:
+            return None
+        kind, sent = entry
+        rtt = (time.perf_counter() if t is None else t) - sent
+        self.last_rtt = rtt
+        self.link.record(rtt)
+        hist = self.by_command.get(kind)
+        if hist is None:
+            hist = self.by_command[kind] = LatencyHistogram()
+        hist.record(rtt)
+        return kind, rtt
+
+    def expire(self, timeout=REPLY_TIMEOUT):
+        now = time.perf_counter()
+        for cmd_id, (kind, sent) in list(self.pending.items()):
+            if now - sent > timeout:
+                del self.pending[cmd_id]
+                self.lost += 1
+
+    def snapshot(self):
+        stats = {"link": self.link.snapshot(), "sent": self.sent, "lost": self.lost,
+                 "pending": len(self.pending)}
+        # list(): Tk dretva cita dok asyncio dretva moze dodati novi tip
+        stats["commands"] = {kind: hist.snapshot() for kind, hist in list(self.by_command.items())}
+        return stats
+
+    def summary(self):
+        """Kratki tekst za log (stane u TEXT_SIZE zapisa)."""
+        s = self.link.snapshot()
+        fmt = lambda v: "-" if v is None else f"{v:.0f}"
+        return f"n={s['n']} p50={fmt(s['p50'])} p95={fmt(s['p95'])} p99={fmt(s['p99'])} max={fmt(s['max'])} lost={self.lost}"
+
+
+# --- Slanje: spajanje komandi i pakiranje u pisanja ---
+
+
+def _json_cmd(cmd):
+    if not cmd.startswith("{"):
+        return None
+    try:
+        msg = json.loads(cmd)
+    except ValueError:
+        return None
+    return msg.get("cmd") if isinstance(msg, dict) else None
+
+
+def command_channel(cmd):
+    """
+    Kanal za spajanje: komande istog kanala koje jos cekaju zamjenjuje
+    najnovija (servo N, rucna voznja). None = komanda ide strogo redom.
+    """
+    if cmd.startswith("SERVO:"):
+        return "servo:" + cmd[6:].split(",", 1)[0]
+    if cmd.startswith("MAN:") and not is_stop(cmd):
+        return "manual"
+    if _json_cmd(cmd) == "manual":
+        return "manual"
+    return None
+
+
+def is_idempotent(cmd):
+    return _json_cmd(cmd) in IDEMPOTENT
+
+
+def wire_size(cmd):
+    """Bajtova na linku: komanda + '\\n' + "id" koji LinkMonitor.tag() doda JSON komandi."""
+    size = len(cmd.encode("utf-8")) + 1
+    if _json_cmd(cmd) and '"id"' not in cmd:
+        size += ID_RESERVE
+    return size
+
+
+def is_quiet(cmd):
+    return _json_cmd(cmd) in QUIET
+
+
+def is_stop(cmd):
+    return cmd in ("MAN:STOP", "STOP") or _json_cmd(cmd) == "stop"
+
+
+def is_motion(cmd):
+    """Komanda koja pokrece pogon ili ruku - stop je izbacuje iz reda."""
+    return cmd.startswith(MOTION_PREFIXES) or _json_cmd(cmd) in MOTION_COMMANDS
+
+
+class CommandScheduler:
+    """
+    Red komandi prema robotu (jedan po RobotControlleru, radi na njegovom loopu).
+
+    - Spojive komande (command_channel): ceka samo najnovija vrijednost po kanalu.
+    - Ostale idu strogo redom kojim su poslane; spojive koje cekaju idu ispred
+      komande koja je stigla poslije njih.
+    - Stop preskace red i salje se odmah; sve komande kretanja i ruke koje jos
+      cekaju (is_motion) se odbacuju, da robot nakon stopa ne krene dalje.
+    - Komande koje cekaju pakiraju se u jedno pisanje do `write_size()` bajtova.
+      Brzinu odredjuje transport (write ceka dok link ne moze primiti jos),
+      a za to vrijeme se nove vrijednosti spajaju u redu.
+    """
+
+    def __init__(self, loop, write, write_size=lambda: 20):
+        self.loop = loop
+        self.write = write              # async write(cmds, urgent) - RobotController.write_commands
+        self.write_size = write_size
+        self.ordered = collections.deque()
+        self.latest = {}                # kanal -> najnovija komanda (redom prvog dolaska)
+        self.stops = collections.deque()
+        self.task = None
+        self.sent = 0
+        self.batches = 0
+        self.coalesced = 0
+        self.dropped = 0                # Komande kretanja odbacene zbog stopa
+        self._wake = None
+
+    def submit(self, cmd):
+        """Thread-safe (Tk dretva)."""
+        self.loop.call_soon_threadsafe(self.enqueue, cmd)
+
+    def enqueue(self, cmd):
+        """Isto kao submit(), ali samo iz dretve loopa."""
+        if is_stop(cmd):
+            self.stops.append(cmd)
+            self.drop_motion()
+        else:
+            channel = command_channel(cmd)
+            if channel is None:
+                # Spojene vrijednosti koje cekaju su stigle prije: idu ispred (npr. SERVO prije SAVE_PRESET)
+                self.ordered.extend(self.latest.values())
+                self.latest.clear()
+                self.ordered.append(cmd)
+            else:
+                if channel in self.latest:
+                    self.coalesced += 1
+                self.latest[channel] = cmd
+        if self.task is None or self.task.done():
+            self._wake = asyncio.Event()
+            self.task = asyncio.ensure_future(self.run())
+        self._wake.set()
+
+    def drop_motion(self):
+        kept = [cmd for cmd in self.ordered if not is_motion(cmd)]
+        self.dropped += len(self.ordered) - len(kept)
+        self.ordered = collections.deque(kept)
+        for channel, cmd in list(self.latest.items()):
+            if is_motion(cmd):
+                del self.latest[channel]
+                self.dropped += 1
+
+    @property
+    def pending(self):
+        return len(self.stops) + len(self.ordered) + len(self.latest)
+
+    def clear(self):
+        self.ordered.clear()
+        self.latest.clear()
+        self.stops.clear()
+
+    def _peek(self):
+        if self.ordered:
+            return self.ordered[0]
+        if self.latest:
+            return self.latest[next(iter(self.latest))]
+        return None
+
+    def _pop(self):
+        if self.ordered:
+            return self.ordered.popleft()
+        return self.latest.pop(next(iter(self.latest)))
+
+    def take_batch(self):
+        """(komande, hitno) za jedno pisanje. Stopovi idu sami i odmah."""
+        if self.stops:
+            cmds = list(self.stops)
+            self.stops.clear()
+            return cmds, True
+        limit = self.write_size()
+        cmds = [self._pop()]
+        size = wire_size(cmds[0])
+        while True:
+            nxt = self._peek()
+            if nxt is None or size + wire_size(nxt) > limit:
+                break
+            cmds.append(self._pop())
+            size += wire_size(nxt)
+        return cmds, False
+
+    async def run(self):
+        while True:
+            if not self.pending:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            cmds, urgent = self.take_batch()
+            await self.write(cmds, urgent)
+            self.sent += len(cmds)
+            self.batches += 1
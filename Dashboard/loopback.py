@@ -0,0 +1,252 @@
+# loopback.py
+# Robot u memoriji za transport.LoopbackTransport: odgovara na JSON komande
+# kao checkSerial() u Robot_Main.ino (isti statusi, vraca "id"), salje DONE
+# kad "voznja" zavrsi, ARM_DONE kad ruka stigne, i STATUS telemetriju (tekst ili binarni okvir).
+# Red koraka (mission_clear/mission_add/mission_run) se vrti kao FAZA_RED_KORAKA.
+# Faza (phase) prati trenutnaFaza: iz mirovanja ("cekanje") robota pokrece
+# samo {"cmd": "start"}, ping/telemetry/mission_* ga ne smiju pokrenuti.
+# Tako se cijeli Dashboard (framer, red komandi, request/ack, log) moze
+# vrtjeti bez robota.
+
+import asyncio
+import json
+import time
+
+from telemetry import STATUS_FRAME, STATUS_SYNC, crc16
+
+# Statusi iz checkSerial()
+REPLIES = {
+    "straight": "OK", "move_dual": "OK", "turn": "OK", "pivot": "OK", "arm": "OK", "preset": "OK",
+    "stop": "STOPPED", "set_pid": "PID_SAVED", "set_motor": "MOTOR_SAVED",
+    "cal_imu": "IMU_CALIBRATED", "save_eeprom": "SAVED", "ping": "PONG",
+}
+MOTION = {"straight", "move_dual", "turn", "pivot"}
+QUEUE_OPS = ("straight", "turn", "pivot", "move_dual", "arm", "preset", "wait", "sync")  # VrstaKoraka
+FLAG_OVERLAP = 16  # KORAK_PARALELNO
+MAX_KORAKA = 64
+
+# trenutnaFaza (FazaMisije) koje loopback glumi
+CEKANJE, SMART_START, RED_KORAKA, KRAJ = "cekanje", "smart_start", "red_koraka", "kraj"
+SMART_START_CM = 10.0  # izvrsiSmartStart(): zapocniVoznju(10)
+
+SPEED_CM_S = 25.0      # Brzina "voznje" (cm/s)
+TURN_DEG_S = 90.0
+ARM_TIME = 1.5         # s po sekvenci ruke
+PULSES_PER_CM = 40.0   # Zadano u ucitajKonfiguraciju()
+
+
+class LoopbackRobot:
+    """Protokol robota bez hardvera. receive()/send() rade u dretvi loopa."""
+
+    def __init__(self, telemetry_hz=10):
+        self.transport = None
+        self._buf = bytearray()
+        self.binary = False
+        self.period = 1.0 / telemetry_hz
+        self.telemetry_task = None
+        self.motion = None          # asyncio.TimerHandle za DONE
+        self.arm = None             # asyncio.TimerHandle za ARM_DONE
+        self.commands = []          # Sve primljene linije (za provjeru u testu)
+        self.seq = 0
+        self.cm = 0.0
+        self._move = None           # (start cm, cilj cm, t0, trajanje)
+        self.queue = []             # Red koraka: [vrsta, a, b, c]
+        self.queue_task = None
+        self.phase = CEKANJE
+
+    def attach(self, transport):
+        # Novi spoj: kao nakon reseta firmwarea, telemetrija je opet tekst
+        self.transport = transport
+        self.binary = False
+        self._buf.clear()
+        self.telemetry_task = asyncio.ensure_future(self.telemetry_loop())
+
+    def detach(self):
+        if self.telemetry_task:
+            self.telemetry_task.cancel()
+            self.telemetry_task = None
+        self.stop_motion()
+        self.stop_queue()
+        if self.arm:
+            self.arm.cancel()
+            self.arm = None
+        self.transport = None
+
+    def send(self, text):
+        if self.transport:
+            self.transport.send(text.encode("utf-8") + b"\r\n")
+
+    def reply(self, status, msg):
+        out = {"status": status}
+        if "id" in msg:
+            out["id"] = msg["id"]
+        self.send(json.dumps(out))
+
+    def receive(self, data):
+        self._buf += data
+        while True:
+            nl = self._buf.find(b"\n")
+            if nl == -1:
+                return
+            line = bytes(self._buf[:nl]).strip()
+            del self._buf[:nl + 1]
+            if line:
+                self.handle_line(line.decode("utf-8", "replace"))
+
+    def handle_line(self, line):
+        self.commands.append(line)
+        try:
+            msg = json.loads(line)
+        except ValueError:
+            return  # Tekstualne komande (SERVO:, MAN:, ...) firmware ne obradjuje
+        cmd = msg.get("cmd") if isinstance(msg, dict) else None
+        if cmd == "telemetry":
+            self.binary = msg.get("mode", "text") == "bin"
+            self.period = 1.0 / min(max(int(msg.get("hz", 10)), 1), 50)
+            self.reply("TELEM_BIN" if self.binary else "TELEM_TEXT", msg)
+        elif cmd == "start":
+            if self.phase == CEKANJE:
+                self.phase = SMART_START
+                self.reply("STARTED", msg)
+                self.start_motion("straight", {"val": SMART_START_CM})
+            else:
+                self.reply("BUSY", msg)
+        elif cmd == "stop":
+            self.stop_motion()
+            self.stop_queue()
+            self.phase = CEKANJE
+            self.reply("STOPPED", msg)
+        elif str(cmd).startswith("mission_") and self.phase not in (CEKANJE, KRAJ):
+            self.reply("BUSY", msg)  # uMirovanju()
+        elif cmd == "mission_clear":
+            self.queue.clear()
+            self.reply("CLEARED", msg)
+        elif cmd == "mission_add":
+            flat = msg.get("s", [])
+            steps = [flat[i:i + 4] for i in range(0, len(flat) - 3, 4)]
+            if len(self.queue) + len(steps) > MAX_KORAKA:
+                self.reply("QUEUE_FULL", msg)
+            else:
+                self.queue += steps
+                self.reply("QUEUED", msg)
+        elif cmd == "mission_run":
+            if msg.get("n", len(self.queue)) != len(self.queue):
+                self.reply("COUNT_MISMATCH", msg)
+            else:
+                self.stop_queue()
+                self.queue_task = asyncio.ensure_future(self.run_queue())
+                self.phase = RED_KORAKA
+                self.reply("RUNNING", msg)
+        elif cmd in REPLIES:
+            self.reply(REPLIES[cmd], msg)
+            if cmd in MOTION:
+                self.start_motion(cmd, msg)
+            elif cmd in ("arm", "preset"):
+                self.start_arm()
+
+    def start_motion(self, cmd, msg):
+        if cmd == "straight":
+            dist = float(msg.get("val", 0))
+            duration = abs(dist) / SPEED_CM_S
+        elif cmd == "move_dual":
+            dist = float(msg.get("dist", 0))
+            duration = abs(dist) / SPEED_CM_S
+        else:
+            dist, duration = 0.0, abs(float(msg.get("val", 0))) / TURN_DEG_S
+        self.stop_motion()
+        self._move = (self.cm, self.cm + dist, time.monotonic(), duration)
+        loop = asyncio.get_running_loop()
+        self.motion = loop.call_later(duration, self.finish_motion)
+
+    def start_arm(self):
+        # Ruka radi neovisno o voznji (ruka.azuriraj() u loop())
+        if self.arm:
+            self.arm.cancel()
+        self.arm = asyncio.get_running_loop().call_later(ARM_TIME, self.finish_arm)
+
+    def finish_arm(self):
+        self.arm = None
+        self.send('{"status": "ARM_DONE"}')
+
+    def stop_queue(self):
+        if self.queue_task:
+            self.queue_task.cancel()
+            self.queue_task = None
+
+    async def run_queue(self):
+        # Kao izvrsiRedKoraka(): STEP pri pokretanju koraka, MISSION_DONE na kraju.
+        # Korak s FLAG_OVERLAP ne blokira, sljedeci ceka samo isti resurs ili sync.
+        t0 = time.monotonic()
+        running = {}  # resurs -> task
+        try:
+            for i, (op, a, b, c) in enumerate(self.queue):
+                op = int(op)
+                kind = QUEUE_OPS[op & ~FLAG_OVERLAP]
+                resource = "drive" if kind in MOTION else "arm" if kind in ("arm", "preset") else None
+                if kind == "sync":
+                    await asyncio.gather(*running.values())
+                    running.clear()
+                elif resource in running:
+                    await running.pop(resource)
+                self.send(json.dumps({"status": "STEP", "i": i}))
+                task = asyncio.ensure_future(self.run_step(kind, a))
+                if op & FLAG_OVERLAP:
+                    running[resource] = task
+                else:
+                    await task
+            await asyncio.gather(*running.values())
+        finally:
+            for task in running.values():
+                task.cancel()
+        self.queue_task = None
+        self.phase = KRAJ
+        self.send(json.dumps({"status": "MISSION_DONE", "n": len(self.queue),
+                              "ms": int((time.monotonic() - t0) * 1000)}))
+
+    async def run_step(self, kind, a):
+        if kind == "wait":
+            await asyncio.sleep(a / 1000.0)
+        elif kind in MOTION:
+            self.start_motion(kind, {"val": a, "dist": a})
+            await asyncio.sleep(self._move[3])  # finish_motion() je zakazan prije, DONE ide prvi
+        elif kind != "sync":
+            self.start_arm()
+            await asyncio.sleep(ARM_TIME)
+
+    def stop_motion(self):
+        if self.motion:
+            self.motion.cancel()
+            self.motion = None
+        self.cm = self.position()
+        self._move = None
+
+    def finish_motion(self):
+        self.cm = self._move[1]
+        self._move = None
+        self.motion = None
+        self.send('{"status": "DONE"}')
+
+    def position(self):
+        if self._move is None:
+            return self.cm
+        start, target, t0, duration = self._move
+        k = min((time.monotonic() - t0) / duration, 1.0) if duration > 0 else 1.0
+        return start + (target - start) * k
+
+    def status_frame(self):
+        cm = self.position()
+        pulses = int(cm * PULSES_PER_CM)
+        values = (cm, pulses, pulses, -1, 0, 0, 0, 0, 0)
+        if not self.binary:
+            return ("STATUS:" + ",".join(f"{v:.2f}" if isinstance(v, float) else str(v) for v in values)
+                    + "\r\n").encode("ascii")
+        frame = bytearray(STATUS_FRAME.pack(STATUS_SYNC, self.seq & 0xFFFF,
+                                            int(time.monotonic() * 1000) & 0xFFFFFFFF, *values, 0))
+        frame[-2:] = crc16(frame[2:-2]).to_bytes(2, "little")
+        return bytes(frame)
+
+    async def telemetry_loop(self):
+        while self.transport:
+            self.transport.send(self.status_frame())
+            self.seq += 1
+            await asyncio.sleep(self.period)
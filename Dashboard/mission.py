@@ -0,0 +1,494 @@
+# mission.py
+# Misije: prevodjenje (compile_mission) i izvrsavanje (MissionExecutor).
+#
+# compile_mission() jednom provjeri cijelu misiju - JSON retke iz planera
+# ({"cmd": "straight", "val": 50}) i stari tekstualni format (MOVE:50,
+# ARM:Voznja, WAIT:500) - u listu tipiziranih Stepova s brojcanim
+# parametrima i razrijesenim indeksima preseta. Greske se javljaju s brojem
+# retka prije nego robot krene.
+#
+# MissionExecutor vrti misiju na dva nacina:
+# - s Dashboarda: svaki korak je request() (ceka OK s istim id-em) i onda
+#   dogadjaj zavrsetka: {"status": "DONE"} za voznju, {"status": "ARM_DONE"}
+#   za ruku, ili uvjet nad telemetrijom. Sljedeci korak krece cim dogadjaj
+#   stigne - nema fiksnih sleepova ni pollanja.
+# - na robotu: cijela misija se posalje u red koraka u firmwareu
+#   (mission_add), robot ih vrti jedan za drugim iz loop() bez cekanja na
+#   link, a napredak javlja porukama {"status": "STEP", "i": n}.
+# Korak oznacen za preklapanje ("overlap": true, u tekstu "&ARM:Voznja") se
+# pokrene i odmah se ide dalje. Sljedeci korak ceka samo ako treba isti
+# resurs (pogon ili ruka) ili je SYNC - npr. ruka se sklapa dok robot vozi.
+# Svaki korak ima timeout, a stop() prekida task misije (CancelledError).
+# Svako pokretanje biljezi vremenski profil (profiler.MissionProfile).
+
+import asyncio
+import json
+import time
+
+from profiler import MissionProfile, SEND, ACK, START, DONE, END
+from robot import after_reply
+
+MOVE_TIMEOUT = 15.0      # s, voznja koja ne zavrsi do tada = robot je zapeo
+TURN_TIMEOUT = 8.0
+ARM_TIMEOUT = 6.0        # Stari firmware ne salje ARM_DONE - nakon ovoga idemo dalje
+MOVE_TOLERANCE_CM = 2.0  # Kao stara provjera u run_mission_thread
+UPLOAD_STEPS_PER_LINE = 6  # Koraka po mission_add (StaticJsonDocument<512> u firmwareu)
+UPLOAD_RETRIES = 2         # Ponavljanja mission_clear prije odustajanja
+MAX_ROBOT_STEPS = 64       # MAX_KORAKA u Robot_Main.ino
+
+# Kako korak zavrsava
+UNTIL_DONE = "done"          # {"status": "DONE"} nakon OK-a
+UNTIL_ARM = "arm_done"       # {"status": "ARM_DONE"} nakon OK-a
+UNTIL_TIME = "time"          # Samo cekanje (WAIT)
+UNTIL_SYNC = "sync"          # Ceka da zavrse svi koraci koji se preklapaju
+
+# Resursi - koraci s istim resursom se nikad ne preklapaju
+DRIVE = "drive"
+ARM = "arm"
+
+# Vrste koraka -> kod u redu koraka firmwarea (VrstaKoraka u Robot_Main.ino)
+OPCODES = {"straight": 0, "turn": 1, "pivot": 2, "move_dual": 3, "arm": 4, "preset": 5, "wait": 6, "sync": 7}
+FLAG_OVERLAP = 16  # vrsta | FLAG_OVERLAP: ne cekaj kraj koraka (KORAK_PARALELNO)
+MOTION = ("straight", "turn", "pivot", "move_dual")
+
+# Imena preseta 0-14 (presetNames u Robot_Main.ino)
+PRESET_NAMES = [
+    "Parkiraj", "Voznja", "Uzmi_Boca", "Uzmi_Limenka", "Uzmi_Spuzva",
+    "Spremi_1", "Spremi_2", "Spremi_3",
+    "Iz_Sprem_1", "Iz_Sprem_2", "Iz_Sprem_3",
+    "Dostava_1", "Dostava_2", "Dostava_3", "Extra"
+]
+
+# Sekvence koje Manipulator::zapocniSekvencu() razlikuje (ostalo = Voznja)
+ARM_SEQUENCES = ("uzmi_boca", "uzmi_limenka", "uzmi_spuzva")
+ARM_DEFAULT = "voznja"  # Bilo koje drugo ime -> preset 1 (Voznja)
+
+
+class MissionError(Exception):
+    pass
+
+
+class Step:
+    """
+    Jedan prevedeni korak. Parametri su vec brojevi:
+    straight/turn/pivot: a = cm ili stupnjevi; move_dual: a = cm, b = l, c = r;
+    arm: b = indeks u ARM_SEQUENCES (-1 = Voznja); preset: b = indeks; wait: a = ms.
+    overlap: sljedeci korak smije krenuti prije nego ovaj zavrsi.
+    """
+
+    __slots__ = ("kind", "a", "b", "c", "line", "text", "overlap")
+
+    def __init__(self, kind, a=0.0, b=0, c=0, line=0, text="", overlap=False):
+        self.kind = kind
+        self.a = a
+        self.b = b
+        self.c = c
+        self.line = line        # Redak u datoteci misije (za poruke)
+        self.text = text
+        self.overlap = overlap
+
+    def __repr__(self):
+        return f"Step({self.text!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, Step) and self.encode() == other.encode()
+
+    @property
+    def until(self):
+        if self.kind in MOTION:
+            return UNTIL_DONE
+        if self.kind == "sync":
+            return UNTIL_SYNC
+        return UNTIL_TIME if self.kind == "wait" else UNTIL_ARM
+
+    @property
+    def resource(self):
+        if self.kind in MOTION:
+            return DRIVE
+        return ARM if self.kind in ("arm", "preset") else None
+
+    @property
+    def timeout(self):
+        if self.kind in ("straight", "move_dual", "sync"):
+            return MOVE_TIMEOUT
+        if self.kind in ("turn", "pivot"):
+            return TURN_TIMEOUT
+        return None if self.kind == "wait" else ARM_TIMEOUT
+
+    @property
+    def abort_on_timeout(self):
+        # Zapela voznja je opasna, zakasnjeli ARM_DONE (stari firmware) nije
+        return self.kind in MOTION
+
+    def command(self):
+        """JSON komanda za izvrsavanje s Dashboarda (None za wait)."""
+        if self.kind in ("straight", "turn", "pivot"):
+            return {"cmd": self.kind, "val": self.a}
+        if self.kind == "move_dual":
+            return {"cmd": "move_dual", "l": self.b, "r": self.c, "dist": self.a}
+        if self.kind == "arm":
+            return {"cmd": "arm", "val": ARM_SEQUENCES[self.b] if self.b >= 0 else ARM_DEFAULT}
+        if self.kind == "preset":
+            return {"cmd": "preset", "idx": self.b}
+        return None
+
+    def encode(self):
+        """[vrsta, a, b, c] za red koraka u firmwareu."""
+        return [OPCODES[self.kind] | (FLAG_OVERLAP if self.overlap else 0), round(self.a, 2), self.b, self.c]
+
+
+def _number(value, n, name, low, high):
+    try:
+        x = float(value)
+    except (TypeError, ValueError):
+        raise MissionError(f"Redak {n}: '{name}' nije broj ({value!r})") from None
+    if not low <= x <= high:
+        raise MissionError(f"Redak {n}: '{name}' = {x:g} izvan [{low:g}, {high:g}]")
+    return x
+
+
+def _arm_sequence(name):
+    # Usporedba kao u zapocniSekvencu(): tocno ime, sve ostalo je Voznja
+    name = str(name)
+    return ARM_SEQUENCES.index(name) if name in ARM_SEQUENCES else -1
+
+
+def _preset(name, n, preset_names):
+    if isinstance(name, (int, float)) and not isinstance(name, bool):
+        idx = int(name)
+    else:
+        try:
+            idx = preset_names.index(str(name).strip())
+        except ValueError:
+            raise MissionError(f"Redak {n}: nepoznat preset '{name}'") from None
+    if not 0 <= idx < len(preset_names):
+        raise MissionError(f"Redak {n}: preset {idx} ne postoji")
+    return idx
+
+
+def _json_step(msg, n, text, preset_names):
+    if not isinstance(msg, dict) or "cmd" not in msg:
+        raise MissionError(f"Redak {n}: JSON korak mora imati \"cmd\"")
+    kind = msg["cmd"]
+    if kind == "straight":
+        return Step(kind, _number(msg.get("val"), n, "val", -500, 500), line=n, text=text)
+    if kind in ("turn", "pivot"):
+        return Step(kind, _number(msg.get("val"), n, "val", -360, 360), line=n, text=text)
+    if kind == "move_dual":
+        return Step(kind, _number(msg.get("dist"), n, "dist", -500, 500),
+                    int(_number(msg.get("l"), n, "l", -255, 255)),
+                    int(_number(msg.get("r"), n, "r", -255, 255)), line=n, text=text)
+    if kind == "arm":
+        if "val" not in msg:
+            raise MissionError(f"Redak {n}: arm bez \"val\"")
+        return Step(kind, b=_arm_sequence(msg["val"]), line=n, text=text)
+    if kind == "preset":
+        return Step(kind, b=_preset(msg.get("idx", msg.get("val")), n, preset_names), line=n, text=text)
+    if kind == "wait":
+        return Step(kind, _number(msg.get("ms", msg.get("val")), n, "ms", 0, 60000), line=n, text=text)
+    if kind == "sync":
+        return Step(kind, line=n, text=text)
+    raise MissionError(f"Redak {n}: nepoznata komanda '{kind}'")
+
+
+def compile_mission(lines, preset_names):
+    """
+    Misija (retci datoteke ili textboxa) -> [Step]. Prazni retci, "#" i "---"
+    se preskacu. Prva greska baca MissionError s brojem retka.
+    """
+    steps = []
+    for n, raw in enumerate(lines, 1):
+        line = raw.strip()
+        if not line or line.startswith("---") or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            try:
+                msg = json.loads(line)
+            except ValueError as e:
+                raise MissionError(f"Redak {n}: neispravan JSON ({e})") from None
+            step = _json_step(msg, n, line, preset_names)
+            step.overlap = bool(msg.get("overlap", False))
+        else:
+            step = _text_step(line[1:] if line.startswith("&") else line, n, line, preset_names)
+            step.overlap = line.startswith("&")
+        if step.overlap and step.resource is None:
+            raise MissionError(f"Redak {n}: '{step.kind}' se ne moze preklapati")
+        steps.append(step)
+    return steps
+
+
+def _text_step(line, n, text, preset_names):
+    kind, _, arg = line.partition(":")
+    if kind == "MOVE":
+        return Step("straight", _number(arg, n, "MOVE", -500, 500), line=n, text=text)
+    if kind == "ARM":
+        return Step("preset", b=_preset(arg, n, preset_names), line=n, text=text)
+    if kind == "WAIT":
+        return Step("wait", _number(arg, n, "WAIT", 0, 60000), line=n, text=text)
+    if kind == "SYNC":
+        return Step("sync", line=n, text=text)
+    raise MissionError(f"Redak {n}: nepoznata komanda '{kind}'")
+
+
+def encoders_moved():
+    """Uvjet nad telemetrijom: enkoderi su se pomaknuli (reset na 0 na pocetku voznje se ne racuna)."""
+    last = None
+
+    def match(sample):
+        nonlocal last
+        prev, last = last, (sample.pL, sample.pR)
+        return prev is not None and last != prev and last != (0, 0)
+    return match
+
+
+def move_reached(target_cm, since):
+    """
+    Uvjet nad telemetrijom za voznju: prijedjeni put je na cilju i enkoderi
+    stoje. Rezerva za firmware koji ne salje DONE. Broje se samo uzorci
+    primljeni nakon slanja komande (`since`, time.time()) i tek kad su se
+    enkoderi pomaknuli - stari uzorak prosle voznje ne zavrsava korak.
+    Prag je uvijek > 0, i za cilj manji od MOVE_TOLERANCE_CM.
+    """
+    threshold = max(abs(target_cm) - MOVE_TOLERANCE_CM, abs(target_cm) / 2)
+    last = None
+    started = False
+
+    def match(sample):
+        nonlocal last, started
+        if sample.t <= since:
+            return False
+        prev, last = last, (sample.pL, sample.pR)
+        if prev is None:
+            return False
+        started = started or last != prev
+        return started and prev == last and abs(sample.cm) >= threshold
+    return match
+
+
+class MissionExecutor:
+    """
+    Vrti listu Stepova na loopu RobotControllera. start()/stop() su
+    thread-safe (Tk dretva), callbacki se zovu iz dretve loopa.
+    """
+
+    def __init__(self, robot, on_step=None, on_finish=None):
+        self.robot = robot
+        self.on_step = on_step          # on_step(indeks, step)
+        self.on_finish = on_finish      # on_finish(status, poruka): "done", "stopped", "error"
+        self.future = None
+        self.profile = None             # MissionProfile zadnjeg pokretanja
+
+    @property
+    def running(self):
+        return self.future is not None and not self.future.done()
+
+    def start(self, steps, onboard=False):
+        if self.running:
+            return False
+        self.profile = MissionProfile(time.strftime("%H:%M:%S"), "onboard" if onboard else "dashboard")
+        coro = self.run_onboard(steps) if onboard else self.run(steps)
+        self.future = asyncio.run_coroutine_threadsafe(coro, self.robot.loop)
+        return True
+
+    def stop(self):
+        if self.running:
+            self.future.cancel()  # Otkazuje task na loopu, run() salje stop
+
+    async def run(self, steps):
+        await self.guard(self.run_steps(steps))
+
+    async def run_onboard(self, steps):
+        await self.guard(self.run_queue(steps))
+
+    async def guard(self, coro):
+        started = time.perf_counter()
+        try:
+            message = await coro
+        except asyncio.CancelledError:
+            self.stop_robot()
+            self.finish("stopped", "Misija prekinuta")
+            raise
+        except (MissionError, ConnectionError, TimeoutError) as e:
+            self.stop_robot()
+            self.finish("error", str(e))
+            return
+        self.finish("done", message or f"Misija gotova za {time.perf_counter() - started:.1f} s")
+
+    async def run_steps(self, steps):
+        self.profile.begin(steps)
+        running = {}  # resurs -> task koraka koji se jos preklapa
+        try:
+            for i, step in enumerate(steps):
+                for task in running.values():
+                    if task.done():
+                        task.result()  # Greska u koraku koji se preklapao (npr. zapela voznja)
+                if step.kind == "sync":
+                    if self.on_step:
+                        self.on_step(i, step)
+                    self.profile.mark(i, SEND)
+                    await asyncio.gather(*running.values())
+                    running.clear()
+                    self.profile.mark(i, END)
+                    self.profile.outcome(i, "done")
+                    continue
+                if step.resource in running:
+                    await running.pop(step.resource)  # Isti resurs: cekaj kraj prethodnog
+                if self.on_step:
+                    self.on_step(i, step)
+                finish = await self.launch(step, i)
+                if step.overlap:
+                    running[step.resource] = asyncio.ensure_future(finish)
+                else:
+                    await finish
+            await asyncio.gather(*running.values())
+        finally:
+            for task in running.values():
+                task.cancel()
+
+    async def execute(self, step, index=0):
+        await (await self.launch(step, index))
+
+    async def launch(self, step, index=0):
+        """Posalje komandu koraka i ceka OK. Vraca korutinu koja ceka kraj koraka."""
+        profile = self.profile
+        if profile is None or index >= len(profile.steps):
+            profile = self.profile = MissionProfile()
+            profile.begin([step])
+            index = 0
+        profile.mark(index, SEND)
+        if step.until == UNTIL_TIME:
+            async def sleep():
+                await asyncio.sleep(step.a / 1000.0)
+                profile.mark(index, END)
+                profile.outcome(index, "done")
+            return sleep()
+
+        cmd = step.command()
+        sent = time.time()
+        reply = await self.robot.request(cmd)
+        profile.mark(index, ACK)
+        status = "DONE" if step.until == UNTIL_DONE else "ARM_DONE"
+        events = [self.robot.events.wait_json(after_reply(reply.get("id"), status))]
+        if step.kind == "straight":
+            events.append(self.robot.events.wait_sample(move_reached(step.a, sent)))
+
+        def finished(outcome):
+            def callback(future):
+                if not future.cancelled() and DONE not in profile.steps[index].times:
+                    profile.mark(index, DONE)
+                    profile.outcome(index, outcome)
+            return callback
+        for event, outcome in zip(events, ("done", "telemetry")):
+            event.add_done_callback(finished(outcome))
+        if step.kind in MOTION:
+            moved = self.robot.events.wait_sample(encoders_moved())
+            moved.add_done_callback(lambda f: f.cancelled() or profile.mark(index, START))
+        else:
+            moved = None
+            profile.mark(index, START)  # Ruka krece cim firmware primi komandu
+        return self.complete(step, index, events, moved, status)
+
+    async def complete(self, step, index, events, moved, status):
+        profile = self.profile
+        try:
+            done, _ = await asyncio.wait(events, timeout=step.timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for event in events + ([moved] if moved else []):
+                event.cancel()
+        profile.mark(index, END)
+        if not done:
+            profile.outcome(index, "timeout")
+            if step.abort_on_timeout:
+                raise MissionError(f"Redak {step.line}: '{step.text}' nije zavrsio za {step.timeout:.0f} s")
+            print(f"Nema {status} za '{step.text}' nakon {step.timeout:.0f} s, nastavljam")
+
+    async def upload(self, steps):
+        """Salje misiju u red koraka firmwarea. Retci idu jedan za drugim bez cekanja (prozor request())."""
+        if len(steps) > MAX_ROBOT_STEPS:
+            raise MissionError(f"Misija ima {len(steps)} koraka, robot prima najvise {MAX_ROBOT_STEPS}")
+        # mission_clear je bezopasno ponoviti; bez CLEARED se nista dalje ne salje
+        try:
+            reply = await self.robot.request({"cmd": "mission_clear"}, retries=UPLOAD_RETRIES)
+        except TimeoutError:
+            raise MissionError("Robot ne odgovara na mission_clear, misija nije poslana")
+        if reply.get("status") != "CLEARED":
+            raise MissionError(f"Robot nije obrisao red koraka: {reply.get('status')}")
+        # mission_add se ne ponavlja (koraci bi se dodali dvaput), izgubljeni redak hvata mission_run "n"
+        chunks = []
+        for i in range(0, len(steps), UPLOAD_STEPS_PER_LINE):
+            flat = [x for step in steps[i:i + UPLOAD_STEPS_PER_LINE] for x in step.encode()]
+            chunks.append(self.robot.request({"cmd": "mission_add", "s": flat}))
+        try:
+            replies = await asyncio.gather(*chunks)
+        except TimeoutError:
+            raise MissionError("Robot ne odgovara na mission_add, misija nije poslana")
+        for reply in replies:
+            if reply.get("status") != "QUEUED":
+                raise MissionError(f"Robot nije primio korake: {reply.get('status')}")
+
+    async def run_queue(self, steps):
+        profile = self.profile
+        profile.begin(steps)
+        await self.upload(steps)
+        print(f"Misija poslana ({len(steps)} koraka) za {profile.now() * 1000:.0f} ms")
+
+        progress = asyncio.Queue()
+        index = -1
+        last = {}  # resurs -> indeks zadnjeg pokrenutog koraka (DONE/ARM_DONE pripada njemu)
+
+        def listener(msg):
+            # Vremena se biljeze u trenutku dolaska poruke, ne kad ih run_queue procita
+            nonlocal index
+            status = msg.get("status")
+            if status in ("STEP", "MISSION_DONE"):
+                profile.mark(index, END)
+                if 0 <= index < len(steps) and steps[index].until in (UNTIL_TIME, UNTIL_SYNC):
+                    profile.outcome(index, "done")
+                if status == "STEP":
+                    index = int(msg.get("i", 0))
+                    profile.mark(index, START)
+                    if 0 <= index < len(steps):
+                        last[steps[index].resource] = index
+                progress.put_nowait(msg)
+            elif status in ("DONE", "ARM_DONE"):
+                i = last.get(DRIVE if status == "DONE" else ARM, index)
+                profile.mark(i, DONE)
+                profile.outcome(i, "done")
+
+        self.robot.events.listeners.append(listener)
+        try:
+            reply = await self.robot.request({"cmd": "mission_run", "n": len(steps)})
+            if reply.get("status") != "RUNNING":
+                raise MissionError(f"Robot nije pokrenuo misiju: {reply.get('status')}")
+            profile.upload = profile.now()
+            current = steps[0] if steps else None
+            # Korak koji se preklapa moze odgoditi javljanje sljedecih (konflikt resursa, SYNC)
+            slack = max([s.timeout for s in steps if s.overlap] + [0.0])
+            while True:
+                timeout = (current.timeout or current.a / 1000.0) + ARM_TIMEOUT if current else ARM_TIMEOUT
+                timeout += slack
+                try:
+                    msg = await asyncio.wait_for(progress.get(), timeout)
+                except asyncio.TimeoutError:
+                    raise MissionError(f"Robot ne javlja napredak ({current.text if current else '-'})") from None
+                if msg["status"] == "MISSION_DONE":
+                    return f"Misija gotova na robotu za {msg.get('ms', 0) / 1000.0:.1f} s"
+                i = int(msg.get("i", 0))
+                if 0 <= i < len(steps):
+                    current = steps[i]
+                    if self.on_step:
+                        self.on_step(i, current)
+        finally:
+            self.robot.events.listeners.remove(listener)
+
+    def stop_robot(self):
+        # Hitno, preskace red (CommandScheduler). Stop zaustavlja i red koraka na robotu.
+        if self.robot.connected:
+            self.robot.scheduler.enqueue(json.dumps({"cmd": "stop"}))
+
+    def finish(self, status, message):
+        if self.profile:
+            self.profile.finish(status)
+        print(message)
+        if self.on_finish:
+            self.on_finish(status, message)
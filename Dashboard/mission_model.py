@@ -0,0 +1,145 @@
+# mission_model.py
+# Model koraka za editor misije (tab Ucenje): lista JSON koraka iz planera
+# s inkrementalnim obavijestima i undo/redo. Bez Tk-a.
+#
+# Sve izmjene se svode na dvije primitive nad listom: "take" (izbaci koraka
+# na indeksima) i "put" (umetni korake na indekse). Obje su jedan prolaz
+# kroz listu, pa je brisanje/pomicanje tisuca oznacenih koraka jednako brzo
+# kao jednog. Svaka operacija sprema svoj inverz za undo.
+#
+# Listeneri dobivaju (start, stop): promijenjeni su redovi od start do stop
+# (stop = None: do kraja, jer se broj koraka promijenio). View (dashboard_v2)
+# osvjezava samo vidljive redove u tom rasponu.
+
+import copy
+
+UNDO_LIMIT = 200
+
+
+class MissionModel:
+    """Koraci misije (dictovi kao {"cmd": "straight", "val": 50})."""
+
+    def __init__(self, steps=()):
+        self.steps = list(steps)
+        self.listeners = []     # listener(start, stop)
+        self.undo_stack = []
+        self.redo_stack = []
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __iter__(self):
+        return iter(self.steps)
+
+    def __getitem__(self, index):
+        return self.steps[index]
+
+    # --- Primitive (vracaju inverz) ---
+
+    def _take(self, indices):
+        drop = set(indices)
+        pairs = [(i, self.steps[i]) for i in sorted(drop)]
+        self.steps = [step for i, step in enumerate(self.steps) if i not in drop]
+        return ("put", pairs)
+
+    def _put(self, pairs):
+        # pairs: (konacni indeks, korak), rastuce; ostali koraci popune rupe redom
+        out = []
+        rest = iter(self.steps)
+        targets = iter(pairs)
+        nxt = next(targets, None)
+        for pos in range(len(self.steps) + len(pairs)):
+            if nxt is not None and nxt[0] == pos:
+                out.append(nxt[1])
+                nxt = next(targets, None)
+            else:
+                out.append(next(rest))
+        self.steps = out
+        return ("take", [i for i, _ in pairs])
+
+    def _apply(self, ops):
+        """Izvrsi niz primitiva, vrati inverzni niz i prvi promijenjeni indeks."""
+        inverse, first = [], None
+        for kind, arg in ops:
+            if kind == "take":
+                touched = min(arg) if arg else None
+                inverse.append(self._take(arg))
+            else:
+                touched = arg[0][0] if arg else None
+                inverse.append(self._put(arg))
+            if touched is not None:
+                first = touched if first is None else min(first, touched)
+        inverse.reverse()
+        return inverse, first
+
+    def _do(self, ops, stop=None):
+        before = len(self.steps)
+        inverse, first = self._apply(ops)
+        if first is None:
+            return
+        self.undo_stack.append(inverse)
+        del self.undo_stack[:-UNDO_LIMIT]
+        self.redo_stack.clear()
+        self._notify(first, stop if len(self.steps) == before else None)
+
+    def _notify(self, start, stop=None):
+        for listener in list(self.listeners):
+            listener(start, stop)
+
+    # --- Operacije editora ---
+
+    def append(self, step):
+        self.insert(len(self.steps), [step])
+
+    def insert(self, index, steps):
+        """Umetne korake na index (paste). Vraca indekse umetnutih."""
+        index = max(0, min(index, len(self.steps)))
+        pairs = [(index + k, step) for k, step in enumerate(steps)]
+        self._do([("put", pairs)])
+        return [i for i, _ in pairs]
+
+    def delete(self, indices):
+        indices = sorted({i for i in indices if 0 <= i < len(self.steps)})
+        self._do([("take", indices)])
+
+    def move(self, indices, delta):
+        """
+        Pomakne oznacene korake za delta mjesta (zadrzavaju medjusobni
+        redoslijed). Vraca nove indekse; ako bi neki izasao van, nista.
+        """
+        indices = sorted(set(indices))
+        if not indices or delta == 0 or indices[0] + delta < 0 or indices[-1] + delta >= len(self.steps):
+            return indices
+        moved = [(i + delta, self.steps[i]) for i in indices]
+        stop = max(indices[-1], moved[-1][0]) + 1
+        self._do([("take", indices), ("put", moved)], stop=stop)
+        return [i for i, _ in moved]
+
+    def clear(self):
+        self._do([("take", list(range(len(self.steps))))])
+
+    def load(self, steps):
+        """Zamijeni sve korake (npr. ucitana misija) - i to se moze ponistiti."""
+        self._do([("take", list(range(len(self.steps)))),
+                  ("put", [(i, step) for i, step in enumerate(steps)])])
+
+    def copy(self, indices):
+        return [copy.deepcopy(self.steps[i]) for i in sorted(set(indices)) if 0 <= i < len(self.steps)]
+
+    # --- Undo / redo ---
+
+    def undo(self):
+        return self._history(self.undo_stack, self.redo_stack)
+
+    def redo(self):
+        return self._history(self.redo_stack, self.undo_stack)
+
+    def _history(self, source, target):
+        if not source:
+            return False
+        before = len(self.steps)
+        inverse, first = self._apply(source.pop())
+        target.append(inverse)
+        if first is not None:
+            self._notify(first, None if len(self.steps) != before else len(self.steps))
+        return True
@@ -0,0 +1,280 @@
+# mjpeg.py
+# Parser za MJPEG (multipart/x-mixed-replace) stream s Nicla Vision kamere.
+#
+# Nicla salje svaki frame kao:
+#   \r\n--openmv\r\n
+#   Content-Type: image/jpeg\r\n
+#   Content-Length:1234\r\n\r\n
+#   <1234 bajta JPEG-a>
+#
+# Parser cita Content-Length iz zaglavlja i frame cita jednom, velikim
+# citanjima izravno u prealocirani bytearray (asyncio BufferedProtocol). Nema trazenja
+# FFD8/FFD9 markera po cijelom bufferu niti lijepljenja bytes objekata.
+
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+BOUNDARY = b"--openmv"
+HEADER_END = b"\r\n\r\n"
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+MIN_READ_SIZE = 16 * 1024
+MAX_FRAME_SIZE = 4 * 1024 * 1024  # Sve vece od ovoga je smece u streamu
+
+
+class MJPEGParser:
+    """
+    Sans-IO parser MJPEG streama.
+
+    Vlasnik je jednog bytearray buffera. Korisnik cita podatke izravno u
+    `get_buffer()` i javlja koliko je procitao s `buffer_updated(n)`.
+    Svaki cijeli frame predaje se `on_frame(memoryview)` callbacku.
+    Memoryview pokazuje u interni buffer i vrijedi samo tijekom poziva -
+    tko ga zeli zadrzati mora napraviti `bytes(frame)`.
+    """
+
+    def __init__(self, on_frame, boundary=BOUNDARY, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.on_frame = on_frame
+        self.boundary = boundary
+        self._buf = bytearray(buffer_size)
+        self._view = memoryview(self._buf)
+        self._head = 0        # Pocetak neobradjenih podataka
+        self._tail = 0        # Kraj procitanih podataka
+        self._scan = 0        # Odakle nastaviti trazenje (da ne skeniramo dvaput)
+        self._body_len = -1   # -1 = citamo zaglavlje, inace duljina tijela
+        self._no_length = False
+        self.http_status = None
+        self.perf = None      # Zadnje X-Perf zaglavlje (statistika s Nicle)
+        self.frames = 0
+        self.bytes_received = 0
+
+    def get_buffer(self, sizehint=-1):
+        """Vraca memoryview slobodnog dijela buffera za recv_into/readinto."""
+        needed = MIN_READ_SIZE
+        if self._body_len >= 0:
+            needed = max(needed, self._body_len - (self._tail - self._head))
+
+        if len(self._buf) - self._tail < needed:
+            self._compact()
+            if len(self._buf) - self._tail < needed:
+                self._grow(self._tail + needed)
+
+        return self._view[self._tail:]
+
+    def buffer_updated(self, nbytes):
+        """Obradjuje `nbytes` novih bajtova upisanih u `get_buffer()`."""
+        self._tail += nbytes
+        self.bytes_received += nbytes
+        self._parse()
+
+    def feed(self, data):
+        """Pomocna za izvore koji vec imaju bytes (testovi, replay)."""
+        data = memoryview(data)
+        while len(data):
+            buf = self.get_buffer()
+            n = min(len(buf), len(data))
+            buf[:n] = data[:n]
+            data = data[n:]
+            self.buffer_updated(n)
+
+    def reset(self):
+        self._head = self._tail = self._scan = 0
+        self._body_len = -1
+        self._no_length = False
+        self.http_status = None
+
+    def _compact(self):
+        if self._head == 0:
+            return
+        pending = self._tail - self._head
+        # Ostatak je uvijek mali (dio zaglavlja ili frame u nastajanju)
+        self._buf[:pending] = self._buf[self._head:self._tail]
+        self._scan -= self._head
+        self._head = 0
+        self._tail = pending
+
+    def _grow(self, size):
+        if size > MAX_FRAME_SIZE + DEFAULT_BUFFER_SIZE:
+            raise ValueError(f"MJPEG frame prevelik ({size} B)")
+        # Novi buffer umjesto resize-a, jer pozivatelj jos moze drzati view starog
+        buf = bytearray(size)
+        buf[:self._tail] = self._view[:self._tail]
+        self._buf = buf
+        self._view = memoryview(buf)
+
+    def _parse(self):
+        buf = self._buf
+        while True:
+            if self._body_len < 0:
+                end = buf.find(HEADER_END, max(self._scan, self._head), self._tail)
+                if end == -1:
+                    self._scan = max(self._head, self._tail - len(HEADER_END) + 1)
+                    return
+                self._parse_headers(bytes(self._view[self._head:end]))
+                self._head = self._scan = end + len(HEADER_END)
+                continue
+
+            if self._no_length:
+                # Fallback bez Content-Length: tijelo traje do sljedeceg boundaryja
+                end = buf.find(self.boundary, max(self._scan, self._head), self._tail)
+                if end == -1:
+                    self._scan = max(self._head, self._tail - len(self.boundary) + 1)
+                    if self._tail - self._head > MAX_FRAME_SIZE:
+                        raise ValueError("MJPEG frame bez Content-Length prevelik")
+                    return
+                body_end = end
+                if buf[body_end - 2:body_end] == b"\r\n":
+                    body_end -= 2
+                self._emit(self._head, body_end)
+                self._head = self._scan = end
+                self._body_len = -1
+                self._no_length = False
+                continue
+
+            if self._tail - self._head < self._body_len:
+                return
+            end = self._head + self._body_len
+            self._emit(self._head, end)
+            self._head = self._scan = end
+            self._body_len = -1
+
+    def _parse_headers(self, block):
+        block = block.strip(b"\r\n")
+        if block.startswith(b"HTTP/"):
+            # Odgovor servera, ne dio multiparta
+            try:
+                self.http_status = int(block.split(None, 2)[1])
+            except (IndexError, ValueError):
+                self.http_status = 0
+            if self.http_status != 200:
+                raise ConnectionError(f"Status: {self.http_status}")
+            return
+
+        length = -1
+        for line in block.split(b"\r\n"):
+            name, _, value = line.partition(b":")
+            name = name.strip().lower()
+            if name == b"content-length":
+                try:
+                    length = int(value.strip())
+                except ValueError:
+                    length = -1
+            elif name == b"x-perf":
+                self.perf = value.strip().decode("ascii", "replace")
+
+        if not block.startswith(self.boundary) and length < 0:
+            # Preambula ili smece, preskoci
+            return
+        if length > MAX_FRAME_SIZE:
+            raise ValueError(f"MJPEG Content-Length prevelik ({length} B)")
+        if length < 0:
+            self._no_length = True
+            self._body_len = 0
+        else:
+            self._body_len = length
+
+    def _emit(self, start, end):
+        self.frames += 1
+        frame = self._view[start:end]
+        try:
+            self.on_frame(frame)
+        finally:
+            frame.release()
+
+
+def parse_url(url):
+    """Vraca (host, port, path) iz http:// URL-a."""
+    parts = urlsplit(url if "//" in url else f"http://{url}")
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    return parts.hostname, parts.port or 80, path
+
+
+def build_request(host, path):
+    return (f"GET {path} HTTP/1.1\r\n"
+            f"Host: {host}\r\n"
+            "Connection: close\r\n\r\n").encode("ascii")
+
+
+class MJPEGProtocol(asyncio.BufferedProtocol):
+    """asyncio protokol: event loop cita socket izravno u buffer parsera."""
+
+    def __init__(self, parser, request):
+        self.parser = parser
+        self.request = request
+        self.transport = None
+        self.last_data = time.monotonic()
+        self.done = asyncio.get_running_loop().create_future()
+        # Greska se uvijek dohvati, i kad je nitko ne ceka (npr. nakon cancel)
+        self.done.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    def connection_made(self, transport):
+        self.transport = transport
+        transport.write(self.request)
+
+    def get_buffer(self, sizehint):
+        return self.parser.get_buffer(sizehint)
+
+    def buffer_updated(self, nbytes):
+        self.last_data = time.monotonic()
+        try:
+            self.parser.buffer_updated(nbytes)
+        except Exception as e:
+            self._finish(e)
+            self.transport.close()
+
+    def eof_received(self):
+        self._finish(ConnectionError("Stream zatvoren"))
+        return False
+
+    def connection_lost(self, exc):
+        self._finish(exc or ConnectionError("Stream zatvoren"))
+
+    def _finish(self, exc):
+        if not self.done.done():
+            self.done.set_exception(exc)
+
+
+async def stream(url, parser, timeout=5.0):
+    """
+    Cita MJPEG stream u parser dok se veza ne prekine. Uvijek zavrsava
+    iznimkom (prekid veze, greska parsera, `timeout` sekundi bez podataka)
+    ili CancelledError kad se task otkaze - tada se socket zatvara odmah.
+    """
+    host, port, path = parse_url(url)
+    loop = asyncio.get_running_loop()
+    transport, protocol = await asyncio.wait_for(
+        loop.create_connection(lambda: MJPEGProtocol(parser, build_request(host, path)), host, port),
+        timeout)
+    print("Stream Connected!")
+    try:
+        while True:
+            try:
+                await asyncio.wait_for(asyncio.shield(protocol.done), timeout)
+            except asyncio.TimeoutError:
+                if time.monotonic() - protocol.last_data > timeout:
+                    raise TimeoutError(f"Nema podataka {timeout} s")
+    finally:
+        transport.close()
+
+
+async def fetch_frame(url, timeout=2.0):
+    """Otvara stream, cita tocno jedan JPEG frame i zatvara vezu."""
+    result = asyncio.get_running_loop().create_future()
+
+    def on_frame(frame):
+        if not result.done():
+            result.set_result(bytes(frame))
+
+    task = asyncio.ensure_future(stream(url, MJPEGParser(on_frame), timeout))
+    try:
+        await asyncio.wait({result, task}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if result.done():
+            return result.result()
+        if task.done():
+            task.result()  # Baca gresku veze
+        raise TimeoutError("Snapshot timeout")
+    finally:
+        task.cancel()
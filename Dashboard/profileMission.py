@@ -0,0 +1,37 @@
+# profileMission.py
+# Izvjestaj iz spremljenih profila misije (logs/mission_*.json).
+#
+#   python profileMission.py run.json                 # tablica po koracima
+#   python profileMission.py prije.json poslije.json  # usporedba dva pokretanja
+#   python profileMission.py run.json --html run.html # timeline u browseru
+
+import sys
+
+from profiler import MissionProfile, compare
+
+
+def main(args):
+    html_path = None
+    if "--html" in args:
+        i = args.index("--html")
+        html_path = args[i + 1] if i + 1 < len(args) else ""
+        args = args[:i] + args[i + 2:]
+    if not args or html_path == "":
+        print("python profileMission.py run.json [drugi.json] [--html izlaz.html]")
+        return 1
+
+    profiles = [MissionProfile.load(path) for path in args]
+    for path, profile in zip(args, profiles):
+        profile.name = profile.name or path
+        print(profile.table())
+        print()
+    if len(profiles) == 2:
+        print(compare(*profiles))
+    if html_path:
+        profiles[-1].save_html(html_path)
+        print(f"Timeline: {html_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
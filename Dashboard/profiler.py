@@ -0,0 +1,211 @@
+# profiler.py
+# Vremenski profil misije: za svaki korak kada je komanda poslana, kada je
+# stigao OK, kada su se enkoderi pomaknuli, kada je stigao DONE/ARM_DONE i
+# kada je executor krenuo dalje. Iz toga izvjestaj gdje odlazi vrijeme
+# (link, fiksna cekanja, praznine izmedju koraka), JSON/HTML export i
+# usporedba dva pokretanja.
+#
+# Vremena su time.perf_counter() u dretvi loopa, relativno na pocetak misije.
+
+import html
+import json
+import time
+
+# Dogadjaji po koraku, redom
+SEND, ACK, START, DONE, END = "send", "ack", "start", "done", "end"
+EVENTS = (SEND, ACK, START, DONE, END)
+
+# Boje segmenata u HTML timelineu
+SEGMENTS = (
+    ("link", SEND, ACK, "#d9534f"),      # Komanda putuje i ceka OK
+    ("pokretanje", ACK, START, "#f0ad4e"),
+    ("izvrsavanje", START, DONE, "#5cb85c"),
+    ("javljanje", DONE, END, "#5bc0de"),  # DONE stigao -> executor ide dalje
+)
+
+
+class StepTiming:
+    """Vremena jednog koraka (s od pocetka misije, None = nije se dogodilo)."""
+
+    def __init__(self, index, text, kind, times=None, outcome=""):
+        self.index = index
+        self.text = text
+        self.kind = kind
+        self.times = dict(times or {})
+        self.outcome = outcome      # "done", "telemetry", "timeout", "" (nije zavrsio)
+        self.gap = 0.0              # Praznina do slanja sljedeceg koraka
+
+    def span(self, a, b):
+        ta, tb = self.times.get(a), self.times.get(b)
+        return tb - ta if ta is not None and tb is not None else None
+
+    @property
+    def wall(self):
+        # Na robotu (onboard) nema slanja po koraku, korak pocinje porukom STEP
+        return self.span(SEND if SEND in self.times else START, END) or 0.0
+
+    @property
+    def link(self):
+        return self.span(SEND, ACK) or 0.0
+
+    @property
+    def wasted(self):
+        """Vrijeme u kojem robot ne radi nista korisno: link, javljanje, fiksni wait, praznina, timeout."""
+        if self.kind == "wait":
+            return self.wall + self.gap
+        waste = self.link + self.gap + (self.span(DONE, END) or 0.0)
+        if self.outcome == "timeout":
+            waste += self.span(ACK, END) or 0.0
+        return waste
+
+    def to_dict(self):
+        return {"index": self.index, "text": self.text, "kind": self.kind, "outcome": self.outcome,
+                "gap": round(self.gap, 4), "times": {k: round(v, 4) for k, v in self.times.items()}}
+
+    @classmethod
+    def from_dict(cls, d):
+        step = cls(d["index"], d["text"], d["kind"], d.get("times"), d.get("outcome", ""))
+        step.gap = d.get("gap", 0.0)
+        return step
+
+
+class MissionProfile:
+    """Biljezi dogadjaje koraka. mark() se zove iz MissionExecutora."""
+
+    def __init__(self, name="", mode="dashboard"):
+        self.name = name
+        self.mode = mode            # "dashboard" ili "onboard"
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+        self.steps = []
+        self.status = ""
+        self.total = 0.0
+        self.upload = 0.0           # onboard: trajanje mission_clear/add/run
+
+    def begin(self, steps):
+        self.t0 = time.perf_counter()
+        self.started = time.time()
+        self.steps = [StepTiming(i, step.text, step.kind) for i, step in enumerate(steps)]
+
+    def now(self):
+        return time.perf_counter() - self.t0
+
+    def mark(self, index, event, t=None):
+        """Prvi put kad se dogadjaj dogodi (kasniji isti dogadjaj se ignorira)."""
+        if 0 <= index < len(self.steps):
+            self.steps[index].times.setdefault(event, self.now() if t is None else t)
+
+    def outcome(self, index, outcome):
+        if 0 <= index < len(self.steps):
+            self.steps[index].outcome = outcome
+
+    def finish(self, status):
+        self.status = status
+        self.total = self.now()
+        done = [s for s in self.steps if END in s.times]
+        for step, following in zip(done, done[1:]):
+            if SEND in following.times:
+                step.gap = max(following.times[SEND] - step.times[END], 0.0)
+
+    # --- Izvjestaj ---
+
+    def totals(self):
+        steps = self.steps
+        return {
+            "ukupno": self.total,
+            "link": sum(s.link for s in steps),
+            "wait": sum(s.wall for s in steps if s.kind == "wait"),
+            "praznine": sum(s.gap for s in steps),
+            "timeout": sum(s.span(ACK, END) or 0.0 for s in steps if s.outcome == "timeout"),
+            "izgubljeno": sum(s.wasted for s in steps) + self.upload,
+        }
+
+    def table(self, top=5):
+        fmt = lambda v: "     -" if v is None else f"{v * 1000:6.0f}"
+        lines = [f"Misija {self.name or '-'} ({self.mode}, {self.status or 'u tijeku'}): {self.total:.2f} s",
+                 f"{'#':>3} {'korak':<32} {'ukupno':>6} {'link':>6} {'start':>6} {'izvrs':>6} "
+                 f"{'javlj':>6} {'prazno':>6} {'izgub':>6}  ms"]
+        for s in self.steps:
+            lines.append(f"{s.index + 1:>3} {s.text[:32]:<32} {fmt(s.wall)} {fmt(s.span(SEND, ACK))} "
+                         f"{fmt(s.span(ACK, START))} {fmt(s.span(START, DONE))} {fmt(s.span(DONE, END))} "
+                         f"{fmt(s.gap)} {fmt(s.wasted)}  {s.outcome}")
+        if self.upload:
+            lines.append(f"Upload misije: {self.upload * 1000:.0f} ms")
+        lines.append("Ukupno: " + ", ".join(f"{k} {v:.2f} s" for k, v in self.totals().items()))
+        for title, key in (("Najduzi koraci", lambda s: s.wall), ("Najvise izgubljenog", lambda s: s.wasted)):
+            ranked = sorted(self.steps, key=key, reverse=True)[:top]
+            lines.append(f"{title}: " + ", ".join(f"{s.index + 1}. {s.text[:20]} {key(s):.2f} s" for s in ranked))
+        return "\n".join(lines)
+
+    def to_dict(self):
+        return {"name": self.name, "mode": self.mode, "status": self.status,
+                "started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)),
+                "total": round(self.total, 4), "upload": round(self.upload, 4),
+                "totals": {k: round(v, 4) for k, v in self.totals().items()},
+                "steps": [s.to_dict() for s in self.steps]}
+
+    def save_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            d = json.load(f)
+        profile = cls(d.get("name", ""), d.get("mode", "dashboard"))
+        profile.status = d.get("status", "")
+        profile.total = d.get("total", 0.0)
+        profile.upload = d.get("upload", 0.0)
+        profile.steps = [StepTiming.from_dict(s) for s in d.get("steps", [])]
+        return profile
+
+    def save_html(self, path):
+        """Samostalni HTML: jedan red po koraku, obojani segmenti na zajednickoj vremenskoj osi."""
+        total = max(self.total, 1e-6)
+        pct = lambda t: f"{100.0 * t / total:.3f}%"
+        rows = []
+        for s in self.steps:
+            bars = []
+            for label, a, b, color in SEGMENTS:
+                ta, tb = s.times.get(a), s.times.get(b)
+                if ta is not None and tb is not None and tb > ta:
+                    bars.append(f'<div class="bar" style="left:{pct(ta)};width:{pct(tb - ta)};background:{color}" '
+                                f'title="{label} {(tb - ta) * 1000:.0f} ms"></div>')
+            if s.gap and END in s.times:
+                bars.append(f'<div class="bar gap" style="left:{pct(s.times[END])};width:{pct(s.gap)}" '
+                            f'title="praznina {s.gap * 1000:.0f} ms"></div>')
+            rows.append(f'<tr><td>{s.index + 1}</td><td>{html.escape(s.text)}</td><td>{s.wall:.2f}</td>'
+                        f'<td>{s.wasted:.2f}</td><td class="lane">{"".join(bars)}</td></tr>')
+        legend = " ".join(f'<span style="background:{c}">&nbsp;{label}&nbsp;</span>' for label, _, _, c in SEGMENTS)
+        totals = ", ".join(f"{k} {v:.2f} s" for k, v in self.totals().items())
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Misija {html.escape(self.name)}</title>
+<style>
+body {{ font-family: Consolas, monospace; font-size: 13px; }}
+table {{ border-collapse: collapse; width: 100%; }}
+td {{ padding: 2px 6px; border-bottom: 1px solid #ddd; white-space: nowrap; }}
+td.lane {{ position: relative; width: 60%; }}
+.bar {{ position: absolute; top: 3px; bottom: 3px; min-width: 1px; }}
+.gap {{ background: repeating-linear-gradient(45deg, #999 0 3px, #fff 3px 6px); }}
+</style></head><body>
+<h3>Misija {html.escape(self.name)} ({self.mode}, {html.escape(self.status)}): {self.total:.2f} s</h3>
+<p>{totals}</p><p>{legend} <span class="gap">&nbsp;praznina&nbsp;</span></p>
+<table><tr><th>#</th><th>Korak</th><th>s</th><th>izgubljeno</th><th>0 - {self.total:.2f} s</th></tr>
+{chr(10).join(rows)}
+</table></body></html>
+""")
+
+
+def compare(a, b):
+    """Usporedba dva profila (a = prije, b = poslije), korak po korak i ukupno."""
+    lines = [f"{a.name or 'A'} -> {b.name or 'B'}: {a.total:.2f} s -> {b.total:.2f} s ({b.total - a.total:+.2f} s)"]
+    ta, tb = a.totals(), b.totals()
+    lines.append("  " + ", ".join(f"{k} {tb[k] - ta[k]:+.2f} s" for k in ta))
+    for sa, sb in zip(a.steps, b.steps):
+        same = "" if sa.text == sb.text else f"  (razlicit korak: {sb.text})"
+        lines.append(f"  {sa.index + 1:>3}. {sa.text[:32]:<32} {sa.wall:6.2f} -> {sb.wall:6.2f} s "
+                     f"({sb.wall - sa.wall:+.2f}), izgubljeno {sb.wasted - sa.wasted:+.2f} s{same}")
+    if len(a.steps) != len(b.steps):
+        lines.append(f"  Broj koraka: {len(a.steps)} -> {len(b.steps)}")
+    return "\n".join(lines)
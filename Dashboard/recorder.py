@@ -0,0 +1,207 @@
+# recorder.py
+# Snimanje i reprodukcija MJPEG streama s Nicle.
+#
+# Snimka su dvije datoteke:
+#   <ime>.mjpeg  - JPEG frameovi zalijepljeni jedan iza drugoga (bez re-encodinga)
+#   <ime>.idx    - za svaki frame zapis (offset, duljina, vrijeme prijema)
+#
+# Snimac se kaci na CameraHub kao pretplatnik koji trazi samo sirove JPEG
+# bajtove, a pisanje na disk radi posebna dretva. Reprodukcija memory-mapira
+# segment i vrti frameove kroz ReplayHub, pa prikazi rade i bez kamere.
+
+import asyncio
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+
+from camera import CameraHub, FrameSubscriber
+
+INDEX_RECORD = struct.Struct("<QId")  # offset, duljina, timestamp (s)
+REPLAY_SPEEDS = {"1x": 1.0, "4x": 4.0, "10x": 10.0, "Max": 0.0}
+
+
+def recording_paths(path):
+    base = os.path.splitext(path)[0]
+    return base + ".mjpeg", base + ".idx"
+
+
+class MJPEGRecorder:
+    """Pise sirove JPEG frameove s huba u jedan segment + indeks, u pozadinskoj dretvi."""
+
+    def __init__(self, path, max_queue=512):
+        self.segment_path, self.index_path = recording_paths(path)
+        self.queue = queue.Queue(max_queue)
+        self.subscriber = FrameSubscriber(on_jpeg=self.on_jpeg, wants_images=False)
+        self.hub = None
+        self.thread = None
+        self.frames = 0
+        self.bytes_written = 0
+        self.dropped = 0
+
+    def start(self, hub):
+        self.hub = hub
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        hub.subscribe(self.subscriber)
+        print(f"Snimanje u {self.segment_path}")
+
+    def stop(self):
+        if self.hub:
+            self.hub.unsubscribe(self.subscriber)
+            self.hub = None
+        if self.thread:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+            print(f"Snimanje gotovo: {self.frames} frameova, {self.bytes_written / 1e6:.1f} MB, drop={self.dropped}")
+
+    def on_jpeg(self, jpg, timestamp):
+        # Asyncio petlja (prijem) - samo predaja u red, nikad ne ceka disk
+        try:
+            self.queue.put_nowait((jpg, timestamp))
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        offset = 0
+        with open(self.segment_path, "wb", buffering=1 << 20) as seg, \
+             open(self.index_path, "wb", buffering=1 << 16) as idx:
+            while True:
+                item = self.queue.get()
+                if item is None: break
+                jpg, timestamp = item
+                seg.write(jpg)
+                idx.write(INDEX_RECORD.pack(offset, len(jpg), timestamp))
+                offset += len(jpg)
+                self.frames += 1
+                self.bytes_written = offset
+
+
+class MJPEGRecording:
+    """Snimka otvorena za citanje: segment je memory-mapiran, indeks u memoriji."""
+
+    def __init__(self, path):
+        self.segment_path, self.index_path = recording_paths(path)
+        with open(self.index_path, "rb") as f:
+            index = f.read()
+        self._file = open(self.segment_path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._view = memoryview(self._map)
+
+        # Odbaci nedovrsene zapise na kraju (npr. prekid snimanja)
+        usable = len(index) - len(index) % INDEX_RECORD.size
+        self.index = [rec for rec in INDEX_RECORD.iter_unpack(index[:usable]) if rec[0] + rec[1] <= size]
+
+    def __len__(self):
+        return len(self.index)
+
+    def frame(self, i):
+        """Vraca (memoryview JPEG-a, timestamp) bez kopiranja iz mmapa."""
+        offset, length, timestamp = self.index[i]
+        return self._view[offset:offset + length], timestamp
+
+    @property
+    def duration(self):
+        return self.index[-1][2] - self.index[0][2] if self.index else 0.0
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def close(self):
+        if self.closed: return
+        self._view.release()
+        if isinstance(self._map, mmap.mmap): self._map.close()
+        self._file.close()
+
+
+class ReplayHub(CameraHub):
+    """
+    CameraHub koji umjesto Nicle cita snimku. Prikazi se na njega kace
+    s `attach()` kao i na pravi hub.
+
+    speed: 1.0 = stvarno vrijeme, >1 ubrzano, 0 = sto brze moze.
+    step(): pauzira i pusti tocno jedan frame.
+    Frameovi nose snimljeno vrijeme prijema, ne vrijeme reprodukcije.
+    Snimka (mmap) se zatvara kad se hub ugasi i ponovno otvara na startu.
+    """
+
+    def __init__(self, path, speed=1.0):
+        super().__init__(f"replay://{os.path.basename(path)}")
+        self.path = path
+        self.recording = MJPEGRecording(path)
+        self.speed = speed
+        self.paused = False
+        self.loop_replay = False
+        self.position = 0
+        self._sync = None
+        self._step = None
+
+    def set_speed(self, speed):
+        self.speed = speed
+        self.paused = False
+        self._sync = None
+
+    def step(self):
+        self.paused = True
+        if self._step:
+            self.loop.call_soon_threadsafe(self._step.set)
+
+    def _start_task(self):
+        if self.running and self.recording.closed:
+            self.recording = MJPEGRecording(self.path)
+        super()._start_task()
+
+    def _stop_task(self):
+        # Snimka se zatvara tek kad otkazani run() stvarno zavrsi
+        task, recording = self._task, self.recording
+        super()._stop_task()
+        if task:
+            task.add_done_callback(lambda t: self.running or recording.close())
+        elif not self.running:
+            recording.close()
+
+    def seek(self, position):
+        self.position = max(0, min(position, len(self.recording)))
+        self._sync = None
+
+    async def run(self):
+        print(f"Replay {self.url} ({len(self.recording)} frameova)")
+        self._step = asyncio.Event()
+        rec = self.recording
+        while True:
+            if self.position >= len(rec):
+                if self.loop_replay and len(rec):
+                    self.seek(0)
+                    continue
+                self.status_text = "Replay gotov"
+                await asyncio.sleep(0.1)
+                continue
+
+            if self.paused:
+                try:
+                    await asyncio.wait_for(self._step.wait(), 0.1)
+                except asyncio.TimeoutError:
+                    continue
+                self._step.clear()
+                self._sync = None
+            else:
+                timestamp = rec.index[self.position][2]
+                if self._sync is None:
+                    self._sync = (timestamp, time.monotonic())
+                wait = 0.0
+                if self.speed > 0:
+                    due = self._sync[1] + (timestamp - self._sync[0]) / self.speed
+                    wait = due - time.monotonic()
+                # I na "Max" brzini pusti petlju da obradi BLE i ostalo
+                await asyncio.sleep(min(max(wait, 0.0), 0.1))
+                if wait > 0.1: continue
+
+            jpg, timestamp = rec.frame(self.position)
+            self.position += 1
+            with jpg:  # on_frame kopira, view u mmap se odmah pusta
+                self.on_frame(jpg, timestamp)
@@ -0,0 +1,359 @@
+# robot.py
+# RobotController: veza s robotom preko bilo kojeg transporta (transport.py).
+#
+# Primljeni bajtovi idu kroz LineFramer (STATUS tekst/binarno, JSON odgovori,
+# VISION), poslane komande kroz CommandScheduler i LinkMonitor (link.py).
+# Nema ovisnosti o Tk-u, pa se s LoopbackTransportom moze vrtjeti bez
+# robota i bez GUI-ja (testLoopback.py).
+
+import asyncio
+import collections
+import json
+import time
+
+from telemetry import LineFramer, TelemetryRing, TelemetrySample, StatusFrameDecoder, STATUS_SYNC, STATUS_FRAME
+from telemetry_log import KIND_RX, KIND_TX, KIND_LINK
+from link import (LinkMonitor, CommandScheduler, is_idempotent, is_quiet, PING_INTERVAL,
+                  REQUEST_TIMEOUT, REQUEST_RETRIES, REQUEST_WINDOW)
+from transport import BleTransport, DEFAULT_WRITE_SIZE
+
+TELEMETRY_MINUTES = 30   # Koliko povijesti telemetrije drzimo u memoriji
+TELEMETRY_RATE_HZ = 100  # Firmware salje STATUS na 10 Hz, rezerva za brzi mod
+TELEMETRY_BINARY = True  # Dogovori binarne STATUS okvire s firmwareom (fallback je STATUS: tekst)
+TELEMETRY_BINARY_HZ = 25 # 32 B okvir na 9600 baud (HC-02) -> ~30 Hz je gornja granica
+TELEMETRY_TEXT_HZ = 10
+
+RECONNECT_MIN = 0.25     # s, prvi ponovni pokusaj ide odmah, zatim ovo pa duplo
+RECONNECT_MAX = 8.0
+
+
+class RobotEvents:
+    """
+    Cekanje na dogadjaje s robota iz asyncio koda (misija): JSON poruke
+    (DONE, ARM_DONE, ...) i uvjeti nad telemetrijom. Sve radi u dretvi loopa.
+
+    Zadnjih nekoliko JSON poruka se pamti, pa wait_json() vidi i poruku koja
+    je stigla prije nego se pozvao (npr. DONE odmah iza OK-a kratke voznje).
+    listeners dobivaju svaku JSON poruku (napredak misije na robotu: STEP).
+    """
+
+    def __init__(self, history=32):
+        self.history = collections.deque(maxlen=history)
+        self.json_waiters = []      # (match, future)
+        self.sample_waiters = []
+        self.listeners = []         # listener(msg) za svaku JSON poruku
+
+    def on_json(self, msg):
+        self.history.append(msg)
+        for listener in list(self.listeners):
+            listener(msg)
+        self._resolve(self.json_waiters, msg)
+
+    def on_sample(self, sample):
+        if self.sample_waiters:
+            self._resolve(self.sample_waiters, sample)
+
+    def _resolve(self, waiters, item):
+        for entry in list(waiters):
+            match, future = entry
+            if future.done():
+                waiters.remove(entry)
+            elif match(item):
+                future.set_result(item)
+                waiters.remove(entry)
+
+    def wait_json(self, match, replay=True):
+        """Future s prvom JSON porukom za koju je match(msg) True."""
+        future = asyncio.get_running_loop().create_future()
+        if replay:
+            for msg in self.history:
+                if match(msg):
+                    future.set_result(msg)
+                    return future
+        self.json_waiters.append((match, future))
+        return future
+
+    def wait_sample(self, match):
+        """Future s prvim novim uzorkom telemetrije za koji je match(sample) True."""
+        future = asyncio.get_running_loop().create_future()
+        self.sample_waiters.append((match, future))
+        return future
+
+
+def after_reply(cmd_id, status):
+    """
+    match za wait_json: poruka `status` (npr. DONE) koja stigne nakon odgovora
+    na komandu `cmd_id` - raniji DONE (prosla voznja) se ne racuna.
+    """
+    acked = False
+
+    def match(msg):
+        nonlocal acked
+        if msg.get("id") == cmd_id:
+            acked = True
+            return False
+        return acked and msg.get("status") == status
+    return match
+
+
+class RobotController:
+    def __init__(self, loop):
+        self.loop = loop
+        self.connected = False
+        self.on_telemetry_callback = None
+        self.on_json_callback = None
+        self.on_link_callback = None    # on_link_callback(stanje): "connected", "reconnecting", "disconnected"
+        self.last_vision = None
+        self.telemetry = TelemetryRing.for_duration(TELEMETRY_MINUTES, TELEMETRY_RATE_HZ)
+        self.logger = None  # TelemetryLogger, postavlja DashboardApp
+        self.link = LinkMonitor()
+        self.transport = None
+        self.scheduler = CommandScheduler(loop, self.write_commands, self.write_size)
+        self.window = asyncio.Semaphore(REQUEST_WINDOW)
+        self.ping_task = None
+        self.reconnect_task = None
+        self.auto_reconnect = True
+        # Stanje koje robot zaboravi nakon reseta (boje, PID, ...): kljuc -> komanda
+        self.state = {}
+        self.events = RobotEvents()
+
+        # RX: bajtovi s transporta -> linije -> handler po prefiksu
+        self.framer = LineFramer()
+        self.framer.add_handler("STATUS:", self.on_status_line)
+        self.framer.add_handler("{", self.on_json_line)
+        self.framer.add_handler("VISION:", self.on_vision_line)
+        self.framer.add_handler("DEBUG", lambda line: None)
+        self.framer.set_default(self.on_text_line)
+        self.frame_decoder = StatusFrameDecoder(self.on_status_frame)
+        self.framer.set_frame_handler(STATUS_SYNC, STATUS_FRAME.size, self.frame_decoder)
+
+    async def connect(self, transport=None):
+        """Otvara transport (zadano BLE HC-02) i pokrece telemetriju i ping."""
+        transport = transport or BleTransport()
+        transport.on_data = self.on_data
+        transport.on_lost = self.on_link_lost
+        try:
+            await transport.open()
+        except Exception as e:
+            print(f"Greška pri povezivanju: {e}")
+            transport.on_lost = None
+            try:
+                await transport.close()
+            except Exception:
+                pass
+            return False
+        self.transport = transport
+        self.connected = True
+        print(f"Povezano: {transport}")
+        self.framer.reset()
+        self.frame_decoder.reset()
+        await self.negotiate_telemetry()
+        self.resend_state()
+        self.ping_task = asyncio.ensure_future(self.ping_loop())
+        self.notify_link("connected")
+        return True
+
+    async def disconnect(self):
+        if self.reconnect_task:
+            self.reconnect_task.cancel()
+            self.reconnect_task = None
+        self.scheduler.clear()
+        if self.ping_task:
+            self.ping_task.cancel()
+            self.ping_task = None
+        if self.transport:
+            self.connected = False
+            transport, self.transport = self.transport, None
+            await transport.close()
+            print(f"Odspojeno: {transport}")
+        self.notify_link("disconnected")
+
+    def on_link_lost(self):
+        # Transport javlja da je veza pukla (BLE disconnect, USB izvucen, TCP zatvoren)
+        transport = self.transport
+        print(f"Veza izgubljena: {transport}")
+        self.connected = False
+        self.scheduler.clear()
+        if self.ping_task:
+            self.ping_task.cancel()
+            self.ping_task = None
+        self.transport = None
+        if self.reconnect_task:
+            self.notify_link("reconnecting")  # Pukla tijekom ponovnog spajanja, petlja nastavlja
+        elif self.auto_reconnect and transport:
+            self.reconnect_task = asyncio.ensure_future(self.reconnect(transport))
+            self.notify_link("reconnecting")
+        else:
+            self.notify_link("disconnected")
+
+    async def reconnect(self, transport):
+        """Ponovno otvara isti transport dok ne uspije (eksponencijalni backoff)."""
+        delay = RECONNECT_MIN
+        attempt = 0
+        try:
+            while True:
+                attempt += 1
+                try:
+                    await transport.close()  # Pocisti ostatke stare veze
+                except Exception:
+                    pass
+                print(f"Ponovno spajanje ({attempt}): {transport}")
+                if await self.connect(transport) and self.connected:
+                    return
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX)
+        finally:
+            self.reconnect_task = None
+
+    def notify_link(self, state):
+        if self.on_link_callback:
+            self.on_link_callback(state)
+
+    async def negotiate_telemetry(self):
+        # Saljemo uvijek: firmware nakon reseta salje STATUS na USB, a ovo ga vraca na
+        # link s kojeg je komanda stigla. Firmware u mirovanju (FAZA_CEKANJE_STARTA)
+        # parsira liniju kao i svaku drugu - krece tek na {"cmd": "start"}.
+        # Odgovor TELEM_* potvrdjuje da je linija obradjena; bez njega (stari firmware)
+        # telemetrija ostaje STATUS: tekst, a framer prima oba formata.
+        if TELEMETRY_BINARY:
+            telemetry = {"cmd": "telemetry", "mode": "bin", "hz": TELEMETRY_BINARY_HZ}
+        else:
+            telemetry = {"cmd": "telemetry", "mode": "text", "hz": TELEMETRY_TEXT_HZ}
+        try:
+            reply = await self.request(telemetry, retries=1)
+            print(f"Telemetrija: {reply.get('status')}")
+        except TimeoutError:
+            print("Telemetrija: nema odgovora (stari firmware?), ostaje STATUS: tekst")
+
+    def remember(self, key, cmd):
+        """Pamti komandu koja postavlja stanje robota - salje se ponovno nakon spajanja."""
+        self.state[key] = cmd if isinstance(cmd, str) else json.dumps(cmd)
+
+    def resend_state(self):
+        for cmd in self.state.values():
+            self.scheduler.enqueue(cmd)
+
+    async def ping_loop(self):
+        # Ping u pozadini: latencija linka se mjeri i kad se nista ne salje
+        n = 0
+        while self.connected:
+            # Kroz red komandi kao i sve ostalo - jedan pisac na transportu
+            self.scheduler.enqueue(json.dumps({"cmd": "ping"}))
+            self.link.expire()
+            n += 1
+            if self.logger and n % 5 == 0:
+                self.logger.log_text(KIND_LINK, self.link.summary())
+            await asyncio.sleep(PING_INTERVAL)
+
+    def on_data(self, data):
+        try:
+            self.framer.feed(data)
+        except Exception as e:
+            print(f"RX Error: {e}")
+
+    def on_status_line(self, line):
+        # STATUS:cm,pL,pR,armIdx,usF,usB,usL,usR,ind
+        sample = TelemetrySample.parse_status(line, self.telemetry.count, time.time())
+        if sample is None:
+            return
+        if self.logger:
+            self.logger.log_sample(sample)
+        self.push_sample(sample)
+
+    def on_status_frame(self, sample):
+        # Binarni okvir (vec provjeren CRC-om u StatusFrameDecoder)
+        if self.logger:
+            self.logger.log_sample(sample)
+        self.push_sample(sample)
+
+    def push_sample(self, sample):
+        # Zajednicki put za live i replay uzorke
+        self.telemetry.append(sample)
+        self.events.on_sample(sample)
+        if self.on_telemetry_callback:
+            self.on_telemetry_callback(sample)
+
+    def on_json_line(self, line):
+        text = line.decode('utf-8', errors='ignore')
+        if self.logger:
+            self.logger.log_text(KIND_RX, text)
+        self.handle_json(text)
+
+    def handle_json(self, text):
+        try:
+            msg = json.loads(text)
+        except ValueError:
+            print(f"RX: {text}")
+            return
+        if isinstance(msg, dict):
+            self.events.on_json(msg)
+        reply = self.link.on_reply(msg)
+        if reply:
+            if reply[0] == "ping": return
+            print(f"RX: {text} ({reply[1] * 1000:.0f} ms)")
+        else:
+            print(f"RX: {text}")
+        if self.on_json_callback:
+            self.on_json_callback(msg)
+
+    def on_vision_line(self, line):
+        self.last_vision = line[7:].decode('utf-8', errors='ignore').strip()
+        print(f"RX: {line.decode('utf-8', errors='ignore')}")
+
+    def on_text_line(self, line):
+        print(f"RX: {line.decode('utf-8', errors='ignore')}")
+
+    def send_command(self, cmd):
+        # Kroz red: servo/rucna voznja se spajaju, stop ide prvi
+        if self.connected and self.transport:
+            self.scheduler.submit(cmd)
+
+    def write_size(self):
+        return self.transport.write_size if self.transport else DEFAULT_WRITE_SIZE
+
+    async def request(self, cmd, timeout=REQUEST_TIMEOUT, retries=None):
+        """
+        Salje JSON komandu (str ili dict) i vraca odgovor robota s istim id-em,
+        npr. {"status": "PID_SAVED", "id": 7}. Bez odgovora baca TimeoutError,
+        a idempotentne komande prije toga ponavlja `retries` puta.
+        """
+        if not (self.connected and self.transport):
+            raise ConnectionError("Robot nije spojen")
+        cmd_id, text = self.link.prepare(cmd)
+        if retries is None:
+            retries = REQUEST_RETRIES if is_idempotent(text) else 0
+        reply = self.loop.create_future()
+        self.link.waiters[cmd_id] = reply
+        try:
+            async with self.window:
+                for attempt in range(retries + 1):
+                    if attempt: print(f"Nema odgovora, ponavljam ({attempt}/{retries}): {text}")
+                    self.scheduler.enqueue(text)
+                    try:
+                        return await asyncio.wait_for(asyncio.shield(reply), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                raise TimeoutError(f"Nema odgovora: {text}")
+        finally:
+            self.link.waiters.pop(cmd_id, None)
+
+    def send_request(self, cmd, timeout=REQUEST_TIMEOUT, retries=None):
+        """Thread-safe request(): vraca concurrent.futures.Future s odgovorom."""
+        return asyncio.run_coroutine_threadsafe(self.request(cmd, timeout, retries), self.loop)
+
+    async def write_line(self, cmd, echo=True):
+        await self.write_commands([cmd], echo=echo)
+
+    async def write_commands(self, cmds, urgent=False, echo=True):
+        # Vise komandi (svaka s '\n') u jednom pisanju, transport ih reze na write_size
+        if self.transport and self.connected:
+            try:
+                cmds = [self.link.tag(cmd) for cmd in cmds]  # id + vrijeme slanja za JSON komande
+                data = "".join(cmd + "\n" for cmd in cmds).encode('utf-8')
+                await self.transport.write(data, urgent)
+                for cmd in cmds:
+                    if echo and not is_quiet(cmd): print(f"TX: {cmd}")
+                    if self.logger:
+                        self.logger.log_text(KIND_TX, cmd)
+            except Exception as e:
+                print(f"TX Fail: {e}")
@@ -0,0 +1,71 @@
+# simMission.py
+# Predvidjanje trajanja i putanje misije bez robota (simulator.py) i
+# pretraga brzeg redoslijeda / brzine offline, prije voznje.
+#
+#   python simMission.py misija.txt [broj_varijanti] [presets.json]
+#
+# presets.json: 15 x 6 kutova preseta (kako su spremljeni u EEPROM); bez
+# toga ruka traje SimParams.arm_s.
+
+import json
+import sys
+import time
+
+import numpy as np
+
+from mission import compile_mission, MissionError, PRESET_NAMES
+from simulator import simulate, encode_missions, shuffled, SimParams
+
+END_TOLERANCE_CM = 3.0   # Redoslijed vrijedi samo ako robot zavrsi na istom mjestu
+END_TOLERANCE_DEG = 3.0
+
+
+def main(path, variants=2000, presets=None):
+    with open(path, encoding="utf-8") as f:
+        steps = compile_mission(f.read().splitlines(), PRESET_NAMES)
+    print(f"{path}: {len(steps)} koraka")
+
+    base = simulate(encode_missions([steps]), presets=presets)
+    for i, step in enumerate(steps):
+        t, x, y, h = base.trace[0, i + 1]
+        print(f"{i + 1:>3}. {step.text:<45} {base.step_time[0, i]:6.2f} s  t={t:6.2f}  "
+              f"x={x:7.1f} y={y:7.1f} smjer={h:7.1f}")
+    print(f"Ukupno: {base.time[0]:.2f} s")
+
+    # Brzina voznje (config.baseSpeed)
+    speeds = np.arange(60, 256, 5)
+    started = time.perf_counter()
+    swept = simulate(encode_missions([steps]), SimParams(base_speed=speeds), presets=presets)
+    print(f"\nbaseSpeed {speeds[0]}-{speeds[-1]} ({len(speeds)} varijanti, "
+          f"{(time.perf_counter() - started) * 1000:.1f} ms):")
+    for speed in (80, 100, 150, 200, 255):
+        print(f"  {speed:>3}: {swept.time[np.searchsorted(speeds, speed)]:.2f} s")
+
+    # Redoslijed: samo varijante koje zavrsavaju na istoj pozi kao original
+    orders = [list(range(len(steps)))] + shuffled(steps, variants, seed=0)
+    started = time.perf_counter()
+    result = simulate(encode_missions([[steps[i] for i in order] for order in orders]), presets=presets)
+    elapsed = time.perf_counter() - started
+    dist, heading = result.end_error(base.pose[0])
+    valid = (dist < END_TOLERANCE_CM) & (heading < END_TOLERANCE_DEG)
+    print(f"\nRedoslijed: {len(orders)} varijanti za {elapsed * 1000:.0f} ms, "
+          f"{int(valid.sum())} zavrsava na istom mjestu")
+    for k in result.best(3, valid):
+        order = " ".join(str(i + 1) for i in orders[k])
+        print(f"  {result.time[k]:.2f} s ({result.time[k] - base.time[0]:+.2f} s): {order}")
+
+
+if __name__ == "__main__":
+    if not sys.argv[1:]:
+        print("python simMission.py misija.txt [broj_varijanti] [presets.json]")
+        sys.exit(1)
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    angles = None
+    if len(sys.argv) > 3:
+        with open(sys.argv[3], encoding="utf-8") as f:
+            angles = np.array(json.load(f), dtype=float)
+    try:
+        main(sys.argv[1], count, angles)
+    except MissionError as e:
+        print(f"Greska u misiji: {e}")
+        sys.exit(1)
@@ -0,0 +1,276 @@
+# simulator.py
+# Kinematicki simulator misije bez robota. Vrti prevedene korake (mission.py)
+# kao firmware: straight/move_dual staju na enkoderima (IMPULSA_PO_CM),
+# turn/pivot na IMU-u s tolerancijom 2 stupnja i brzinom 120, ruka se mice
+# KORAK_MK stupnjeva svakih 20 ms (Manipulator::azuriraj).
+#
+# Sve je vektorizirano preko varijanti: N misija (isti broj koraka, kraci se
+# dopune praznim koracima) i/ili N skupova parametara se racunaju odjednom,
+# petlja ide samo po koracima. Tisucu varijanti je par milisekundi.
+# Koraci s FLAG_OVERLAP se preklapaju kao u izvrsiRedKoraka(): sljedeci
+# korak ceka samo isti resurs (pogon/ruka) ili sync.
+#
+#   result = simulate(encode_missions([steps]), SimParams(base_speed=np.arange(60, 256)))
+#   result.time.argmin()
+
+import numpy as np
+
+from mission import OPCODES, FLAG_OVERLAP
+
+NOOP = -1  # Dopuna za krace misije
+
+# Firmware (Kretanje.cpp, Manipulator.h)
+TURN_PWM = 120             # brzinaOkreta / spd u pivotu
+TURN_TOLERANCE = 2.0       # abs(diff) < 2.0
+ROTATE_PAUSE = 0.01        # delay(10) prije okreta
+ARM_TICK = 0.02            # Manipulator::azuriraj() svakih 20 ms
+ARM_DEG_S = 1.0 / ARM_TICK # KORAK_MK = 1 stupanj po tiku
+BASE_GEAR = 2.0            # OMJER_PRIJENOSA_BAZA
+GRIPPER = 6                # KANAL_HVATALJKA
+GRIPPER_OPEN, GRIPPER_CLOSED = 20.0, 90.0
+SEQUENCE_PRESETS = (2, 3, 4)  # uzmi_boca, uzmi_limenka, uzmi_spuzva -> ciljaniPresetIndex
+SAFE_PRESET, PARK_PRESET = 1, 0
+
+
+class SimParams:
+    """
+    Parametri robota. Svaki moze biti broj ili niz duljine N (jedna vrijednost
+    po varijanti). pulses_per_cm je vrijednost u configu robota, true_pulses_per_cm
+    stvarni impulsi enkodera po cm (zadano isto); cm_s_per_pwm i track_cm treba
+    izmjeriti na stazi.
+    """
+
+    DEFAULTS = {
+        "pulses_per_cm": 40.0,      # config.pulsesPerCm
+        "true_pulses_per_cm": None,
+        "base_speed": 100.0,        # config.baseSpeed (PWM)
+        "cm_s_per_pwm": 0.25,       # 25 cm/s na PWM 100 (kao LoopbackRobot)
+        "track_cm": 20.0,           # Razmak kotaca
+        "loop_s": 0.01,             # Trajanje loop() - kasnjenje zaustavljanja i prijelaza koraka
+        "arm_s": 1.5,               # Trajanje ruke kad presets nisu zadani
+    }
+
+    def __init__(self, **values):
+        unknown = set(values) - set(self.DEFAULTS)
+        if unknown:
+            raise TypeError(f"Nepoznati parametri: {', '.join(sorted(unknown))}")
+        merged = dict(self.DEFAULTS, **values)
+        if merged["true_pulses_per_cm"] is None:
+            merged["true_pulses_per_cm"] = merged["pulses_per_cm"]
+        for name, value in merged.items():
+            setattr(self, name, np.asarray(value, dtype=float))
+
+    @property
+    def size(self):
+        return max([np.size(getattr(self, name)) for name in self.DEFAULTS] + [1])
+
+
+class SimResult:
+    """
+    time: ukupno trajanje po varijanti (inf ako korak nikad ne zavrsi),
+    step_time: (N, S) trajanje koraka, trace: (N, S+1, 4) [t, x, y, smjer]
+    na kraju svakog koraka (t nije rastuci kad se koraci preklapaju). x je pocetni smjer voznje, y desno, smjer u
+    stupnjevima (pozitivno = desno, kao yaw).
+    """
+
+    def __init__(self, step_time, trace, time):
+        self.step_time = step_time
+        self.trace = trace
+        self.time = time
+
+    def __len__(self):
+        return len(self.time)
+
+    @property
+    def pose(self):
+        return self.trace[:, -1, 1:]
+
+    def best(self, k=5, valid=None):
+        """Indeksi k najbrzih varijanti (valid: bool maska, npr. zavrsna poza na cilju)."""
+        time = self.time if valid is None else np.where(valid, self.time, np.inf)
+        order = np.argsort(time, kind="stable")[:k]
+        return order[np.isfinite(time[order])]
+
+    def end_error(self, pose):
+        """Udaljenost (cm) i razlika smjera (stupnjevi) zavrsne poze od zadane [x, y, smjer]."""
+        d = np.hypot(self.pose[:, 0] - pose[0], self.pose[:, 1] - pose[1])
+        h = (self.pose[:, 2] - pose[2] + 180.0) % 360.0 - 180.0
+        return d, np.abs(h)
+
+
+def encode_missions(missions):
+    """Liste Stepova -> (N, S, 4) [vrsta, a, b, c], kraci se dopune s NOOP."""
+    length = max([len(steps) for steps in missions] + [1])
+    out = np.zeros((len(missions), length, 4))
+    out[:, :, 0] = NOOP
+    for i, steps in enumerate(missions):
+        if steps:
+            out[i, :len(steps)] = [step.encode() for step in steps]
+    return out
+
+
+def _drive(x, y, h, s_left, s_right, track):
+    """Pomak diferencijalnog pogona po luku (s_left/s_right su putevi kotaca u cm)."""
+    ds = (s_left + s_right) / 2.0
+    dh = (s_left - s_right) / track  # rad, lijevi brzi = desno
+    h0 = np.radians(h)
+    h1 = h0 + dh
+    arc = np.abs(dh) > 1e-9
+    radius = np.divide(ds, dh, out=np.zeros_like(ds), where=arc)
+    x = x + np.where(arc, radius * (np.sin(h1) - np.sin(h0)), ds * np.cos(h0))
+    y = y + np.where(arc, radius * (np.cos(h0) - np.cos(h1)), ds * np.sin(h0))
+    return x, y, h + np.degrees(dh)
+
+
+def _servo_targets(presets, idx, angles):
+    """Ciljevi serva za preset idx (primjeniPreset: kanali 0-5, baza kroz prijenos)."""
+    target = angles.copy()
+    target[:, :GRIPPER] = presets[idx]
+    target[:, 0] /= BASE_GEAR
+    np.clip(target[:, :GRIPPER], 0.0, 180.0, out=target[:, :GRIPPER])
+    return target
+
+
+def _move_servos(angles, target, mask):
+    """Soft-start do cilja: vrijeme = najveci pomak / ARM_DEG_S + jedan tik za prijelaz stanja."""
+    dt = np.where(mask, np.abs(target - angles).max(axis=1) / ARM_DEG_S + ARM_TICK, 0.0)
+    angles[mask] = target[mask]
+    return dt
+
+
+def _arm(angles, presets, kind, b, mask):
+    """Vrijeme ruke po varijanti; angles (N, 7) se azuriraju na mjestu."""
+    dt = np.zeros(len(angles))
+    preset = mask & (kind == OPCODES["preset"])
+    if preset.any():
+        idx = np.clip(b, 0, len(presets) - 1).astype(int)
+        dt += _move_servos(angles, _servo_targets(presets, idx, angles), preset)
+
+    seq = mask & (kind == OPCODES["arm"])
+    if seq.any():
+        # Faze zapocniSekvencu/azuriraj: priprema, spustanje, hvatanje, dizanje, spremanje
+        lookup = np.array(SEQUENCE_PRESETS + (SAFE_PRESET,))
+        target_idx = lookup[np.where((b >= 0) & (b < len(SEQUENCE_PRESETS)), b, -1).astype(int)]
+        n = len(angles)
+        phases = (
+            (np.full(n, SAFE_PRESET), GRIPPER_OPEN),
+            (target_idx, None),
+            (None, GRIPPER_CLOSED),
+            (np.full(n, SAFE_PRESET), None),
+            (np.full(n, PARK_PRESET), None),
+        )
+        for idx, gripper in phases:
+            target = angles.copy() if idx is None else _servo_targets(presets, idx, angles)
+            if gripper is not None:
+                target[:, GRIPPER] = gripper
+            dt += _move_servos(angles, target, seq)
+    return dt
+
+
+def simulate(missions, params=None, presets=None):
+    """
+    missions: (N, S, 4) iz encode_missions() (ili (1, S, 4) za istu misiju
+    sa N skupova parametara). presets: (15, 6) kutovi preseta iz EEPROM-a; bez
+    njih ruka traje params.arm_s. Vraca SimResult.
+    """
+    p = params or SimParams()
+    missions = np.asarray(missions, dtype=float)
+    n = max(len(missions), p.size)
+    missions = np.broadcast_to(missions, (n,) + missions.shape[1:])
+    steps = missions.shape[1]
+    b = lambda value: np.broadcast_to(value, (n,))
+
+    speed = b(p.cm_s_per_pwm * p.base_speed)
+    turn_speed = b(p.cm_s_per_pwm * TURN_PWM)
+    scale = b(p.pulses_per_cm / p.true_pulses_per_cm)  # Stvarni cm po zadanom cm
+    track = b(p.track_cm)
+    loop_s = b(p.loop_s)
+    if presets is not None:
+        presets = np.asarray(presets, dtype=float)
+
+    cursor = np.zeros(n)            # Kad smije krenuti sljedeci korak
+    free = {"drive": np.zeros(n), "arm": np.zeros(n)}  # Kad se resurs oslobodi
+    x, y, h = np.zeros(n), np.zeros(n), np.zeros(n)
+    angles = np.full((n, 7), 90.0)  # Manipulator() krece sa svim servima na 90
+    step_time = np.zeros((n, steps))
+    trace = np.zeros((n, steps + 1, 4))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for s in range(steps):
+            op, a, l, r = (missions[:, s, k] for k in range(4))
+            overlap = (op >= 0) & (op.astype(int) & FLAG_OVERLAP > 0)
+            kind = np.where(overlap, op - FLAG_OVERLAP, op)
+            dt = np.zeros(n)
+            s_left, s_right = np.zeros(n), np.zeros(n)
+
+            # straight: firmware vozi samo naprijed (abs enkodera, baznaBrzina > 0)
+            m = kind == OPCODES["straight"]
+            dist = np.abs(a) * scale + speed * loop_s / 2.0
+            dt = np.where(m, dist / speed, dt)
+            s_left = np.where(m, dist, s_left)
+            s_right = np.where(m, dist, s_right)
+
+            # move_dual: open loop, staje kad brzi kotac predje dist
+            m = kind == OPCODES["move_dual"]
+            v_left, v_right = l * p.cm_s_per_pwm, r * p.cm_s_per_pwm
+            fastest = np.maximum(np.abs(v_left), np.abs(v_right))
+            moving = m & (fastest > 0)
+            dual_t = (np.abs(a) * scale) / fastest + loop_s / 2.0
+            dt = np.where(m, np.where(moving, dual_t, np.inf), dt)
+            s_left = np.where(moving, v_left * dual_t, s_left)
+            s_right = np.where(moving, v_right * dual_t, s_right)
+
+            # turn: oba kotaca +-120; pivot: jedan kotac 120, drugi stoji
+            for op, wheels in ((OPCODES["turn"], 2.0), (OPCODES["pivot"], 1.0)):
+                m = kind == op
+                rate = np.degrees(wheels * turn_speed / track)  # stupnjevi/s
+                angle = np.maximum(np.abs(a) - TURN_TOLERANCE, 0.0) + rate * loop_s / 2.0
+                dt = np.where(m, ROTATE_PAUSE + angle / rate, dt)
+                arc = np.sign(a) * np.radians(angle) * track / wheels
+                if wheels == 2.0:
+                    s_left = np.where(m, arc, s_left)
+                    s_right = np.where(m, -arc, s_right)
+                else:
+                    s_left = np.where(m & (a > 0), arc, s_left)
+                    s_right = np.where(m & (a < 0), -arc, s_right)
+
+            arm = (kind == OPCODES["arm"]) | (kind == OPCODES["preset"])
+            if presets is None:
+                dt = np.where(arm, b(p.arm_s), dt)
+            elif arm.any():
+                dt = np.where(arm, _arm(angles, presets, kind, l, arm), dt)
+
+            m = kind == OPCODES["wait"]
+            dt = np.where(m, np.abs(a) / 1000.0, dt)
+
+            # Red koraka prelazi na sljedeci korak u iducem prolazu kroz loop()
+            dt = np.where(kind != NOOP, dt + loop_s, dt)
+            x, y, h = _drive(x, y, h, s_left, s_right, track)
+
+            # Pocetak: nakon prethodnog blokirajuceg koraka i kad je resurs slobodan
+            drive = (kind >= 0) & (kind <= OPCODES["move_dual"])
+            sync = kind == OPCODES["sync"]
+            start = np.where(drive | sync, np.maximum(cursor, free["drive"]), cursor)
+            start = np.where(arm | sync, np.maximum(start, free["arm"]), start)
+            end = start + dt
+            free["drive"] = np.where(drive, end, free["drive"])
+            free["arm"] = np.where(arm, end, free["arm"])
+            cursor = np.where(kind == NOOP, cursor, np.where(overlap, start, end))
+            step_time[:, s] = dt
+            trace[:, s + 1] = np.stack([np.where(kind == NOOP, cursor, end), x, y, h], axis=1)
+    total = np.maximum(cursor, np.maximum(free["drive"], free["arm"]))
+    return SimResult(step_time, trace, total)
+
+
+def shuffled(steps, count, fixed=(), seed=None):
+    """count nasumicnih redoslijeda koraka; indeksi u fixed ostaju na mjestu."""
+    rng = np.random.default_rng(seed)
+    fixed = set(fixed)
+    free = [i for i in range(len(steps)) if i not in fixed]
+    orders = []
+    for _ in range(count):
+        order = list(range(len(steps)))
+        for slot, i in zip(free, rng.permutation(free)):
+            order[slot] = int(i)
+        orders.append(order)
+    return orders
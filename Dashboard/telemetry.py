@@ -0,0 +1,318 @@
+# telemetry.py
+# Prijem telemetrije s robota (BLE UART / Serial).
+#
+# BLE notifikacije stizu u komadima od ~20 bajtova. LineFramer ih slaze u
+# linije na jednom bytearrayu i pretrazuje samo nove bajtove za '\n', pa
+# cijena po notifikaciji ne raste s velicinom buffera. Gotove linije idu
+# handleru registriranom za njihov prefiks (STATUS:, JSON '{', VISION:, ...).
+# Binarni STATUS okviri (dogovoreni s firmwareom) dolaze izmedju linija i
+# prepoznaju se po sync bajtovima.
+
+import binascii
+import struct
+import time
+
+import numpy as np
+
+MAX_LINE = 512  # Linija duza od ovoga je sigurno smece (izgubljen '\n')
+
+
+class LineFramer:
+    """Slaze bajtove u linije i predaje ih handlerima po prefiksu."""
+
+    def __init__(self, max_line=MAX_LINE):
+        self.max_line = max_line
+        self.handlers = []      # (prefix, handler) redom kako su dodani
+        self.default = None     # Handler za linije bez poznatog prefiksa
+        self.lines = 0
+        self.overflows = 0
+        self._buf = bytearray()
+        self._scan = 0          # Do ovdje je buffer vec pretrazen za '\n'
+        self._discard = False   # Nakon preljeva preskacemo do sljedeceg '\n'
+        self.frame_sync = None  # Binarni okviri: (sync, velicina, handler)
+        self.frame_errors = 0
+        self._hunt = False      # Nakon loseg okvira trazimo sljedeci sync
+
+    def add_handler(self, prefix, handler):
+        if isinstance(prefix, str):
+            prefix = prefix.encode("ascii")
+        self.handlers.append((prefix, handler))
+
+    def set_default(self, handler):
+        self.default = handler
+
+    def set_frame_handler(self, sync, size, handler):
+        """
+        Okviri fiksne duljine `size` koji pocinju sa `sync`. handler(buf, offset)
+        dekodira izravno iz buffera i vraca False ako okvir nije ispravan.
+        """
+        self.frame_sync = (sync, size, handler)
+
+    def feed(self, data):
+        if self._discard:
+            nl = data.find(b"\n")
+            if nl == -1: return
+            data = data[nl + 1:]
+            self._discard = False
+
+        buf = self._buf
+        buf += data
+        start = 0
+        while True:
+            if self.frame_sync:
+                sync, size, handler = self.frame_sync
+                if self._hunt:
+                    # Nakon loseg okvira: trazi sljedeci sync. Ako ga nema ni nakon
+                    # dva okvira podataka, robot vise ne salje binarno - natrag na linije.
+                    nxt = buf.find(sync, start)
+                    if nxt != -1:
+                        start = self._scan = nxt
+                        self._hunt = False
+                    elif len(buf) - start < 2 * size:
+                        break
+                    else:
+                        nl = buf.find(b"\n", start)
+                        if nl == -1: break
+                        start = self._scan = nl + 1
+                        self._hunt = False
+                        continue
+                if buf.startswith(sync[:len(buf) - start], start):
+                    if len(buf) - start < size: break  # Okvir jos nije cijeli
+                    if handler(buf, start):
+                        start = self._scan = start + size
+                    else:
+                        # Los CRC. Ako iza okvira pocinje sljedeci okvir ili linija,
+                        # bio je samo pokvaren bajt; inace je okvir krnji - trazi sync.
+                        self.frame_errors += 1
+                        nxt = start + size
+                        if buf.startswith(sync, nxt) or buf[nxt:nxt + 1] in (b"{", b"S", b"\r", b"\n"):
+                            start = self._scan = nxt
+                        else:
+                            self._hunt = True
+                            start = self._scan = start + 1
+                    continue
+            nl = buf.find(b"\n", self._scan)
+            if nl == -1: break
+            line = bytes(buf[start:nl]).strip()
+            start = self._scan = nl + 1
+            if line:
+                self.dispatch(line)
+
+        if start:
+            del buf[:start]  # bytearray brise s pocetka bez kopiranja ostatka
+        self._scan = len(buf)
+
+        if len(buf) > self.max_line:
+            # Nema '\n' predugo - odbaci i resinkroniziraj na sljedecoj liniji
+            self.overflows += 1
+            del buf[:]
+            self._scan = 0
+            self._discard = True
+            self._hunt = False
+
+    def dispatch(self, line):
+        self.lines += 1
+        for prefix, handler in self.handlers:
+            if line.startswith(prefix):
+                handler(line)
+                return
+        if self.default:
+            self.default(line)
+
+    def reset(self):
+        del self._buf[:]
+        self._scan = 0
+        self._discard = False
+        self._hunt = False
+
+
+# --- Tipizirani uzorci telemetrije ---
+
+# STATUS:cm,pL,pR,armIdx,usF,usB,usL,usR,ind  (redoslijed iz poslajiStatus())
+STATUS_FIELDS = ("cm", "pL", "pR", "arm", "usF", "usB", "usL", "usR", "ind")
+STATUS_DTYPES = {
+    "cm": np.float32,
+    "pL": np.int32, "pR": np.int32,
+    "arm": np.int16,
+    "usF": np.int32, "usB": np.int32, "usL": np.int32, "usR": np.int32,
+    "ind": np.int8,
+}
+STATUS_TYPES = (float, int, int, int, int, int, int, int, int)
+
+
+class TelemetrySample:
+    """
+    Jedan STATUS uzorak, parsiran jednom. `t` je vrijeme prijema (time.time()),
+    `ms` je millis() robota (samo binarni mod, inace 0).
+    """
+
+    __slots__ = ("seq", "t", "ms") + STATUS_FIELDS
+
+    def __init__(self, seq, t, *values, ms=0):
+        self.seq = seq
+        self.t = t
+        self.ms = ms
+        for name, value in zip(STATUS_FIELDS, values):
+            setattr(self, name, value)
+
+    @classmethod
+    def parse_status(cls, line, seq, t):
+        """Parsira b"STATUS:..." liniju, vraca None ako je neispravna."""
+        parts = line[7:].split(b",")
+        if len(parts) < len(STATUS_FIELDS):
+            return None
+        try:
+            values = [conv(float(p)) if conv is int else conv(p) for conv, p in zip(STATUS_TYPES, parts)]
+        except ValueError:
+            return None
+        return cls(seq, t, *values)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+# Binarni okvir iz Telemetrija.h (StatusOkvir), little-endian bez paddinga:
+# sync, seq, millis, cm, encL, encR, arm, usF, usB, usL, usR, induct, crc16
+STATUS_SYNC = b"\xaa\x55"
+STATUS_FRAME = struct.Struct("<2sHIfiibhhhhBH")
+
+
+def crc16(data):
+    """CRC-16/CCITT-FALSE, isti kao crc16() u firmwareu."""
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+class StatusFrameDecoder:
+    """
+    Dekoder binarnih STATUS okvira za LineFramer.set_frame_handler().
+    Cita izravno iz buffera framera (unpack_from, bez kopije), provjerava CRC
+    i 16-bitni seq siri u rastuci broj pa se izgubljeni okviri vide kao rupe.
+    """
+
+    def __init__(self, on_sample):
+        self.on_sample = on_sample
+        self.frames = 0
+        self.crc_errors = 0
+        self.lost = 0
+        self._seq = None
+
+    def __call__(self, buf, offset):
+        body = memoryview(buf)[offset + 2:offset + STATUS_FRAME.size - 2]
+        try:
+            fields = STATUS_FRAME.unpack_from(buf, offset)
+            if crc16(body) != fields[-1]:
+                self.crc_errors += 1
+                return False
+        finally:
+            body.release()
+
+        seq16 = fields[1]
+        if self._seq is None:
+            seq = seq16
+        else:
+            seq = self._seq + ((seq16 - self._seq) & 0xFFFF)
+            self.lost += seq - self._seq - 1
+        self._seq = seq
+        self.frames += 1
+        _, _, ms, cm, *values, _ = fields
+        self.on_sample(TelemetrySample(seq, time.time(), cm, *values, ms=ms))
+        return True
+
+    def reset(self):
+        # Novi spoj = firmware mozda restartan, seq krece ispocetka
+        self._seq = None
+
+
+class TelemetryRing:
+    """
+    Kruzni buffer telemetrije, jedan prealocirani NumPy stupac po polju.
+
+    Svaki uzorak se upisuje dvaput (na i i na i + capacity), pa je zadnjih
+    n uzoraka uvijek jedan kontinuirani komad niza - `column()` vraca view
+    bez kopiranja, i kad buffer "prelazi" preko kraja. Memorija je fiksna.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.count = 0  # Ukupno upisano (ne samo zadrzano)
+        self.last = None
+        self.columns = {"t": np.zeros(2 * capacity, np.float64),
+                        "seq": np.zeros(2 * capacity, np.int64),
+                        "ms": np.zeros(2 * capacity, np.uint32)}
+        for name in STATUS_FIELDS:
+            self.columns[name] = np.zeros(2 * capacity, STATUS_DTYPES[name])
+
+    @classmethod
+    def for_duration(cls, minutes, rate_hz):
+        return cls(int(minutes * 60 * rate_hz))
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def clear(self):
+        # Stupci ostaju alocirani, samo se zaboravljaju uzorci
+        self.count = 0
+        self.last = None
+
+    def append(self, sample):
+        i = self.count % self.capacity
+        j = i + self.capacity
+        for name, col in self.columns.items():
+            value = getattr(sample, name)
+            col[i] = value
+            col[j] = value
+        self.count += 1
+        self.last = sample
+
+    def column(self, name, n=None):
+        """View zadnjih `n` vrijednosti polja (najstarija prva), bez kopiranja."""
+        return self.view((name,), n)[0]
+
+    def view(self, names, n=None):
+        """
+        Viewovi vise polja s istim krajem. BLE dretva moze upisivati
+        istovremeno, pa se `count` cita samo jednom - svi stupci su iste duljine.
+        """
+        count = self.count
+        size = min(count, self.capacity)
+        n = size if n is None else min(n, size)
+        end = count % self.capacity + self.capacity if count > self.capacity else count
+        return [self.columns[name][end - n:end] for name in names]
+
+    def since(self, name, t_from):
+        """View vrijednosti polja od vremena `t_from` nadalje."""
+        t = self.column("t")
+        start = int(np.searchsorted(t, t_from))
+        return self.column(name)[start:]
+
+    def latest(self, name, default=None):
+        return default if self.last is None else getattr(self.last, name)
+
+
+def rates(t, values):
+    """Derivacija po vremenu (npr. pulsevi -> pulsevi/s). Vraca (t[1:], brzina)."""
+    dt = np.diff(t)
+    dv = np.diff(values.astype(np.float64))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = np.where(dt > 0, dv / dt, 0.0)
+    return t[1:], rate
+
+
+def decimate_minmax(t, values, t0, t1, width):
+    """
+    Min/max decimacija na sirinu ekrana: za svaki stupac piksela u [t0, t1]
+    vraca (x, min, max). Broj tocaka za crtanje ovisi samo o `width`, ne o
+    broju uzoraka. `t` mora biti sortiran (vrijeme prijema je).
+    """
+    empty = np.empty(0)
+    if width <= 0 or t1 <= t0 or not len(t):
+        return empty, empty, empty
+    edges = np.searchsorted(t, np.linspace(t0, t1, width + 1))
+    counts = np.diff(edges)
+    cols = np.flatnonzero(counts)
+    if not len(cols):
+        return empty, empty, empty
+    starts = edges[cols]
+    # Prazni stupci izmedju nemaju uzoraka, pa su granice segmenata upravo `starts`
+    segment = values[:edges[-1]]
+    return cols, np.minimum.reduceat(segment, starts), np.maximum.reduceat(segment, starts)
@@ -0,0 +1,232 @@
+# telemetry_log.py
+# Binarni log telemetrije (STATUS uzorci, JSON odgovori, TX komande).
+#
+# Datoteka je zaglavlje od 16 bajtova + niz zapisa fiksne duljine (LOG_DTYPE).
+# Pisanje radi pozadinska dretva koja zapise skuplja u prealocirani NumPy
+# batch i pise ga jednim write(). Citac memory-mapira datoteku, pa su stupci
+# (npr. log.column("cm")) viewovi u mmap - i visesatni log je odmah spreman.
+
+import asyncio
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from telemetry import STATUS_FIELDS, STATUS_DTYPES, TelemetrySample
+
+LOG_MAGIC = b"DJTLOG01"
+LOG_HEADER_SIZE = 16  # magic (8) + velicina zapisa (u4) + rezerva (4)
+TEXT_SIZE = 64        # JSON / TX tekst se reze na ovoliko bajtova
+
+# Vrste zapisa
+KIND_STATUS = 0
+KIND_RX = 1   # JSON odgovor robota ({"status": ...})
+KIND_TX = 2   # Poslana komanda
+KIND_LINK = 3 # Sazetak latencije linka (LinkMonitor.summary())
+
+LOG_DTYPE = np.dtype([("t", "<f8"), ("seq", "<i8"), ("ms", "<u4"), ("kind", "u1")]
+                     + [(name, np.dtype(STATUS_DTYPES[name]).newbyteorder("<")) for name in STATUS_FIELDS]
+                     + [("text", f"S{TEXT_SIZE}")])
+
+BATCH_SIZE = 256
+
+
+class TelemetryLogger:
+    """Dodaje zapise u log u pozadinskoj dretvi. log_*() se zovu iz BLE/asyncio dretve."""
+
+    def __init__(self, path, max_queue=8192, flush_interval=1.0):
+        self.path = path
+        self.queue = queue.Queue(max_queue)
+        self.flush_interval = flush_interval
+        self.thread = None
+        self.records = 0
+        self.dropped = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        print(f"Log telemetrije: {self.path}")
+
+    def stop(self):
+        if self.thread:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+            print(f"Log telemetrije zatvoren: {self.records} zapisa, drop={self.dropped}")
+
+    def log_sample(self, sample):
+        self._put((KIND_STATUS, sample))
+
+    def log_text(self, kind, text, t=None):
+        self._put((kind, (time.time() if t is None else t, text)))
+
+    def _put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        batch = np.zeros(BATCH_SIZE, LOG_DTYPE)
+        n = 0
+        text_seq = 0
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, "ab", buffering=0) as f:
+            if new_file:
+                f.write(LOG_MAGIC + np.array([LOG_DTYPE.itemsize, 0], "<u4").tobytes())
+            due = time.monotonic() + self.flush_interval
+            while True:
+                try:
+                    item = self.queue.get(timeout=max(due - time.monotonic(), 0.01))
+                except queue.Empty:
+                    item = ()
+                if item is None:
+                    break
+
+                if item:
+                    kind, payload = item
+                    rec = batch[n]
+                    rec["kind"] = kind
+                    if kind == KIND_STATUS:
+                        rec["t"] = payload.t
+                        rec["seq"] = payload.seq
+                        rec["ms"] = payload.ms
+                        for name in STATUS_FIELDS:
+                            rec[name] = getattr(payload, name)
+                        rec["text"] = b""
+                    else:
+                        t, text = payload
+                        rec["t"] = t
+                        rec["seq"] = text_seq
+                        rec["ms"] = 0
+                        text_seq += 1
+                        for name in STATUS_FIELDS:
+                            rec[name] = 0
+                        rec["text"] = text.encode("utf-8", "replace")[:TEXT_SIZE]
+                    n += 1
+
+                # Pisi pun batch, ili sto se skupilo svakih flush_interval sekundi
+                if n == BATCH_SIZE or (n and time.monotonic() >= due):
+                    f.write(batch[:n].tobytes())
+                    self.records += n
+                    n = 0
+                if time.monotonic() >= due:
+                    due = time.monotonic() + self.flush_interval
+            if n:
+                f.write(batch[:n].tobytes())
+                self.records += n
+
+
+class TelemetryLog:
+    """Log otvoren za citanje. `records` je np.memmap, stupci su viewovi bez kopiranja."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(LOG_HEADER_SIZE)
+        if header[:8] != LOG_MAGIC:
+            raise ValueError(f"{path} nije log telemetrije")
+        record_size = int(np.frombuffer(header[8:12], "<u4")[0])
+        if record_size != LOG_DTYPE.itemsize:
+            raise ValueError(f"Nepoznat format zapisa ({record_size} B)")
+
+        # Odbaci nedovrseni zapis na kraju (npr. prekid programa)
+        count = (os.path.getsize(path) - LOG_HEADER_SIZE) // LOG_DTYPE.itemsize
+        if count > 0:
+            self.records = np.memmap(path, LOG_DTYPE, mode="r", offset=LOG_HEADER_SIZE, shape=(count,))
+        else:
+            self.records = np.zeros(0, LOG_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    def column(self, name):
+        """Stupac preko svih zapisa (strided view u mmap)."""
+        return self.records[name]
+
+    def indices(self, kind):
+        return np.flatnonzero(self.records["kind"] == kind)
+
+    def status(self):
+        """Samo STATUS zapisi (kopija - za analizu, ne za replay)."""
+        return self.records[self.records["kind"] == KIND_STATUS]
+
+    def texts(self, kind):
+        """[(t, tekst)] za JSON odgovore (KIND_RX), poslane komande (KIND_TX) ili latenciju (KIND_LINK)."""
+        recs = self.records[self.indices(kind)]
+        return [(float(t), text.decode("utf-8", "replace")) for t, text in zip(recs["t"], recs["text"])]
+
+    @property
+    def duration(self):
+        t = self.records["t"]
+        return float(t[-1] - t[0]) if len(t) else 0.0
+
+    def sample(self, i):
+        rec = self.records[i]
+        return TelemetrySample(int(rec["seq"]), float(rec["t"]), *(rec[name].item() for name in STATUS_FIELDS),
+                               ms=int(rec["ms"]))
+
+    def close(self):
+        mm = getattr(self.records, "_mmap", None)
+        self.records = np.zeros(0, LOG_DTYPE)
+        if mm is not None:
+            mm.close()
+
+
+class TelemetryReplay:
+    """
+    Vrti snimljenu sesiju kroz RobotController kao da dolazi s robota:
+    STATUS -> push_sample (ring + on_telemetry_callback), JSON -> handle_json.
+    speed: 1.0 = stvarno vrijeme, >1 ubrzano, 0 = sto brze moze.
+    """
+
+    def __init__(self, path, robot, speed=1.0):
+        self.log = TelemetryLog(path)
+        self.robot = robot
+        self.speed = speed
+        self.position = 0
+        self.task = None
+        self.pushed = 0
+        self.elapsed = 0.0
+
+    def set_speed(self, speed):
+        self.speed = speed
+        self._sync = None
+
+    def start(self, loop):
+        self.task = asyncio.run_coroutine_threadsafe(self.run(), loop)
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+    async def run(self):
+        records = self.log.records
+        print(f"Replay telemetrije {self.log.path} ({len(records)} zapisa)")
+        self.robot.telemetry.clear()
+        started = time.perf_counter()
+        self._sync = None
+        while self.position < len(records):
+            rec = records[self.position]
+            t = float(rec["t"])
+            if self._sync is None:
+                self._sync = (t, time.monotonic())
+            if self.speed > 0:
+                wait = self._sync[1] + (t - self._sync[0]) / self.speed - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            elif self.position % 1000 == 0:
+                await asyncio.sleep(0)  # I na "Max" brzini pusti petlju da dise
+
+            kind = rec["kind"]
+            if kind == KIND_STATUS:
+                self.robot.push_sample(self.log.sample(self.position))
+            elif kind == KIND_RX:
+                self.robot.handle_json(rec["text"].decode("utf-8", "replace"))
+            self.position += 1
+            self.pushed += 1
+        self.elapsed = time.perf_counter() - started
+        print(f"Replay telemetrije gotov: {self.pushed} zapisa u {self.elapsed:.2f} s")
@@ -0,0 +1,249 @@
+# testLoopback.py
+# Cijeli komandni put Dashboarda bez robota: RobotController -> red komandi
+# -> LoopbackTransport -> LoopbackRobot (glumi checkSerial() iz firmwarea).
+#
+#   python testLoopback.py          # provjera u procesu
+#   python testLoopback.py serve    # LoopbackRobot na TCP 2323 (Dashboard: "TCP")
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+from link import PING_INTERVAL
+from loopback import LoopbackRobot, ARM_TIME, SPEED_CM_S, CEKANJE, SMART_START
+from mission import MissionExecutor, MissionError, compile_mission
+from profiler import MissionProfile, compare
+from robot import RobotController
+from transport import LoopbackTransport, LINK_BYTES_PER_S
+
+TCP_PORT = 2323
+
+
+async def check():
+    robot = RobotController(asyncio.get_running_loop())
+    peer = LoopbackRobot()
+    assert await robot.connect(LoopbackTransport(peer, latency=0.01, bytes_per_s=LINK_BYTES_PER_S))
+
+    # Robot u mirovanju: ping i telemetry nakon spajanja ga ne smiju pokrenuti
+    await asyncio.sleep(PING_INTERVAL * 1.5)
+    assert peer.phase == CEKANJE and peer.motion is None, "Ping je pokrenuo robota"
+    assert "ping" in robot.link.by_command, "Ping bez odgovora"
+
+    # Dva istovremena pisanja na BLE-velicine komade: linije ne smiju biti isprepletene
+    slow = LoopbackRobot()
+    link = LoopbackTransport(slow, write_size=20, bytes_per_s=900)
+    await link.open()
+    link.budget.consume(link.budget.capacity)  # Buffer robota pun: svaki komad ceka
+    lines = ['{"cmd": "set_pid", "p": 35.0, "i": 0.0, "d": 15.0}', '{"cmd": "ping", "id": 99}']
+    await asyncio.gather(*(link.write((line + "\n").encode()) for line in lines))
+    await link.close()
+    assert slow.commands == lines, f"Isprepletena pisanja: {slow.commands}"
+
+    reply = await robot.request({"cmd": "set_pid", "p": 35.0, "i": 0.0, "d": 15.0})
+    print(f"set_pid -> {reply}")
+    assert reply["status"] == "PID_SAVED"
+
+    # Vise zahtjeva istovremeno (prozor REQUEST_WINDOW), odgovori se sparuju po id-u
+    replies = await asyncio.gather(*(robot.request({"cmd": "ping"}) for _ in range(10)))
+    assert all(r["status"] == "PONG" for r in replies)
+    assert len({r["id"] for r in replies}) == 10
+
+    # Spajanje rucne voznje: do robota stize manje komandi nego poslano, zadnja sigurno
+    for speed in range(50):
+        robot.scheduler.enqueue(json.dumps({"cmd": "manual", "l": speed, "r": speed}))
+        await asyncio.sleep(0.001)
+    await asyncio.sleep(0.5)
+    manual = [c for c in peer.commands if '"manual"' in c]
+    print(f"manual: poslano 50, stiglo {len(manual)}, spojeno {robot.scheduler.coalesced}")
+    assert json.loads(manual[-1])["l"] == 49
+    robot.scheduler.enqueue('{"cmd": "stop"}')
+
+    # Spojiva komanda ne smije preteci kasniju komandu iz reda (preset bi spremio staru pozu)
+    await asyncio.sleep(0.3)
+    peer.commands.clear()
+    for cmd in ("LOAD_PRESET:1", "SERVO:0,120.0", "SAVE_PRESET:1"):
+        robot.scheduler.enqueue(cmd)
+    await asyncio.sleep(0.3)
+    assert [c for c in peer.commands if not c.startswith("{")] == ["LOAD_PRESET:1", "SERVO:0,120.0", "SAVE_PRESET:1"], \
+        f"Redoslijed: {peer.commands}"
+    robot.scheduler.enqueue('{"cmd": "stop"}')
+
+    # Stop izbacuje kretanje koje jos ceka u redu: nakon stopa robot ne krece
+    await asyncio.sleep(0.3)
+    peer.commands.clear()
+    for _ in range(3):
+        robot.scheduler.enqueue(json.dumps({"cmd": "straight", "val": 50}))
+    robot.scheduler.enqueue(json.dumps({"cmd": "arm", "val": "voznja"}))
+    robot.scheduler.enqueue('{"cmd": "stop"}')
+    await asyncio.sleep(0.5)
+    after_stop = peer.commands[next(i for i, c in enumerate(peer.commands) if '"stop"' in c):]
+    print(f"Stop: poslije stopa {after_stop[1:]}, odbaceno {robot.scheduler.dropped}")
+    assert not any('"straight"' in c or '"arm"' in c for c in after_stop), "Kretanje poslano nakon stopa"
+    assert peer.motion is None and peer.arm is None, "Robot se mice nakon stopa"
+
+    # Voznja: OK odmah, DONE kad zavrsi, telemetrija prati udaljenost
+    done = asyncio.get_running_loop().create_future()
+    robot.on_json_callback = lambda msg: msg.get("status") == "DONE" and not done.done() and done.set_result(msg)
+    await robot.request({"cmd": "straight", "val": 10})
+    await asyncio.wait_for(done, 2.0)
+    await asyncio.sleep(0.1)
+    print(f"DONE, cm = {robot.telemetry.latest('cm'):.1f}, uzoraka {len(robot.telemetry)}, "
+          f"binarnih okvira {robot.frame_decoder.frames}")
+    assert abs(robot.telemetry.latest("cm") - 10.0) < 0.01
+
+    # Misija: svaki korak zavrsava na DONE / ARM_DONE, bez fiksnih pauza
+    presets = ["Parkiraj", "Voznja"]
+    steps = compile_mission(["MOVE:10", "ARM:Voznja", "WAIT:100", "MOVE:-5"], presets)
+    finished = asyncio.get_running_loop().create_future()
+    executor = MissionExecutor(robot, on_finish=lambda status, message: finished.set_result(status))
+    started = time.perf_counter()
+    executor.start(steps)
+    assert await asyncio.wait_for(finished, 5.0) == "done"
+    ideal = 15 / SPEED_CM_S + ARM_TIME + 0.1
+    print(f"Misija: {time.perf_counter() - started:.2f} s (voznja/ruka {ideal:.2f} s, "
+          f"stari sleepovi bi dodali {0.5 * 4 + 2.0 - ARM_TIME:.1f} s)")
+    dashboard_profile = executor.profile
+    print(dashboard_profile.table())
+    assert all(s.outcome == "done" for s in dashboard_profile.steps)
+    assert 0.015 < dashboard_profile.steps[0].link < 0.2  # 2 x latency
+
+    # Isti format iz planera (JSON) i provjera prije slanja
+    planned = compile_mission(['{"cmd": "straight", "val": 10}', '{"cmd": "arm", "val": "HOME"}',
+                               '{"cmd": "wait", "ms": 100}', "MOVE:-5"], presets)
+    assert planned[0] == steps[0] and planned[1].command() == {"cmd": "arm", "val": "voznja"}
+    try:
+        compile_mission(["MOVE:10", '{"cmd": "turn", "val": 720}'], presets)
+        raise AssertionError("Kut izvan raspona prosao")
+    except MissionError as e:
+        print(f"Provjera: {e}")
+
+    # Misija na robotu: jedan upload, koraci se vrte bez cekanja na link
+    finished = asyncio.get_running_loop().create_future()
+    progress = []
+    executor = MissionExecutor(robot, on_step=lambda i, step: progress.append(i),
+                               on_finish=lambda status, message: finished.set_result(status))
+    started = time.perf_counter()
+    executor.start(steps, onboard=True)
+    assert await asyncio.wait_for(finished, 5.0) == "done"
+    print(f"Misija na robotu: {time.perf_counter() - started:.2f} s, koraci {progress}")
+    assert progress == [0, 1, 2, 3]
+    onboard_profile = executor.profile
+
+    # Upload mora pasti cisto: robot vozi (BUSY) ili mission_clear nikad ne dobije odgovor
+    failures = []
+    fail = MissionExecutor(robot, on_finish=lambda status, message: failures.append((status, message)))
+    await robot.request({"cmd": "stop"})  # FAZA_KRAJ -> cekanje, start vrijedi samo iz mirovanja
+    assert (await robot.request({"cmd": "start"}))["status"] == "STARTED"
+    fail.start(steps, onboard=True)
+    while not failures:
+        await asyncio.sleep(0.01)
+    print(f"Upload dok robot vozi: {failures[-1]}")
+    assert failures[-1][0] == "error" and "BUSY" in failures[-1][1] and peer.phase == CEKANJE
+    handle_line = peer.handle_line
+    peer.handle_line = lambda line: '"mission_clear"' in line or handle_line(line)
+    peer.commands.clear()
+    fail.start(steps, onboard=True)
+    while len(failures) < 2:
+        await asyncio.sleep(0.05)
+    peer.handle_line = handle_line
+    print(f"Upload bez CLEARED: {failures[-1]}")
+    assert failures[-1][0] == "error" and "mission_clear" in failures[-1][1]
+    assert not any('"mission_add"' in c or '"mission_run"' in c for c in peer.commands)
+    print(onboard_profile.table())
+    print(compare(dashboard_profile, onboard_profile))
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "run.json")
+        onboard_profile.save_json(path)
+        onboard_profile.save_html(os.path.join(folder, "run.html"))
+        assert abs(MissionProfile.load(path).total - onboard_profile.total) < 1e-3
+
+    # Preklapanje: ruka se sklapa dok robot vozi, zadnji ARM ceka ruku (isti resurs)
+    serial = compile_mission(["MOVE:10", "ARM:Voznja", "MOVE:30", "ARM:Parkiraj"], presets)
+    overlapped = compile_mission(["MOVE:10", "&ARM:Voznja", "MOVE:30", "ARM:Parkiraj"], presets)
+    ideal = 10 / SPEED_CM_S + max(ARM_TIME, 30 / SPEED_CM_S) + ARM_TIME
+    for onboard in (False, True):
+        finished = asyncio.get_running_loop().create_future()
+        started = time.perf_counter()
+        executor.start(overlapped, onboard=onboard)
+        assert await asyncio.wait_for(finished, 6.0) == "done"
+        elapsed = time.perf_counter() - started
+        print(f"Preklapanje ({'robot' if onboard else 'dashboard'}): {elapsed:.2f} s "
+              f"(idealno {ideal:.2f} s, bez preklapanja {40 / SPEED_CM_S + 2 * ARM_TIME:.2f} s)")
+        assert elapsed < ideal + 0.3
+    arm_done = executor.profile.steps[1].times["done"]
+    assert arm_done > executor.profile.steps[2].times["start"], "Ruka i voznja se nisu preklopile"
+    assert serial[1].encode()[0] + 16 == overlapped[1].encode()[0]
+
+    finished = asyncio.get_running_loop().create_future()
+    executor.start(compile_mission(["MOVE:100"], presets))
+    await asyncio.sleep(0.3)
+    executor.stop()
+    assert await asyncio.wait_for(finished, 1.0) == "stopped"
+    await asyncio.sleep(0.1)
+    assert peer.motion is None, "Robot nije zaustavljen"
+
+    # Nakon stop robot opet ceka start: ping ga ne pokrece, {"cmd": "start"} da
+    await asyncio.sleep(PING_INTERVAL * 1.5)
+    assert peer.phase == CEKANJE and peer.motion is None, "Robot krenuo nakon stop"
+    assert (await robot.request({"cmd": "start"}))["status"] == "STARTED" and peer.phase == SMART_START
+    assert (await robot.request({"cmd": "start"}))["status"] == "BUSY"
+    await robot.request({"cmd": "stop"})
+
+    # Prekid veze: automatski reconnect, ponovno slanje stanja (boje, PID) i telemetrija
+    robot.remember("color:BOCA", "SET:BOCA,0,100,-20,20,-20,20")
+    robot.remember("pid", {"cmd": "set_pid", "p": 35.0, "i": 0.0, "d": 15.0})
+    transport = robot.transport
+    count = robot.telemetry.count
+    peer.commands.clear()
+    dropped = time.perf_counter()
+    transport.drop()
+    while robot.telemetry.count == count or not robot.connected:
+        await asyncio.sleep(0.005)
+    print(f"Reconnect: prva telemetrija nakon {(time.perf_counter() - dropped) * 1000:.0f} ms")
+    await asyncio.sleep(0.3)
+    assert "SET:BOCA,0,100,-20,20,-20,20" in peer.commands
+    assert any('"set_pid"' in c for c in peer.commands)
+    assert peer.phase == CEKANJE and peer.motion is None, "Reconnect je pokrenuo robota"
+
+    print(f"Link: {robot.link.summary()}")
+    await robot.disconnect()
+    print("Loopback OK")
+
+
+class TcpPeer:
+    """LoopbackRobot.send() -> TCP klijent."""
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def send(self, data):
+        self.writer.write(data)
+
+
+async def serve():
+    async def client(reader, writer):
+        print(f"Spojen: {writer.get_extra_info('peername')}")
+        peer = LoopbackRobot()
+        peer.attach(TcpPeer(writer))
+        try:
+            while data := await reader.read(1024):
+                peer.receive(data)
+        finally:
+            peer.detach()
+            writer.close()
+            print("Odspojen")
+
+    server = await asyncio.start_server(client, "127.0.0.1", TCP_PORT)
+    print(f"LoopbackRobot na 127.0.0.1:{TCP_PORT} (Ctrl+C za prekid)")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve() if sys.argv[1:] == ["serve"] else check())
+    except KeyboardInterrupt:
+        print("Zatvaram...")
@@ -0,0 +1,375 @@
+# transport.py
+# Link prema robotu: BLE (HC-02), serijski port (USB kabel ili Bluetooth SPP),
+# TCP i loopback u memoriji.
+#
+# Svi transporti imaju isto sucelje - open(), write(data, urgent), close(),
+# write_size - i primljene bajtove predaju u on_data (LineFramer.feed u
+# RobotControlleru). Framing, pakiranje komandi i cekanje odgovora su iznad
+# transporta (telemetry.py, link.py), pa su isti na svakom linku.
+#
+# BleTransport pakira vise komandi (svaka zavrsava s '\n') u jedan GATT write
+# do velicine koju dopusta dogovoreni MTU, i koristi write-without-response
+# kad ga karakteristika podrzava. Bez odgovora nema povratne informacije da
+# HC-02 stize, pa LinkBudget procjenjuje koliko je bajtova jos u bufferu
+# modula (UART prema Arduinu ga prazni brzinom baud/10) i ne pise preko toga.
+
+import asyncio
+import json
+import os
+import threading
+import time
+
+LINK_BYTES_PER_S = 900     # HC-02 na 9600 baud ~ 960 B/s, ostavljamo malo rezerve
+DEVICE_BUFFER = 128        # Procjena buffera HC-02 (B) prije nego pocne gubiti podatke
+DEFAULT_WRITE_SIZE = 20    # ATT MTU 23 - 3 bajta zaglavlja
+SERIAL_WRITE_SIZE = 64     # Serial RX buffer Arduina Mega
+TCP_WRITE_SIZE = 512
+
+# UUID-ovi za HC-02 (ISSC)
+UART_RX_CHAR_UUID = "49535343-1e4d-4bd9-ba61-23c647249616" # Notify
+UART_TX_CHAR_UUID = "49535343-8841-43f4-a8d4-ecbe34729bb3" # Write
+BLE_NAME = "HC-02"
+BLE_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ble_device.json")
+CACHED_CONNECT_TIMEOUT = 4.0  # s za izravno spajanje na zapamcenu adresu
+SCAN_TIMEOUT = 10.0           # s za trazenje po imenu (vraca cim nadje)
+
+USB_BAUD = 115200          # Serial na Megi (HardwareMap.cpp)
+SPP_BAUD = 9600            # HC-02 preko klasicnog Bluetootha (testClassic.py)
+
+
+class LinkBudget:
+    """Procjena popunjenosti buffera na drugoj strani linka (leaky bucket)."""
+
+    def __init__(self, bytes_per_s=LINK_BYTES_PER_S, capacity=DEVICE_BUFFER):
+        self.bytes_per_s = bytes_per_s
+        self.capacity = capacity
+        self.fill = 0.0
+        self._t = time.monotonic()
+
+    def _drain(self):
+        now = time.monotonic()
+        self.fill = max(0.0, self.fill - (now - self._t) * self.bytes_per_s)
+        self._t = now
+
+    def delay(self, nbytes):
+        """Koliko sekundi treba cekati da `nbytes` stane u buffer."""
+        self._drain()
+        over = self.fill + min(nbytes, self.capacity) - self.capacity
+        return over / self.bytes_per_s if over > 0 else 0.0
+
+    async def acquire(self, nbytes):
+        delay = self.delay(nbytes)
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self.delay(nbytes)
+        self.fill += nbytes
+
+    def consume(self, nbytes):
+        # Hitno slanje (stop) ne ceka, ali se racuna u buffer
+        self._drain()
+        self.fill += nbytes
+
+
+class Transport:
+    """
+    Zajednicki dio transporta: rezanje na write_size komade, LinkBudget i
+    brojaci. Podklase implementiraju open(), _write(chunk) i close(), a
+    primljene bajtove predaju kroz received() iz dretve loopa.
+    """
+
+    name = "link"
+
+    def __init__(self, write_size=DEFAULT_WRITE_SIZE, budget=None):
+        self.write_size = write_size
+        self.budget = budget        # LinkBudget ili None (link sam ceka)
+        self.on_data = None         # on_data(bytes) - RobotController.on_data
+        self.on_lost = None         # on_lost() - veza pukla bez close()
+        self.writes = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self._write_lock = asyncio.Lock()  # Jedno pisanje ide cijelo, komadi se ne mijesaju
+
+    def __str__(self):
+        return self.name
+
+    async def open(self):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    async def _write(self, chunk):
+        raise NotImplementedError
+
+    async def write(self, data, urgent=False):
+        """
+        Pise bajtove u komadima do write_size. `urgent` ne ceka budget (stop).
+        Vise istovremenih pisanja (red komandi, reconnect) ide jedno za drugim:
+        izmedju komada se ceka budget, pa bi se bez locka linije isprepletale.
+        """
+        view = memoryview(data)
+        async with self._write_lock:
+            for i in range(0, len(view), self.write_size):
+                chunk = bytes(view[i:i + self.write_size])
+                if self.budget:
+                    if urgent:
+                        self.budget.consume(len(chunk))
+                    else:
+                        await self.budget.acquire(len(chunk))
+                await self._write(chunk)
+                self.writes += 1
+                self.bytes_written += len(chunk)
+
+    def received(self, data):
+        self.bytes_read += len(data)
+        if self.on_data:
+            self.on_data(data)
+
+    def lost(self):
+        if self.on_lost:
+            self.on_lost()
+
+
+def load_ble_address(name, path=BLE_CACHE):
+    """Zadnja adresa na koju se uspjelo spojiti za uredjaj `name` (ili None)."""
+    try:
+        with open(path) as f:
+            return json.load(f).get(name)
+    except (OSError, ValueError):
+        return None
+
+
+def save_ble_address(name, address, path=BLE_CACHE):
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    if cache.get(name) != address:
+        cache[name] = address
+        with open(path, "w") as f:
+            json.dump(cache, f, indent=2)
+
+
+class BleTransport(Transport):
+    """
+    BLE UART (HC-02). Bez `client` open() se spaja sam: prvo izravno na
+    zapamcenu adresu (BLE_CACHE), a ako to ne uspije skenira dok ne nadje
+    uredjaj po imenu. Svaki open() stvara novi BleakClient, pa isti
+    transport moze ponovno otvoriti RobotController.reconnect().
+    S `client` koristi vec spojeni BleakClient (benchLink.py).
+    """
+
+    def __init__(self, client=None, char_uuid=UART_TX_CHAR_UUID, rx_uuid=UART_RX_CHAR_UUID, name=BLE_NAME,
+                 bytes_per_s=LINK_BYTES_PER_S, buffer_size=DEVICE_BUFFER, address=None):
+        super().__init__(DEFAULT_WRITE_SIZE, LinkBudget(bytes_per_s, buffer_size))
+        self.client = client
+        self.own_client = client is None
+        self.char_uuid = char_uuid
+        self.rx_uuid = rx_uuid
+        self.device_name = name
+        self.address = address
+        self.response = True
+        self.name = f"BLE {name}"
+
+    async def connect_client(self):
+        from bleak import BleakScanner, BleakClient
+        on_disconnect = lambda c: c is self.client and self.lost()  # Ne kasni callback stare veze
+        address = self.address or load_ble_address(self.device_name)
+        if address:
+            print(f"Povezivanje na {address} (zapamćena adresa)...")
+            client = BleakClient(address, disconnected_callback=on_disconnect)
+            try:
+                await client.connect(timeout=CACHED_CONNECT_TIMEOUT)
+                return client
+            except Exception as e:
+                print(f"Zapamćena adresa ne odgovara ({e}), skeniram...")
+
+        print(f"Skeniram BLE uređaje ({self.device_name})...")
+        device = await BleakScanner.find_device_by_filter(
+            lambda d, adv: bool(d.name) and self.device_name in d.name, timeout=SCAN_TIMEOUT)
+        if device is None:
+            raise ConnectionError(f"{self.device_name} nije pronađen.")
+        print(f"Povezivanje na {device.name} ({device.address})...")
+        client = BleakClient(device, disconnected_callback=on_disconnect)
+        await client.connect()
+        return client
+
+    async def open(self):
+        """Spaja se (ako treba), cita MTU i svojstva TX karakteristike i pretplacuje se na RX."""
+        if self.own_client:
+            self.client = await self.connect_client()
+            save_ble_address(self.device_name, self.client.address)
+
+        char = self.client.services.get_characteristic(self.char_uuid)
+        props = char.properties if char else []
+        self.response = "write-without-response" not in props
+        if not self.response:
+            self.write_size = char.max_write_without_response_size
+        else:
+            self.write_size = max(DEFAULT_WRITE_SIZE, self.client.mtu_size - 3)
+        mode = "write" if self.response else "write-without-response"
+        print(f"BLE TX: {mode}, {self.write_size} B po pisanju")
+        if self.rx_uuid:
+            await self.client.start_notify(self.rx_uuid, lambda sender, data: self.received(data))
+
+    async def _write(self, chunk):
+        await self.client.write_gatt_char(self.char_uuid, chunk, response=self.response)
+
+    async def close(self):
+        if self.client:
+            self.on_lost = None  # Namjerni prekid nije gubitak veze
+            await self.client.disconnect()
+            if self.own_client:
+                self.client = None
+
+
+class SerialTransport(Transport):
+    """
+    Serijski port preko pyseriala: USB kabel (Serial, 115200) ili HC-02 preko
+    klasicnog Bluetootha (SPP COM port, 9600). Citanje radi pozadinska dretva
+    koja bajtove predaje loopu; pisanje ide u executor jer write() blokira.
+    """
+
+    def __init__(self, port, baudrate=USB_BAUD, settle=None):
+        # UART na drugoj strani prazni baud/10 B/s, Arduino ima 64 B buffera
+        super().__init__(SERIAL_WRITE_SIZE, LinkBudget(baudrate * 0.94 / 10, SERIAL_WRITE_SIZE))
+        self.port = port
+        self.baudrate = baudrate
+        # Otvaranje USB porta resetira Megu (DTR) - pricekaj bootloader
+        self.settle = (2.0 if baudrate == USB_BAUD else 0.0) if settle is None else settle
+        self.serial = None
+        self.thread = None
+        self.loop = None
+        self.running = False
+        self.name = f"Serial {port} @ {baudrate}"
+
+    async def open(self):
+        import serial
+        self.loop = asyncio.get_running_loop()
+        print(f"Otvaram {self.port}...")
+        self.serial = await self.loop.run_in_executor(
+            None, lambda: serial.Serial(self.port, self.baudrate, timeout=0.05, write_timeout=2.0))
+        if self.settle:
+            await asyncio.sleep(self.settle)
+        self.serial.reset_input_buffer()
+        self.running = True
+        self.thread = threading.Thread(target=self.read_loop, daemon=True)
+        self.thread.start()
+        print(f"Uspješno otvoreno: {self.serial.name}")
+
+    def read_loop(self):
+        while self.running:
+            try:
+                data = self.serial.read(self.serial.in_waiting or 1)
+            except Exception as e:
+                if self.running:
+                    print(f"Serial RX Error: {e}")
+                    self.running = False
+                    self.loop.call_soon_threadsafe(self.lost)
+                return
+            if data:
+                self.loop.call_soon_threadsafe(self.received, data)
+
+    async def _write(self, chunk):
+        await self.loop.run_in_executor(None, self.serial.write, chunk)
+
+    async def close(self):
+        self.running = False
+        if self.thread:
+            await self.loop.run_in_executor(None, self.thread.join)
+            self.thread = None
+        if self.serial:
+            self.serial.close()
+            self.serial = None
+
+
+class TcpTransport(Transport):
+    """TCP socket (npr. serijski bridge na mrezi ili simulator)."""
+
+    def __init__(self, host, port):
+        super().__init__(TCP_WRITE_SIZE)
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.task = None
+        self.name = f"TCP {host}:{port}"
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        sock = self.writer.get_extra_info("socket")
+        if sock is not None:
+            import socket
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # Kratke komande bez Naglea
+        self.task = asyncio.ensure_future(self.read_loop())
+
+    async def read_loop(self):
+        try:
+            while True:
+                data = await self.reader.read(4096)
+                if not data:
+                    break
+                self.received(data)
+        except (ConnectionError, OSError) as e:
+            print(f"TCP RX Error: {e}")
+        self.task = None
+        self.lost()
+
+    async def _write(self, chunk):
+        self.writer.write(chunk)
+        await self.writer.drain()
+
+    async def close(self):
+        self.on_lost = None
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+            self.writer = None
+
+
+class LoopbackTransport(Transport):
+    """
+    Link u memoriji prema objektu koji glumi robota (loopback.LoopbackRobot).
+    `peer.receive(data)` dobiva sve poslano, a peer odgovara kroz received().
+    `latency` (s) se dodaje u oba smjera, pa se vidi u histogramu linka, a
+    `bytes_per_s` ogranicava brzinu kao UART iza HC-02 (LINK_BYTES_PER_S).
+    """
+
+    def __init__(self, peer, latency=0.0, write_size=TCP_WRITE_SIZE, bytes_per_s=None):
+        super().__init__(write_size, LinkBudget(bytes_per_s, DEVICE_BUFFER) if bytes_per_s else None)
+        self.peer = peer
+        self.latency = latency
+        self.loop = None
+        self.name = "Loopback"
+
+    async def open(self):
+        self.loop = asyncio.get_running_loop()
+        self.peer.attach(self)
+
+    def send(self, data):
+        """Peer -> dashboard (iz dretve loopa)."""
+        if self.latency:
+            self.loop.call_later(self.latency, self.received, bytes(data))
+        else:
+            self.loop.call_soon(self.received, bytes(data))
+
+    async def _write(self, chunk):
+        if self.latency:
+            self.loop.call_later(self.latency, self.peer.receive, chunk)
+        else:
+            self.peer.receive(chunk)
+
+    def drop(self):
+        """Glumi prekid veze (brownout, robot izasao iz dometa)."""
+        self.peer.detach()
+        self.lost()
+
+    async def close(self):
+        self.peer.detach()
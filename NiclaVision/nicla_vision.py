@@ -109,20 +109,57 @@ def send_mjpeg_header(client):
                 "Cache-Control: no-cache\r\n" \
                 "Pragma: no-cache\r\n\r\n")
 
-def send_mjpeg_frame(client, img):
+def send_mjpeg_frame(client, cframe):
     try:
-        # Use to_jpeg instead of compressed()
-        cframe = img.to_jpeg(quality=30)
         header = "\r\n--openmv\r\n" \
                  "Content-Type: image/jpeg\r\n"\
-                 "Content-Length:"+str(len(cframe))+"\r\n\r\n"
-        client.send(header)
+                 "Content-Length:"+str(len(cframe))+"\r\n"
+        if perf_text:
+            # Statistika za Dashboard overlay
+            header += "X-Perf:" + perf_text + "\r\n"
+        client.send(header + "\r\n")
         client.send(cframe)
     except Exception as e:
         print("MJPEG Send Error:", e)
         return False # Socket error
     return True
 
+# --- Statistika (fps i vremena pojedinih faza petlje) ---
+# Svake sekunde ispisuje prosjecno trajanje faza u ms, da se vidi sto
+# ogranicava fps. Isti tekst ide Dashboardu u X-Perf zaglavlju framea.
+PERF_INTERVAL_MS = 1000
+PERF_STAGES = ("snap", "uart", "qr", "blob", "sleep", "jpeg", "send")
+perf_sum = {}
+perf_frames = 0
+perf_start = time.ticks_ms()
+perf_text = ""
+
+def perf_reset():
+    global perf_frames, perf_start
+    for stage in PERF_STAGES:
+        perf_sum[stage] = 0
+    perf_frames = 0
+    perf_start = time.ticks_ms()
+
+def perf_add(stage, t_start):
+    # Dodaje vrijeme od t_start do sada fazi, vraca novi t_start
+    t = time.ticks_us()
+    perf_sum[stage] += time.ticks_diff(t, t_start)
+    return t
+
+def perf_report():
+    global perf_text
+    if perf_frames == 0:
+        return
+    parts = ["{:.1f}fps".format(clock.fps())]
+    for stage in PERF_STAGES:
+        parts.append("{}={:.1f}".format(stage, perf_sum[stage] / perf_frames / 1000))
+    perf_text = " ".join(parts)
+    print("PERF " + perf_text)
+    perf_reset()
+
+perf_reset()
+
 # --- Funkcije ---
 
 def send_uart(tag, data):
@@ -132,7 +169,9 @@ def send_uart(tag, data):
 
 while(True):
     clock.tick()
+    t = time.ticks_us()
     img = sensor.snapshot()
+    t = perf_add("snap", t)
     
     # --- 0. Provjera UART poruka (Konfiguracija) ---
     if uart.any():
@@ -168,6 +207,7 @@ while(True):
                             led_blue.off()
             except Exception as e:
                 print("UART Error:", e)
+    t = perf_add("uart", t)
 
     # 1. QR Kod Detekcija
     qrs = img.find_qrcodes()
@@ -182,6 +222,7 @@ while(True):
             time.sleep_ms(500)
     else:
         led_green.off()
+    t = perf_add("qr", t)
         
     # 2. Detekcija Objekata (Colors)
     # Trazimo sve boje definriane u THRESHOLDS
@@ -215,9 +256,11 @@ while(True):
         
         data = "{},{},{}".format(detected_type, current_best_blob.cx(), current_best_blob.pixels())
         send_uart("OBJ", data)
+    t = perf_add("blob", t)
         
     # Debounce / Throttle
     time.sleep_ms(50) 
+    t = perf_add("sleep", t)
 
     # --- 3. MJPEG Stream ---
     if s:
@@ -233,9 +276,15 @@ while(True):
         
         # 2. Salji frame ako imamo klijenta
         if client_socket:
-            if not send_mjpeg_frame(client_socket, img):
+            # Use to_jpeg instead of compressed()
+            cframe = img.to_jpeg(quality=30)
+            t = perf_add("jpeg", t)
+            if not send_mjpeg_frame(client_socket, cframe):
                 print("Client disconnected.")
                 client_socket.close()
                 client_socket = None
+            t = perf_add("send", t)
 
-    # print(clock.fps())
+    perf_frames += 1
+    if time.ticks_diff(time.ticks_ms(), perf_start) >= PERF_INTERVAL_MS:
+        perf_report()
@@ -48,6 +48,17 @@ int Manipulator::dohvatiCiljaniPreset() {
     return ciljaniPresetIndex;
 }
 
+bool Manipulator::jeLiSlobodna() {
+    return trenutnoStanje == STANJE_MIRUJE && jesuLiMotoriStigli();
+}
+
+void Manipulator::idiNaPreset(int idx) {
+    if (idx < 0 || idx >= 15) return;
+    ciljaniPresetIndex = idx;
+    primjeniPreset(idx);
+    trenutnoStanje = STANJE_MIRUJE;
+}
+
 bool Manipulator::jesuLiMotoriStigli() {
     float tolerancija = 1.0; // Stupnjevi
     for (int i = 0; i < 7; i++) {
@@ -88,6 +88,17 @@ public:
     
     int dohvatiCiljaniPreset();
 
+    /**
+     * Ruka miruje: nema aktivne sekvence i svi servi su stigli na cilj.
+     * Koristi se za {"status": "ARM_DONE"} prema Dashboardu.
+     */
+    bool jeLiSlobodna();
+
+    /**
+     * Odlazi na spremljeni preset (0-14) sa Soft-Startom, bez sekvence.
+     */
+    void idiNaPreset(int idx);
+
     /**
      * Glavna petlja za ažuriranje.
      * Pozivati u loop().
@@ -20,6 +20,7 @@
 #include "IMU.h"
 #include "Ultrazvuk.h"
 #include "Vision.h" // Dodano
+#include "Telemetrija.h"
 #include <ArduinoJson.h>
 #include <ArduinoJson.h>
 #include <EEPROM.h>
@@ -45,12 +46,39 @@ enum FazaMisije {
     FAZA_1_SKUPLJANJE,   // Vožnja po stazi, skupljanje P1, P2, P3
     FAZA_2_PARKIRANJE,   // Dolazak na D2
     FAZA_3_SORTIRANJE,   // Stacionarno bacanje
+    FAZA_RED_KORAKA,     // Misija poslana s Dashboarda (mission_add / mission_run)
     FAZA_KRAJ            // Gotovo
 };
 
 FazaMisije trenutnaFaza = FAZA_CEKANJE_STARTA;
 int korakFaze = 0;       // Pod-korak unutar faze
 
+// --- RED KORAKA (misija s Dashboarda) ---
+// Dashboard prevede misiju (mission.py) i posalje je odjednom, robot vrti
+// korake bez cekanja na link. Vrste moraju odgovarati OPCODES u mission.py.
+enum VrstaKoraka {
+    KORAK_STRAIGHT, KORAK_TURN, KORAK_PIVOT, KORAK_MOVE_DUAL,
+    KORAK_ARM, KORAK_PRESET, KORAK_WAIT, KORAK_SYNC
+};
+// vrsta | KORAK_PARALELNO: sljedeci korak krece odmah, ceka samo ako treba
+// isti resurs (pogon ili ruka) ili je KORAK_SYNC
+const uint8_t KORAK_PARALELNO = 16;
+
+struct KorakMisije {
+    uint8_t vrsta;
+    float a;       // cm, stupnjevi ili ms (wait)
+    int16_t b;     // move_dual: lijevi PWM, arm: sekvenca, preset: indeks
+    int16_t c;     // move_dual: desni PWM
+};
+
+const int MAX_KORAKA = 64;
+KorakMisije redKoraka[MAX_KORAKA];
+int brojKoraka = 0;
+int trenutniKorak = 0;    // Sljedeci korak za pokrenuti
+int cekaKorak = -1;       // Korak bez KORAK_PARALELNO koji jos traje (-1 = nijedan)
+unsigned long pocetakKoraka = 0;
+unsigned long pocetakReda = 0;
+
 // Podaci o predmetima (QR Mapping)
 // 0=Nepoznato, 1=Boca, 2=Limenka, 3=Spužva
 int mapiranjeKrov1 = 0;
@@ -76,13 +104,50 @@ const char* presetNames[] = {
 };
 
 // --- PROTOTIPOVI ---
+// Dashboard ceka {"status": "ARM_DONE"} nakon "arm"/"preset" komande
+bool rukaCekaPotvrdu = false;
+
 // --- PROTOTIPOVI ---
 void izvrsiSmartStart();
 void provjeriUdarac();
+void izvrsiRedKoraka();
+bool uMirovanju();
 
 // --- TELEMETRIJA ---
-// --- TELEMETRIJA ---
+// Tekstualni STATUS: na USB je zadano. Dashboard moze dogovoriti binarni
+// mod (komanda "telemetry"), tada okviri idu na stream s kojeg je dosla komanda.
+Stream* telemetrijaStream = &Serial;
+bool telemetrijaBinarna = false;
+unsigned long telemetrijaPeriodMs = 100; // 10Hz
+
+// Binarni mod: jedan ultrazvuk po okviru (pulseIn blokira do 30 ms po senzoru),
+// ostali se salju iz zadnjeg mjerenja
+long zadnjiUltrazvuk[4] = {-1, -1, -1, -1};
+int sljedeciUltrazvuk = 0;
+
+void poslajiStatusBinarno() {
+    zadnjiUltrazvuk[sljedeciUltrazvuk] = udaljenost(sljedeciUltrazvuk); // SMJER_NAPRIJED..SMJER_DESNO = 0..3
+    sljedeciUltrazvuk = (sljedeciUltrazvuk + 1) % 4;
+
+    StatusOkvir okvir;
+    okvir.cm = dohvatiPredjeniPutCm();
+    okvir.encL = dohvatiLijeviEnkoder();
+    okvir.encR = dohvatiDesniEnkoder();
+    okvir.armIdx = ruka.dohvatiCiljaniPreset();
+    okvir.usF = zadnjiUltrazvuk[SMJER_NAPRIJED];
+    okvir.usB = zadnjiUltrazvuk[SMJER_NAZAD];
+    okvir.usL = zadnjiUltrazvuk[SMJER_LIJEVO];
+    okvir.usR = zadnjiUltrazvuk[SMJER_DESNO];
+    okvir.induct = digitalRead(PIN_INDUCTIVE_SENS);
+    posaljiStatusBinarno(telemetrijaStream, okvir);
+}
+
 void poslajiStatus() {
+    if (telemetrijaBinarna) {
+        poslajiStatusBinarno();
+        return;
+    }
+
     // Format: STATUS:cm,pulsesL,pulsesR,armIdx,usF,usB,usL,usR,induct
     float cm = dohvatiPredjeniPutCm();
     long encL = dohvatiLijeviEnkoder();
@@ -95,16 +160,17 @@ void poslajiStatus() {
     long usR = udaljenost(SMJER_DESNO);
     int induct = digitalRead(PIN_INDUCTIVE_SENS);
     
-    Serial.print("STATUS:");
-    Serial.print(cm); Serial.print(",");
-    Serial.print(encL); Serial.print(",");
-    Serial.print(encR); Serial.print(",");
-    Serial.print(armIdx); Serial.print(",");
-    Serial.print(usF); Serial.print(",");
-    Serial.print(usB); Serial.print(",");
-    Serial.print(usL); Serial.print(",");
-    Serial.print(usR); Serial.print(",");
-    Serial.println(induct);
+    Stream* s = telemetrijaStream;
+    s->print("STATUS:");
+    s->print(cm); s->print(",");
+    s->print(encL); s->print(",");
+    s->print(encR); s->print(",");
+    s->print(armIdx); s->print(",");
+    s->print(usF); s->print(",");
+    s->print(usB); s->print(",");
+    s->print(usL); s->print(",");
+    s->print(usR); s->print(",");
+    s->println(induct);
 }
 void izvrsiFazuSkupljanja();
 void izvrsiFazuSortiranja();
@@ -135,7 +201,7 @@ void setup() {
 
     // Pokreni Smart Start odmah ili na gumb?
     // Prompt kaže: "Start Position: Robot's Right Side faces the track..."
-    // Pretpostavljamo da startamo odmah ili na serijsku komandu "start".
+    // Startamo na serijsku komandu {"cmd": "start"}.
     trenutnaFaza = FAZA_CEKANJE_STARTA; 
     
     // Pošalji konfiguraciju kameri (ako je spojena i bootana, mozda treba delay)
@@ -154,9 +220,9 @@ void loop() {
     azurirajIMU();
     azurirajVision();   // Procesiraj poruke s kamere
     
-    // --- TELEMETRIJA (10Hz) ---
+    // --- TELEMETRIJA (10Hz tekst, do 25Hz binarno na 9600 baud) ---
     static unsigned long zadnjaTelemetrija = 0;
-    if (millis() - zadnjaTelemetrija > 100) {
+    if (millis() - zadnjaTelemetrija >= telemetrijaPeriodMs) {
         poslajiStatus();
         zadnjaTelemetrija = millis();
     }
@@ -177,17 +243,20 @@ void loop() {
     }
     bioUPokretu = sadaUPokretu;
 
+    // --- STATUS REPORT (ARM_DONE) ---
+    // Ruka je zavrsila sekvencu/preset zadan komandom - Dashboard ne mora cekati
+    // fiksno vrijeme. Javlja se i kad je ruka vec bila na cilju.
+    if (rukaCekaPotvrdu && ruka.jeLiSlobodna()) {
+        Serial.println("{\"status\": \"ARM_DONE\"}");
+        Serial2.println("{\"status\": \"ARM_DONE\"}");
+        rukaCekaPotvrdu = false;
+    }
+
     // --- 3. GLAVNA LOGIKA (STATE MACHINE) ---
     switch (trenutnaFaza) {
         case FAZA_CEKANJE_STARTA:
-            // Čekamo komandu s Bluetootha ili Seriala
-            if (Serial.available() || Serial2.available()) {
-                // Pojednostavljeno: bilo koji znak pokreće
-                while(Serial.available()) Serial.read();
-                while(Serial2.available()) Serial2.read();
-                trenutnaFaza = FAZA_SMART_START;
-                korakFaze = 0;
-            }
+            // Čekamo {"cmd": "start"} (checkSerial). Ostale linije (ping, telemetry,
+            // mission_*) se normalno obrade - ne smiju pokrenuti robota.
             break;
 
         case FAZA_SMART_START:
@@ -217,6 +286,10 @@ void loop() {
             izvrsiFazuSortiranja();
             break;
 
+        case FAZA_RED_KORAKA:
+            izvrsiRedKoraka();
+            break;
+
         case FAZA_KRAJ:
             // Gotovo, blinkaj LED ili sviraj
             break;
@@ -237,6 +310,20 @@ void loop() {
 }
 
 // --- TELEMETRIJA & PARSER (JSON) ---
+// Odgovor na komandu. Ako je komanda imala "id", vraca se natrag da
+// Dashboard moze upariti odgovor i izmjeriti latenciju.
+void odgovori(Stream* stream, const char* status) {
+    long id = doc["id"] | -1L;
+    stream->print("{\"status\": \"");
+    stream->print(status);
+    stream->print("\"");
+    if (id >= 0) {
+        stream->print(", \"id\": ");
+        stream->print(id);
+    }
+    stream->println("}");
+}
+
 void checkSerial(Stream* stream) {
     if (stream->available()) {
         String msg = stream->readStringUntil('\n');
@@ -252,29 +339,36 @@ void checkSerial(Stream* stream) {
             if (strcmp(cmd, "straight") == 0) {
                 float val = doc["val"];
                 straightDrive(val);
-                stream->println("{\"status\": \"OK\"}");
+                odgovori(stream, "OK");
             }
             else if (strcmp(cmd, "move_dual") == 0) {
                 int l = doc["l"];
                 int r = doc["r"];
                 float dist = doc["dist"];
                 differentialDrive(l, r, dist);
-                stream->println("{\"status\": \"OK\"}");
+                odgovori(stream, "OK");
             }
             else if (strcmp(cmd, "turn") == 0) {
                 float val = doc["val"];
                 zapocniRotaciju(val);
-                stream->println("{\"status\": \"OK\"}");
+                odgovori(stream, "OK");
             }
             else if (strcmp(cmd, "pivot") == 0) {
                 float val = doc["val"];
                 pivotTurn(val);
-                stream->println("{\"status\": \"OK\"}");
+                odgovori(stream, "OK");
             }
             else if (strcmp(cmd, "arm") == 0) {
                 const char* val = doc["val"];
                 ruka.zapocniSekvencu(val); 
-                stream->println("{\"status\": \"OK\"}");
+                rukaCekaPotvrdu = true;
+                odgovori(stream, "OK");
+            }
+            else if (strcmp(cmd, "preset") == 0) {
+                // {"cmd": "preset", "idx": 2} - ARM_DONE kad servi stignu
+                ruka.idiNaPreset(doc["idx"] | 1);
+                rukaCekaPotvrdu = true;
+                odgovori(stream, "OK");
             }
             else if (strcmp(cmd, "manual") == 0) {
                  int l = doc["l"];
@@ -282,9 +376,19 @@ void checkSerial(Stream* stream) {
                  lijeviMotor(l);
                  desniMotor(r);
             }
+            else if (strcmp(cmd, "start") == 0) {
+                 // Samo iz mirovanja; tijekom voznje/reda koraka se ignorira
+                 if (trenutnaFaza == FAZA_CEKANJE_STARTA) {
+                     trenutnaFaza = FAZA_SMART_START;
+                     korakFaze = 0;
+                     odgovori(stream, "STARTED");
+                 } else {
+                     odgovori(stream, "BUSY");
+                 }
+            }
             else if (strcmp(cmd, "stop") == 0) {
                  zaustaviKretanje();
-                 stream->println("{\"status\": \"STOPPED\"}");
+                 odgovori(stream, "STOPPED");
                  trenutnaFaza = FAZA_CEKANJE_STARTA;
             }
             else if (strcmp(cmd, "set_pid") == 0) {
@@ -294,15 +398,73 @@ void checkSerial(Stream* stream) {
                 extern float Kp, Ki, Kd;
                 Kp = config.kp; Ki = config.ki; Kd = config.kd;
                 spremiKonfiguraciju();
-                stream->println("{\"status\": \"PID_SAVED\"}");
+                odgovori(stream, "PID_SAVED");
+            }
+            else if (strcmp(cmd, "set_motor") == 0) {
+                config.pulsesPerCm = doc["ppc"] | config.pulsesPerCm;
+                config.baseSpeed = doc["spd"] | config.baseSpeed;
+                primjeniKonfiguraciju();
+                spremiKonfiguraciju();
+                odgovori(stream, "MOTOR_SAVED");
             }
             else if (strcmp(cmd, "cal_imu") == 0) {
                 inicijalizirajIMU(); 
-                stream->println("{\"status\": \"IMU_CALIBRATED\"}");
+                odgovori(stream, "IMU_CALIBRATED");
             }
             else if (strcmp(cmd, "save_eeprom") == 0) {
                 spremiKonfiguraciju();
-                stream->println("{\"status\": \"SAVED\"}");
+                odgovori(stream, "SAVED");
+            }
+            else if (strcmp(cmd, "telemetry") == 0) {
+                // {"cmd": "telemetry", "mode": "bin"|"text", "hz": 25}
+                const char* mode = doc["mode"] | "text";
+                int hz = doc["hz"] | 10;
+                hz = constrain(hz, 1, 50);
+                telemetrijaBinarna = (strcmp(mode, "bin") == 0);
+                telemetrijaPeriodMs = 1000 / hz;
+                telemetrijaStream = stream;
+                odgovori(stream, telemetrijaBinarna ? "TELEM_BIN" : "TELEM_TEXT");
+            }
+            else if (strcmp(cmd, "ping") == 0) {
+                // Dashboard mjeri latenciju linka
+                odgovori(stream, "PONG");
+            }
+            else if (strncmp(cmd, "mission_", 8) == 0 && !uMirovanju()) {
+                // Red koraka se ne dira dok robot vozi (smart start, red koraka)
+                odgovori(stream, "BUSY");
+            }
+            else if (strcmp(cmd, "mission_clear") == 0) {
+                brojKoraka = 0;
+                odgovori(stream, "CLEARED");
+            }
+            else if (strcmp(cmd, "mission_add") == 0) {
+                // {"cmd": "mission_add", "s": [vrsta, a, b, c, vrsta, a, b, c, ...]}
+                JsonArray s = doc["s"];
+                int n = s.size() / 4;
+                if (brojKoraka + n > MAX_KORAKA) {
+                    odgovori(stream, "QUEUE_FULL");
+                } else {
+                    for (int i = 0; i < n; i++) {
+                        KorakMisije& k = redKoraka[brojKoraka++];
+                        k.vrsta = s[i * 4];
+                        k.a = s[i * 4 + 1];
+                        k.b = s[i * 4 + 2];
+                        k.c = s[i * 4 + 3];
+                    }
+                    odgovori(stream, "QUEUED");
+                }
+            }
+            else if (strcmp(cmd, "mission_run") == 0) {
+                // "n" = broj koraka koje je Dashboard poslao (provjera da nista nije izgubljeno)
+                if ((doc["n"] | brojKoraka) != brojKoraka) {
+                    odgovori(stream, "COUNT_MISMATCH");
+                } else {
+                    trenutniKorak = 0;
+                    cekaKorak = -1;
+                    pocetakReda = millis();
+                    trenutnaFaza = FAZA_RED_KORAKA;
+                    odgovori(stream, "RUNNING");
+                }
             }
              else if (strcmp(cmd, "get_pose") == 0) {
                  Serial2.println("{\"pose_x\": 0, \"pose_y\": 0, \"pose_th\": 0}"); 
@@ -311,6 +473,96 @@ void checkSerial(Stream* stream) {
     }
 }
 
+// --- RED KORAKA ---
+// Red se smije puniti i pokrenuti samo kad robot miruje
+bool uMirovanju() {
+    return trenutnaFaza == FAZA_CEKANJE_STARTA || trenutnaFaza == FAZA_KRAJ;
+}
+
+// Pokreni korak, pa cekaj da kretanje stane, ruka stigne ili istekne wait.
+// Korak s KORAK_PARALELNO se ne ceka: pogon i ruka se ionako azuriraju
+// neblokirajuce u loop(), pa npr. ruka ide u Voznja dok robot vozi.
+// Napredak ide na telemetrijski stream ({"status": "STEP", "i": n}).
+uint8_t vrstaKoraka(const KorakMisije& k) {
+    return k.vrsta & ~KORAK_PARALELNO;
+}
+
+void zapocniKorak(const KorakMisije& k) {
+    switch (vrstaKoraka(k)) {
+        case KORAK_STRAIGHT:  straightDrive(k.a); break;
+        case KORAK_TURN:      zapocniRotaciju(k.a); break;
+        case KORAK_PIVOT:     pivotTurn(k.a); break;
+        case KORAK_MOVE_DUAL: differentialDrive(k.b, k.c, k.a); break;
+        case KORAK_ARM:
+            if (k.b == 0) ruka.zapocniSekvencu("uzmi_boca");
+            else if (k.b == 1) ruka.zapocniSekvencu("uzmi_limenka");
+            else if (k.b == 2) ruka.zapocniSekvencu("uzmi_spuzva");
+            else ruka.zapocniSekvencu("voznja");
+            break;
+        case KORAK_PRESET:    ruka.idiNaPreset(k.b); break;
+        default: break; // KORAK_WAIT, KORAK_SYNC
+    }
+    uint8_t vrsta = vrstaKoraka(k);
+    if (vrsta == KORAK_ARM || vrsta == KORAK_PRESET) rukaCekaPotvrdu = true; // ARM_DONE kao za komandu
+}
+
+// Resurs koraka je zauzet (pogon za voznju, ruka za arm/preset)
+bool resursZauzet(uint8_t vrsta) {
+    switch (vrsta) {
+        case KORAK_ARM:
+        case KORAK_PRESET: return !ruka.jeLiSlobodna();
+        case KORAK_WAIT:
+        case KORAK_SYNC:   return false;
+        default:           return jeUPokretu();
+    }
+}
+
+bool sveSlobodno() {
+    return !jeUPokretu() && ruka.jeLiSlobodna();
+}
+
+bool korakGotov(const KorakMisije& k) {
+    if (vrstaKoraka(k) == KORAK_WAIT) return millis() - pocetakKoraka >= (unsigned long)k.a;
+    return !resursZauzet(vrstaKoraka(k));
+}
+
+void javiKorak(int i) {
+    telemetrijaStream->print("{\"status\": \"STEP\", \"i\": ");
+    telemetrijaStream->print(i);
+    telemetrijaStream->println("}");
+}
+
+void izvrsiRedKoraka() {
+    // U jednom prolazu pokrece sve korake koji smiju krenuti
+    while (true) {
+        if (cekaKorak >= 0) {
+            if (!korakGotov(redKoraka[cekaKorak])) return;
+            cekaKorak = -1;
+        }
+
+        if (trenutniKorak >= brojKoraka) {
+            if (!sveSlobodno()) return; // Koraci koji se preklapaju jos traju
+            telemetrijaStream->print("{\"status\": \"MISSION_DONE\", \"n\": ");
+            telemetrijaStream->print(brojKoraka);
+            telemetrijaStream->print(", \"ms\": ");
+            telemetrijaStream->print(millis() - pocetakReda);
+            telemetrijaStream->println("}");
+            trenutnaFaza = FAZA_KRAJ;
+            return;
+        }
+
+        const KorakMisije& k = redKoraka[trenutniKorak];
+        uint8_t vrsta = vrstaKoraka(k);
+        if (vrsta == KORAK_SYNC ? !sveSlobodno() : resursZauzet(vrsta)) return; // Konflikt ili barijera
+
+        javiKorak(trenutniKorak);
+        pocetakKoraka = millis();
+        zapocniKorak(k);
+        if (!(k.vrsta & KORAK_PARALELNO) && vrsta != KORAK_SYNC) cekaKorak = trenutniKorak;
+        trenutniKorak++;
+    }
+}
+
 // --- EEPROM FUNKCIJE ---
 void ucitajKonfiguraciju() {
     EEPROM.get(0, config);
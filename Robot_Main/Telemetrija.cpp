@@ -1,7 +1,7 @@
 /**
  * Telemetrija.cpp
  * 
- * Implementacija slanja podataka u JSON formatu.
+ * Implementacija slanja podataka u JSON i binarnom formatu.
  */
 
 #include "Telemetrija.h"
@@ -27,3 +27,28 @@ void posaljiTelemetrijuJSON(long encL, long encR, float spd, float head) {
         zadnjeSlanje = millis();
     }
 }
+
+// --- BINARNA TELEMETRIJA ---
+uint16_t crc16(const uint8_t* data, size_t len) {
+    uint16_t crc = 0xFFFF;
+    while (len--) {
+        crc ^= (uint16_t)(*data++) << 8;
+        for (uint8_t i = 0; i < 8; i++) {
+            crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : (crc << 1);
+        }
+    }
+    return crc;
+}
+
+static uint16_t statusSeq = 0;
+
+void posaljiStatusBinarno(Stream* stream, StatusOkvir& okvir) {
+    okvir.sync1 = TELEM_SYNC1;
+    okvir.sync2 = TELEM_SYNC2;
+    okvir.seq = statusSeq++;
+    okvir.vrijeme = millis();
+    // CRC od seq do induct (bez sync bajtova i samog CRC-a)
+    const uint8_t* tijelo = (const uint8_t*)&okvir + 2;
+    okvir.crc = crc16(tijelo, sizeof(StatusOkvir) - 4);
+    stream->write((const uint8_t*)&okvir, sizeof(StatusOkvir));
+}
@@ -21,4 +21,40 @@
  */
 void posaljiTelemetrijuJSON(long encL, long encR, float spd, float head);
 
+// --- BINARNA TELEMETRIJA ---
+// Zamjena za tekstualnu STATUS: liniju (~50 B) kad je Dashboard dogovori
+// komandom {"cmd": "telemetry", "mode": "bin", "hz": 25}.
+// Okvir je 32 bajta, little-endian, bez paddinga:
+//   AA 55 | seq u16 | millis u32 | cm f32 | encL i32 | encR i32 | arm i8 |
+//   usF usB usL usR i16 | induct u8 | crc16 u16
+// CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF) racuna se od seq do induct.
+
+#define TELEM_SYNC1 0xAA
+#define TELEM_SYNC2 0x55
+
+struct __attribute__((packed)) StatusOkvir {
+    uint8_t sync1;
+    uint8_t sync2;
+    uint16_t seq;
+    uint32_t vrijeme;   // millis()
+    float cm;
+    int32_t encL;
+    int32_t encR;
+    int8_t armIdx;
+    int16_t usF, usB, usL, usR;
+    uint8_t induct;
+    uint16_t crc;
+};
+
+/**
+ * CRC-16/CCITT-FALSE nad `len` bajtova.
+ */
+uint16_t crc16(const uint8_t* data, size_t len);
+
+/**
+ * Popunjava sync, seq, vrijeme i CRC pa salje okvir jednim write() pozivom.
+ * Ostala polja popunjava pozivatelj.
+ */
+void posaljiStatusBinarno(Stream* stream, StatusOkvir& okvir);
+
 #endif // TELEMETRIJA_H